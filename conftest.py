@@ -0,0 +1,5 @@
+# Raiz do repositório: os testes importam o pacote `layers` a partir daqui
+
+def pytest_configure(config):
+    # Testes de integração com um PostgreSQL de teste (GOLD_TEST_DATABASE_URL)
+    config.addinivalue_line("markers", "postgres: precisa de um PostgreSQL (GOLD_TEST_DATABASE_URL)")
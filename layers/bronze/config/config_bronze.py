@@ -6,4 +6,28 @@ load_dotenv()
 
 RAW_PATH_ESTB = os.getenv("RAW_PATH_ESTB")
 BASE_DIR = Path(__file__).resolve().parents[1]
-OUT_PATH_ESTB_BRONZE = BASE_DIR / 'data' / 'conformed' / 'estabelecimentos'
\ No newline at end of file
+OUT_PATH_ESTB_BRONZE = BASE_DIR / 'data' / 'conformed' / 'estabelecimentos'
+
+# Leitura em lotes (memória constante independente do tamanho do arquivo)
+STREAMING = os.getenv("BRONZE_STREAMING", "0") == "1"
+BATCH_SIZE = int(os.getenv("BRONZE_BATCH_SIZE", "1000000"))
+
+# Processos em paralelo na conversão dos arquivos (1 = sequencial)
+WORKERS = int(os.getenv("BRONZE_WORKERS", "1"))
+
+# Leitor dos arquivos brutos: 'pandas' (pd.read_csv) ou 'arrow' (pyarrow.csv tipado)
+ENGINE = os.getenv("BRONZE_ENGINE", "pandas")
+
+# Ignora o manifesto de ingestão e reprocessa todos os arquivos
+FORCE = os.getenv("BRONZE_FORCE", "0") == "1"
+
+# Pré-agregação: grava contagens por (município, classe CNAE) em vez de um
+# registro por estabelecimento
+AGGREGATE = os.getenv("BRONZE_AGGREGATE", "0") == "1"
+COUNT_COLUMN = 'qtd_estabelecimentos'
+
+# Layout de saída: 'files' (um Parquet por arquivo bruto) ou 'partitioned'
+# (dataset hive particionado por ano=YYYY/, zstd, row groups dimensionados)
+LAYOUT = os.getenv("BRONZE_LAYOUT", "files")
+COMPRESSION = os.getenv("PARQUET_COMPRESSION", "zstd")
+ROW_GROUP_SIZE = int(os.getenv("PARQUET_ROW_GROUP_SIZE", "1000000"))
\ No newline at end of file
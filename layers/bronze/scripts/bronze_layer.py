@@ -1,22 +1,118 @@
 #%%
 import os
 import time
-from layers.bronze.utils.file_normalizer import normaliza_tipos
-from layers.bronze.config.config_bronze import RAW_PATH_ESTB, OUT_PATH_ESTB_BRONZE
+import argparse
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from layers.bronze.utils.file_normalizer import normaliza_tipos, arquivo_saida
+from layers.bronze.utils.manifest import fingerprint, versao_leitor, arquivo_atualizado
+from layers.common.manifest import carrega_manifesto, salva_manifesto
+from layers.bronze.config.config_bronze import (RAW_PATH_ESTB, OUT_PATH_ESTB_BRONZE, STREAMING, BATCH_SIZE, WORKERS,
+                                                ENGINE, FORCE, AGGREGATE, LAYOUT)
 
-def run_bronze_layer() -> None:
+def run_bronze_layer(streaming: bool = STREAMING, batch_size: int = BATCH_SIZE, workers: int = WORKERS,
+                     engine: str = ENGINE, force: bool = FORCE, aggregate: bool = AGGREGATE,
+                     layout: str = LAYOUT) -> list:
     """Run the bronze layer: for each file in RAW_PATH_ESTB call
     normaliza_tipos(file, RAW_PATH_ESTB, OUT_PATH_ESTB_BRONZE).
-    Prints progress. Filesystem or normaliza_tipos exceptions propagate.
+    Files whose fingerprint (size, mtime, content hash, reader version and
+    output path) matches the ingestion manifest and whose output still
+    exists are skipped, unless force=True.
+    With streaming=True each file is read in batches of batch_size rows,
+    keeping memory flat regardless of file size. engine selects the reader
+    backend ('pandas' or 'arrow') so both can be compared on the same files.
+    With aggregate=True each year is written as establishment counts per
+    (municipality, CNAE class) instead of one row per establishment.
+    With layout='partitioned' the output is a hive-partitioned dataset
+    (ano=YYYY/) with zstd compression and sized row groups.
+    With workers > 1 the files are dispatched to a process pool, largest
+    files first, and a failure in one file does not stop the others; the
+    manifest is saved as each file completes, so an interrupted run keeps
+    the files already converted. The failed files are reported and a RuntimeError is raised at the end.
+    Prints progress and a per-file summary. Returns the list of summaries.
+    In sequential mode filesystem or normaliza_tipos exceptions propagate.
     """
-    file_list = os.listdir(RAW_PATH_ESTB)
-    for file_name in file_list:
-        print(f"Processando: {file_name}")
-        normaliza_tipos(file_name, RAW_PATH_ESTB, OUT_PATH_ESTB_BRONZE)
+    manifest = carrega_manifesto(OUT_PATH_ESTB_BRONZE)
+    reader_version = versao_leitor(engine, aggregate)
+
+    file_list = []
+    for file_name in os.listdir(RAW_PATH_ESTB):
+        file_path = os.path.join(RAW_PATH_ESTB, file_name)
+        out_file = arquivo_saida(file_name, RAW_PATH_ESTB, OUT_PATH_ESTB_BRONZE, layout)
+        if not force and arquivo_atualizado(manifest.get(file_name), file_path, reader_version, out_file):
+            print(f"Inalterado, ignorando: {file_name}")
+            continue
+        file_list.append(file_name)
+
+    kwargs = {'streaming': streaming, 'batch_size': batch_size, 'engine': engine, 'aggregate': aggregate,
+              'layout': layout}
+
+    if workers is None or workers <= 1:
+        results = []
+        for file_name in file_list:
+            print(f"Processando: {file_name}")
+            result = converte_arquivo(file_name, **kwargs)
+            manifest[file_name] = result.pop('fingerprint')
+            salva_manifesto(OUT_PATH_ESTB_BRONZE, manifest)
+            results.append(result)
+        print_summary(results)
+        return results
+
+    # Maiores arquivos primeiro para que a cauda longa não domine o tempo total
+    file_list.sort(key=lambda f: os.path.getsize(os.path.join(RAW_PATH_ESTB, f)), reverse=True)
+
+    results, errors = [], {}
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        futures = {
+            executor.submit(converte_arquivo, file_name, **kwargs): file_name
+            for file_name in file_list
+        }
+        for future in as_completed(futures):
+            file_name = futures[future]
+            try:
+                result = future.result()
+                manifest[file_name] = result.pop('fingerprint')
+                salva_manifesto(OUT_PATH_ESTB_BRONZE, manifest)
+                results.append(result)
+                print(f"✓ Concluído: {file_name}")
+            except Exception as exc:
+                errors[file_name] = exc
+                print(f"✗ Erro em {file_name}: {exc}")
+
+    print_summary(results)
+    if errors:
+        raise RuntimeError(f"Falha ao processar {len(errors)} arquivo(s): {', '.join(sorted(errors))}")
+    return results
+
+def converte_arquivo(file_name, **kwargs) -> dict:
+    """Convert one raw file with normaliza_tipos and return its summary
+    with the manifest entry for the file under the 'fingerprint' key.
+    Runs inside the worker process so hashing is parallelized as well."""
+    file_path = os.path.join(RAW_PATH_ESTB, file_name)
+    result = normaliza_tipos(file_name, RAW_PATH_ESTB, OUT_PATH_ESTB_BRONZE, **kwargs)
+    result['fingerprint'] = fingerprint(file_path, versao_leitor(kwargs.get('engine', ENGINE), kwargs.get('aggregate', AGGREGATE)),
+                                        arquivo_saida(file_name, RAW_PATH_ESTB, OUT_PATH_ESTB_BRONZE,
+                                                      kwargs.get('layout', LAYOUT)))
+    return result
+
+def print_summary(results) -> None:
+    """Print one line per converted file (rows in, rows kept, seconds,
+    output size) followed by the totals."""
+    print(f"\n{'Arquivo':<20}{'Lidas':>14}{'Mantidas':>14}{'Segundos':>10}{'MB':>10}")
+    for r in sorted(results, key=lambda r: r['file']):
+        print(f"{r['file']:<20}{r['rows_in']:>14}{r['rows_out']:>14}{r['seconds']:>10.2f}{r['output_bytes'] / 1e6:>10.1f}")
+    print(f"{'Total':<20}{sum(r['rows_in'] for r in results):>14}{sum(r['rows_out'] for r in results):>14}"
+          f"{sum(r['seconds'] for r in results):>10.2f}{sum(r['output_bytes'] for r in results) / 1e6:>10.1f}")
 
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Bronze Layer - ingestão dos arquivos RAIS")
+    parser.add_argument('workers', nargs='?', type=int, default=WORKERS,
+                        help="número de processos (padrão: BRONZE_WORKERS, 1 = sequencial)")
+    parser.add_argument('--force', action='store_true',
+                        help="reprocessa todos os arquivos, ignorando o manifesto")
+    args = parser.parse_args()
+
     start_time = time.time()
-    run_bronze_layer()
+    run_bronze_layer(workers=args.workers, force=args.force)
     end_time = time.time()
     elapsed = end_time - start_time
     print(f"Tempo total de execução: {elapsed:.2f} segundos")
\ No newline at end of file
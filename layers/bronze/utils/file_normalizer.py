@@ -1,12 +1,106 @@
 import pandas as pd
+import fastparquet
+import pyarrow as pa
+import pyarrow.csv as pv
+import pyarrow.compute as pc
+import pyarrow.parquet as pq
 import os
+import time
+import gzip
+import shutil
+import zipfile
+import subprocess
+import tempfile
+from collections import defaultdict
+from contextlib import contextmanager
+from layers.bronze.config.config_bronze import (BATCH_SIZE, ENGINE, AGGREGATE, COUNT_COLUMN, LAYOUT,
+                                                COMPRESSION, ROW_GROUP_SIZE)
+
+# Parâmetros de leitura do layout TXT da RAIS (MTE)
+TXT_READ_OPTIONS = {
+    'encoding': 'latin1',
+    'sep': ';',
+    'usecols': ['Município', 'CNAE 2.0 Classe'],
+}
+
+# Schemas explícitos do leitor Arrow por formato de origem
+ARROW_SCHEMAS = {
+    'txt': {
+        'Município': pa.int32(),
+        'CNAE 2.0 Classe': pa.dictionary(pa.int32(), pa.string()),
+    },
+    'csv': {
+        'ano': pa.int16(),
+        'id_municipio': pa.int32(),
+        'cnae_2': pa.string(),
+    },
+}
+
+# Tipos fixos do leitor pandas no modo streaming, para que todos os lotes
+# gravem o mesmo schema (a leitura completa mantém a inferência do pd.read_csv).
+# Colunas não listadas são lidas como texto.
+PANDAS_DTYPES = {
+    'txt': {
+        'Município': 'Int64',
+        'CNAE 2.0 Classe': str,
+    },
+    'csv': {
+        'ano': 'Int64',
+        'id_municipio': 'Int64',
+        'cnae_2': str,
+    },
+}
+
+def tipos_pandas(ext) -> defaultdict:
+    """
+    Returns the dtype map passed to pd.read_csv by the streaming mode for a source format.
+    
+    Args:
+        ext (str): File extension ('csv' or 'txt')
+        
+    Returns:
+        defaultdict: PANDAS_DTYPES[ext], reading any other column as string
+    """
+    return defaultdict(lambda: str, PANDAS_DTYPES[ext])
+
+# Colunas-chave gravadas com dictionary encoding no layout particionado
+KEY_COLUMNS = ['Município', 'CNAE 2.0 Classe', 'id_municipio', 'cnae_2']
+
+# Leitores pandas por formato (extensão do arquivo descomprimido) e
+# abridores de arquivos comprimidos por extensão do contêiner.
+# Novos formatos entram via registra_leitor/registra_conteiner.
+LEITORES = {}
+CONTEINERES = {}
+
+def registra_leitor(ext, reader) -> None:
+    """
+    Registers the pandas reader used for files with the given extension.
+    
+    Args:
+        ext (str): Uncompressed file extension (e.g., 'txt')
+        reader (callable): Function receiving a path or binary stream and
+            returning a normalized pd.DataFrame
+    """
+    LEITORES[ext.lower()] = reader
+
+def registra_conteiner(ext, membro, abre) -> None:
+    """
+    Registers a compressed container format.
+    
+    Args:
+        ext (str): Container extension (e.g., 'zip')
+        membro (callable): membro(path) -> name of the data file inside the container
+        abre (callable): abre(path, member) -> context manager yielding a binary
+            stream with the decompressed member contents
+    """
+    CONTEINERES[ext.lower()] = (membro, abre)
 
 def normaliza_csv(path) -> pd.DataFrame:
     """
     Reads and normalizes a CSV file.
     
     Args:
-        path (str): Full path to the CSV file
+        path (str): Full path to the CSV file (or a binary stream)
         
     Returns:
         pd.DataFrame: DataFrame containing the CSV data
@@ -24,47 +118,451 @@ def normaliza_txt(path) -> pd.DataFrame:
     - Filters out records where CNAE code is '000-1' (invalid/null entries)
     
     Args:
-        path (str): Full path to the TXT file
+        path (str): Full path to the TXT file (or a binary stream)
         
     Returns:
         pd.DataFrame: Filtered DataFrame with municipality and CNAE classification data
+        (the number of rows read before filtering is kept in df.attrs['rows_in'])
     """
-    df = pd.read_csv(path, encoding='latin1', sep=';', usecols=['Município', 'CNAE 2.0 Classe'])
+    df = pd.read_csv(path, **TXT_READ_OPTIONS)
+    rows_in = len(df)
     df = df[df['CNAE 2.0 Classe'] != '000-1']
+    df.attrs['rows_in'] = rows_in
     return df
 
-def normaliza_tipos(file_name, raw_path, out_path):
+def agrega_contagens(df) -> pd.DataFrame:
+    """
+    Collapses one row per establishment into counts per distinct key.
+    
+    Every column of df is used as a grouping key (municipality and CNAE class,
+    plus 'ano' for CSV files) and the number of rows is stored in COUNT_COLUMN.
+    Null keys are kept as their own group so no establishment is lost.
+    
+    Args:
+        df (pd.DataFrame): Normalized establishment records (or partial counts
+            already holding COUNT_COLUMN, which are then summed)
+        
+    Returns:
+        pd.DataFrame: One row per key with the establishment count
+    """
+    if COUNT_COLUMN in df.columns:
+        keys = [col for col in df.columns if col != COUNT_COLUMN]
+        return df.groupby(keys, dropna=False, observed=True)[COUNT_COLUMN].sum().reset_index()
+    return df.groupby(list(df.columns), dropna=False, observed=True).size().reset_index(name=COUNT_COLUMN)
+
+def opcoes_dataset(table) -> dict:
+    """
+    Returns the Parquet writer options used by the partitioned layout.
+    
+    Args:
+        table (pa.Table): Table to be written (used to pick the key columns)
+        
+    Returns:
+        dict: zstd compression, dictionary encoding restricted to the key
+        columns and column statistics
+    """
+    return {
+        'compression': COMPRESSION,
+        'use_dictionary': [col for col in KEY_COLUMNS if col in table.column_names],
+        'write_statistics': True,
+    }
+
+def tabela_particao(data, schema=None) -> pa.Table:
+    """
+    Converts data to the Arrow table stored inside an ano=YYYY/ partition.
+    
+    The 'ano' column (present in CSV files) is dropped because the partition
+    directory already carries it and the two would conflict when the dataset
+    is read with hive partitioning.
+    
+    Args:
+        data (pd.DataFrame | pa.Table): Normalized records
+        schema (pa.Schema): Optional schema to conform to (used when streaming)
+        
+    Returns:
+        pa.Table: Table without the partition column
+    """
+    if isinstance(data, pd.DataFrame):
+        data = data.drop(columns=['ano'], errors='ignore')
+        return pa.Table.from_pandas(data, schema=schema, preserve_index=False)
+    if 'ano' in data.column_names:
+        data = data.drop_columns(['ano'])
+    return data
+
+def grava_parquet(data, out_file, layout=LAYOUT) -> None:
+    """
+    Writes normalized records to out_file according to the output layout.
+    
+    Args:
+        data (pd.DataFrame | pa.Table): Normalized records
+        out_file (str): Full path of the Parquet file (see arquivo_saida)
+        layout (str): 'files' keeps the original writers (fastparquet for pandas,
+            pyarrow defaults for Arrow); 'partitioned' writes with opcoes_dataset
+            and row groups of ROW_GROUP_SIZE rows
+    """
+    if layout == 'partitioned':
+        table = tabela_particao(data)
+        pq.write_table(table, out_file, row_group_size=ROW_GROUP_SIZE, **opcoes_dataset(table))
+    elif isinstance(data, pa.Table):
+        pq.write_table(data, out_file)
+    else:
+        data.to_parquet(out_file, engine='fastparquet', index=False)
+
+def normaliza_em_lotes(path, out_file, ext, batch_size=BATCH_SIZE, aggregate=False, layout=LAYOUT) -> tuple:
+    """
+    Reads a raw file in fixed-size batches and writes each one as a Parquet row group.
+    
+    Streaming counterpart of normaliza_csv/normaliza_txt: peak memory is bounded
+    by batch_size instead of the file size. Each batch receives the same column
+    projection and CNAE filter as the in-memory path and is appended to out_file.
+    
+    Args:
+        path (str): Full path to the raw CSV/TXT file (or a binary stream)
+        out_file (str): Full path of the Parquet file to be written
+        ext (str): File extension ('csv' or 'txt')
+        batch_size (int): Number of rows read per batch
+        aggregate (bool): If True, each batch is reduced to counts and the
+            partial counts are merged and written once at the end
+        layout (str): Output layout ('files' or 'partitioned', see grava_parquet)
+        
+    Returns:
+        tuple: (rows read, rows written to out_file)
+        
+    Notes:
+        - Every batch is read with the PANDAS_DTYPES map, so all row groups
+          share one schema (per-batch type inference could diverge, e.g. a
+          batch without '000-1' would parse CNAE as integer). It may differ
+          from the types inferred by the in-memory path (e.g. CNAE as text
+          instead of float in CSV files, municipality as a nullable integer
+          instead of float when it has missing values); the Silver layer
+          produces the same output from both
+        - Prints rows read, rows kept and throughput (rows/second) at the end
+    """
+    if ext == 'txt':
+        reader = pd.read_csv(path, dtype=tipos_pandas('txt'), chunksize=batch_size, **TXT_READ_OPTIONS)
+    else:
+        reader = pd.read_csv(path, dtype=tipos_pandas('csv'), chunksize=batch_size)
+
+    start = time.time()
+    rows_in = 0
+    rows_out = 0
+    partials = []
+    writer = None
+    try:
+        for chunk in reader:
+            rows_in += len(chunk)
+            if ext == 'txt':
+                chunk = chunk[chunk['CNAE 2.0 Classe'] != '000-1']
+            if aggregate:
+                partials.append(agrega_contagens(chunk))
+                continue
+            if layout == 'partitioned':
+                table = tabela_particao(chunk, schema=writer.schema if writer else None)
+                if writer is None:
+                    writer = pq.ParquetWriter(out_file, table.schema, **opcoes_dataset(table))
+                writer.write_table(table, row_group_size=ROW_GROUP_SIZE)
+            else:
+                # O primeiro lote cria o arquivo; os seguintes viram novos row groups
+                fastparquet.write(out_file, chunk, write_index=False, append=rows_out > 0)
+            rows_out += len(chunk)
+    finally:
+        if writer is not None:
+            writer.close()
+
+    if aggregate and partials:
+        counts = agrega_contagens(pd.concat(partials, ignore_index=True))
+        grava_parquet(counts, out_file, layout)
+        rows_out = len(counts)
+
+    elapsed = time.time() - start
+    rate = rows_in / elapsed if elapsed > 0 else float('inf')
+    print(f"  {rows_in} linhas lidas, {rows_out} mantidas ({rate:,.0f} linhas/s)")
+    return rows_in, rows_out
+
+def normaliza_arrow(path, out_file, ext, aggregate=False, layout=LAYOUT) -> tuple:
+    """
+    Reads a raw file with the multithreaded PyArrow CSV reader and writes Parquet directly.
+    
+    Alternative backend to normaliza_csv/normaliza_txt. Columns are parsed with
+    the explicit types in ARROW_SCHEMAS (municipality as int32, CNAE class as a
+    dictionary-encoded string) instead of pandas object strings, and the table
+    is written to Parquet without a pandas round trip.
+    
+    Args:
+        path (str): Full path to the raw CSV/TXT file (or a binary stream)
+        out_file (str): Full path of the Parquet file to be written
+        ext (str): File extension ('csv' or 'txt')
+        aggregate (bool): If True, writes counts per distinct key (see agrega_contagens)
+        layout (str): Output layout ('files' or 'partitioned', see grava_parquet)
+        
+    Returns:
+        tuple: (rows read, rows written to out_file)
+        
+    Notes:
+        - TXT files are transcoded from latin1 by the reader itself
+        - Only 'Município' and 'CNAE 2.0 Classe' are materialized for TXT files
+        - CSV files keep all their columns; known ones get typed by ARROW_SCHEMAS
+    """
+    if ext == 'txt':
+        read_options = pv.ReadOptions(encoding='latin1')
+        parse_options = pv.ParseOptions(delimiter=';')
+        convert_options = pv.ConvertOptions(
+            include_columns=TXT_READ_OPTIONS['usecols'],
+            column_types=ARROW_SCHEMAS['txt'],
+            strings_can_be_null=True,
+        )
+    else:
+        read_options = pv.ReadOptions()
+        parse_options = pv.ParseOptions()
+        convert_options = pv.ConvertOptions(column_types=ARROW_SCHEMAS['csv'], strings_can_be_null=True)
+
+    table = pv.read_csv(path, read_options=read_options, parse_options=parse_options, convert_options=convert_options)
+    rows_in = table.num_rows
+    if ext == 'txt':
+        # CNAE nulo fica, como no pandas (NaN != '000-1'); o filtro do Arrow descartaria a máscara nula
+        table = table.filter(pc.fill_null(pc.not_equal(table['CNAE 2.0 Classe'], '000-1'), True))
+    if aggregate:
+        # Cada bloco lido em paralelo tem seu próprio dicionário de classes CNAE
+        table = table.unify_dictionaries()
+        table = table.group_by(table.column_names).aggregate([([], 'count_all')])
+        table = table.rename_columns(table.column_names[:-1] + [COUNT_COLUMN])
+
+    grava_parquet(table, out_file, layout)
+    return rows_in, table.num_rows
+
+def membro_gz(path) -> str:
+    """Returns the inner file name of a gzip file ('ESTB2019.txt.gz' -> 'ESTB2019.txt')."""
+    return os.path.basename(path)[:-len('.gz')]
+
+@contextmanager
+def abre_gz(path, member):
+    """Yields the decompressed gzip contents as a binary stream."""
+    with gzip.open(path, 'rb') as stream:
+        yield stream
+
+def membro_zip(path) -> str:
+    """Returns the first member of a zip archive with a registered reader."""
+    with zipfile.ZipFile(path) as zf:
+        for name in zf.namelist():
+            if name.rsplit('.', 1)[-1].lower() in LEITORES:
+                return name
+    raise ValueError(f"Nenhum arquivo suportado em: {os.path.basename(path)}")
+
+@contextmanager
+def abre_zip(path, member):
+    """Yields a zip member as a binary stream decompressed on the fly."""
+    with zipfile.ZipFile(path) as zf, zf.open(member) as stream:
+        yield stream
+
+def binario_7z() -> str:
+    """Returns the 7-Zip executable available on PATH."""
+    for name in ('7z', '7za', '7zz'):
+        binary = shutil.which(name)
+        if binary:
+            return binary
+    raise ValueError("Arquivos .7z exigem o 7-Zip (7z/7za/7zz) instalado no PATH")
+
+def membro_7z(path) -> str:
+    """Returns the first member of a 7z archive with a registered reader."""
+    listing = subprocess.run([binario_7z(), 'l', '-ba', '-slt', path],
+                             capture_output=True, text=True, check=True).stdout
+    for line in listing.splitlines():
+        if line.startswith('Path = '):
+            name = line[len('Path = '):]
+            if name.rsplit('.', 1)[-1].lower() in LEITORES:
+                return name
+    raise ValueError(f"Nenhum arquivo suportado em: {os.path.basename(path)}")
+
+@contextmanager
+def abre_7z(path, member):
+    """
+    Yields a 7z member as a binary stream.
+    
+    The member is decompressed by a 7-Zip subprocess writing to stdout (-so),
+    so the uncompressed file is never written to disk. Once the reader is done
+    the rest of the stream is drained and the exit code checked, so a corrupt
+    or truncated archive fails instead of yielding a truncated file.
+    
+    Raises:
+        ValueError: If 7-Zip exits with an error code (its stderr is in the
+            message), also when the reader already failed on the truncated data
+    """
+    with tempfile.TemporaryFile() as stderr:
+        proc = subprocess.Popen([binario_7z(), 'e', '-so', path, member],
+                                stdout=subprocess.PIPE, stderr=stderr)
+        try:
+            yield proc.stdout
+            while proc.stdout.read(1 << 20):
+                pass
+        finally:
+            proc.stdout.close()
+            if proc.poll() is None:
+                proc.kill()
+            # Código negativo: processo encerrado aqui porque o leitor parou antes
+            if proc.wait() > 0:
+                stderr.seek(0)
+                message = stderr.read().decode(errors='replace').strip()
+                raise ValueError(f"7-Zip falhou ({proc.returncode}) em {os.path.basename(path)}: {message}")
+
+registra_leitor('csv', normaliza_csv)
+registra_leitor('txt', normaliza_txt)
+registra_conteiner('gz', membro_gz, abre_gz)
+registra_conteiner('zip', membro_zip, abre_zip)
+registra_conteiner('7z', membro_7z, abre_7z)
+
+def nome_interno(path) -> str:
+    """
+    Returns the name of the data file behind path.
+    
+    For compressed containers this is the member that will be read
+    (e.g., 'ESTB2019.txt' inside 'ESTB2019.zip'); otherwise the file name itself.
+    
+    Args:
+        path (str): Full path to the raw file
+        
+    Returns:
+        str: Data file name
+    """
+    container = os.path.basename(path).rsplit('.', 1)[-1].lower()
+    if container in CONTEINERES:
+        membro, _ = CONTEINERES[container]
+        return os.path.basename(membro(path))
+    return os.path.basename(path)
+
+@contextmanager
+def abre_entrada(path):
+    """
+    Yields the source to be handed to the readers.
+    
+    Uncompressed files are yielded as their path (so readers keep their
+    native file handling); compressed ones as a decompressing binary stream.
+    
+    Args:
+        path (str): Full path to the raw file
+    """
+    container = os.path.basename(path).rsplit('.', 1)[-1].lower()
+    if container not in CONTEINERES:
+        yield path
+        return
+    membro, abre = CONTEINERES[container]
+    with abre(path, membro(path)) as stream:
+        yield stream
+
+def arquivo_saida(file_name, raw_path, out_path, layout=LAYOUT) -> str:
+    """
+    Returns the Parquet path produced for a raw file.
+    
+    Compressed files are named after their inner member, so 'ESTB2019.txt.gz'
+    and 'ESTB2019.zip' (containing 'ESTB2019.txt') both produce 'ESTB2019.parquet'.
+    In the partitioned layout the file goes into the hive partition of its
+    year, taken from the last four digits of the name.
+    
+    Args:
+        file_name (str): Name of the raw file (e.g., 'ESTB2019.txt')
+        raw_path (str): Directory path containing the raw file
+        out_path (str): Directory where the Parquet file is saved
+        layout (str): 'files' or 'partitioned'
+        
+    Returns:
+        str: Full output path (e.g., '<out_path>/ESTB2019.parquet' or
+        '<out_path>/ano=2019/ESTB2019.parquet')
+    """
+    stem = os.path.splitext(nome_interno(os.path.join(raw_path, file_name)))[0]
+    if layout == 'partitioned':
+        return os.path.join(out_path, f'ano={int(stem[-4:])}', stem + '.parquet')
+    return os.path.join(out_path, stem + '.parquet')
+
+def normaliza_tipos(file_name, raw_path, out_path, streaming=False, batch_size=BATCH_SIZE, engine=ENGINE,
+                    aggregate=AGGREGATE, layout=LAYOUT):
     """
     Processes raw data files and converts them to Parquet format.
     
     This function acts as a dispatcher that:
-    - Determines file type based on extension
-    - Applies appropriate normalization function (CSV or TXT)
+    - Resolves the data file (the inner member for .gz, .zip and .7z inputs)
+    - Determines file type based on its extension
+    - Applies the reader registered for that type (CSV or TXT)
     - Saves the result as a Parquet file in the output directory
     
+    Compressed inputs are decoded as a stream straight into the reader; the
+    uncompressed file is never materialized on disk.
+    
+    In streaming mode the file is read in batches of batch_size rows and each
+    batch is appended as a row group (see normaliza_em_lotes), keeping memory
+    flat regardless of file size. Streaming is a pandas reader mode and is
+    rejected with engine='arrow'.
+    
+    With engine='arrow' the file is parsed by the PyArrow CSV reader with
+    explicit column types and written straight from the Arrow table (see
+    normaliza_arrow); engine='pandas' keeps the original pd.read_csv path.
+    
+    With aggregate=True the year is collapsed into establishment counts per
+    (municipality, CNAE class) in COUNT_COLUMN instead of one row per
+    establishment; silver and gold consume these counts as weights.
+    
+    With layout='partitioned' the output is a hive-partitioned dataset
+    (out_path/ano=YYYY/) written with zstd compression, dictionary-encoded
+    key columns, sized row groups and column statistics.
+    
     Args:
-        file_name (str): Name of the file to process (e.g., 'ESTB2019.csv')
+        file_name (str): Name of the file to process (e.g., 'ESTB2019.csv' or 'ESTB2019.txt.gz')
         raw_path (str): Directory path containing the raw input file
         out_path (str): Directory path where the Parquet file will be saved
+        streaming (bool): If True, reads and writes the file in batches
+        batch_size (int): Rows per batch when streaming
+        engine (str): Reader backend, 'pandas' or 'arrow'
+        aggregate (bool): If True, writes counts instead of establishment rows
+        layout (str): Output layout, 'files' or 'partitioned'
         
     Raises:
-        ValueError: If the file extension is not supported (must be .csv or .txt)
+        ValueError: If the file extension has no registered reader, the
+            engine is unknown, streaming is requested with engine='arrow' or
+            a compressed input fails to decompress (no output is left behind)
         
     Returns:
-        None: Saves the processed file as Parquet in the output directory
+        dict: Summary of the conversion with keys 'file', 'rows_in', 'rows_out',
+        'seconds' and 'output_bytes'. The Parquet file is saved in the output directory
         
     Example:
-        normaliza_tipos('ESTB2019.csv', '/data/raw', '/data/bronze')
+        normaliza_tipos('ESTB2019.txt.gz', '/data/raw', '/data/bronze')
         # Creates /data/bronze/ESTB2019.parquet
     """
-    ext = file_name.split('.')[-1]
+    start = time.time()
     file_path = os.path.join(raw_path, file_name)
-    if ext == 'csv':
-        df = normaliza_csv(file_path)
-    elif ext == 'txt':
-        df = normaliza_txt(file_path)
-    else:
+    ext = nome_interno(file_path).rsplit('.', 1)[-1].lower()
+    if ext not in LEITORES:
         raise ValueError(f"Extensão não suportada: {ext}")
-    
-    out_file = os.path.join(out_path, file_name.replace(ext, 'parquet'))
-    df.to_parquet(out_file, engine='fastparquet', index=False)
+    if engine not in ('pandas', 'arrow'):
+        raise ValueError(f"Engine não suportada: {engine}")
+    if streaming and engine == 'arrow':
+        raise ValueError("Leitura em lotes (streaming) não é suportada com engine='arrow'")
+
+    out_file = arquivo_saida(file_name, raw_path, out_path, layout)
+    os.makedirs(os.path.dirname(out_file), exist_ok=True)
+
+    try:
+        with abre_entrada(file_path) as source:
+            if engine == 'arrow' and ext in ARROW_SCHEMAS:
+                rows_in, rows_out = normaliza_arrow(source, out_file, ext, aggregate, layout)
+            elif streaming and ext in ('csv', 'txt'):
+                rows_in, rows_out = normaliza_em_lotes(source, out_file, ext, batch_size, aggregate, layout)
+            else:
+                df = LEITORES[ext](source)
+                rows_in = df.attrs.get('rows_in', len(df))
+                if aggregate:
+                    df = agrega_contagens(df)
+                grava_parquet(df, out_file, layout)
+                rows_out = len(df)
+    except Exception:
+        # Um arquivo comprimido corrompido pode falhar só ao fechar o fluxo, depois
+        # de gravada a saída truncada: ela é removida para não chegar à Silver
+        if os.path.exists(out_file):
+            os.remove(out_file)
+        raise
+
+    return {
+        'file': file_name,
+        'rows_in': rows_in,
+        'rows_out': rows_out,
+        'seconds': time.time() - start,
+        'output_bytes': os.path.getsize(out_file) if os.path.exists(out_file) else 0,
+    }
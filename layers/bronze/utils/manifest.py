@@ -0,0 +1,77 @@
+import os
+from layers.common.manifest import content_hash
+
+# Incrementar quando a conversão mudar de forma a invalidar os Parquet já gerados
+READER_VERSION = '1'
+
+def fingerprint(path, reader_version, output_file) -> dict:
+    """
+    Builds the manifest entry for a raw file.
+    
+    Args:
+        path (str): Full path to the raw file
+        reader_version (str): Version of the conversion code (see versao_leitor)
+        output_file (str): Full path of the Parquet produced from the raw file
+        
+    Returns:
+        dict: Entry with size, mtime, content hash, reader version and output path
+    """
+    stat = os.stat(path)
+    return {
+        'size': stat.st_size,
+        'mtime': stat.st_mtime,
+        'hash': content_hash(path),
+        'reader_version': reader_version,
+        'output': str(output_file),
+    }
+
+def versao_leitor(engine, aggregate=False) -> str:
+    """
+    Returns the reader version recorded in the manifest.
+    
+    The engine is part of the version because the pandas and Arrow readers
+    produce Parquet files with different column types, and so is the
+    aggregation flag, which changes the output from rows to counts.
+    
+    Args:
+        engine (str): Reader backend ('pandas' or 'arrow')
+        aggregate (bool): Whether the output holds pre-aggregated counts
+        
+    Returns:
+        str: Reader version identifier
+    """
+    return f'{READER_VERSION}-{engine}' + ('-agg' if aggregate else '')
+
+def arquivo_atualizado(entry, path, reader_version, output_file) -> bool:
+    """
+    Checks whether a raw file's previous conversion is still valid.
+    
+    The output must still exist, the reader version and output path must match,
+    and the raw file must be unchanged. Size and mtime are compared first; the
+    content hash is only recomputed when those differ but the size still
+    matches (e.g., a file copied again with a new mtime), and in that case the
+    entry's mtime is refreshed in place.
+    
+    Args:
+        entry (dict): Manifest entry for the file (or None)
+        path (str): Full path to the raw file
+        reader_version (str): Current reader version
+        output_file (str): Expected Parquet output path
+        
+    Returns:
+        bool: True if the file can be skipped
+    """
+    if not entry or entry.get('reader_version') != reader_version:
+        return False
+    if entry.get('output') != str(output_file) or not os.path.exists(output_file):
+        return False
+
+    stat = os.stat(path)
+    if stat.st_size != entry.get('size'):
+        return False
+    if stat.st_mtime == entry.get('mtime'):
+        return True
+    if content_hash(path) == entry.get('hash'):
+        entry['mtime'] = stat.st_mtime
+        return True
+    return False
\ No newline at end of file
@@ -0,0 +1,71 @@
+import os
+import json
+import hashlib
+
+# Manifestos e hash de conteúdo compartilhados pelas camadas: a bronze registra
+# os arquivos convertidos e a silver as dimensões; a gold lê o manifesto das
+# dimensões e usa o mesmo hash nos anos da Silver
+
+def manifest_path(out_path) -> str:
+    """
+    Returns the path of the manifest kept next to an output directory.
+    
+    The manifest lives beside (not inside) out_path so that the next layer,
+    which lists every file in the output directory, never sees it.
+    
+    Args:
+        out_path (str): Output directory (e.g., OUT_PATH_ESTB_BRONZE, DIM_OUT_PATH)
+        
+    Returns:
+        str: Full path of the manifest JSON file
+    """
+    out_path = os.path.normpath(str(out_path))
+    return os.path.join(os.path.dirname(out_path), f'manifest_{os.path.basename(out_path)}.json')
+
+def carrega_manifesto(out_path) -> dict:
+    """
+    Loads the manifest for out_path.
+    
+    Args:
+        out_path (str): Output directory
+        
+    Returns:
+        dict: Entries keyed by source file or dimension name (empty if no
+        manifest exists yet)
+    """
+    path = manifest_path(out_path)
+    if not os.path.exists(path):
+        return {}
+    with open(path, encoding='utf-8') as f:
+        return json.load(f)
+
+def salva_manifesto(out_path, manifest) -> None:
+    """
+    Persists the manifest atomically (write to temp file + rename).
+    
+    Args:
+        out_path (str): Output directory
+        manifest (dict): Entries keyed by source file or dimension name
+    """
+    path = manifest_path(out_path)
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(manifest, f, indent=2, sort_keys=True)
+    os.replace(tmp_path, path)
+
+def content_hash(path, chunk_size=8 * 1024 * 1024) -> str:
+    """
+    Computes the BLAKE2b digest of a file, reading it in fixed-size chunks.
+    
+    Args:
+        path (str): Full path to the file
+        chunk_size (int): Bytes read per iteration
+        
+    Returns:
+        str: Hexadecimal digest
+    """
+    digest = hashlib.blake2b(digest_size=32)
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
\ No newline at end of file
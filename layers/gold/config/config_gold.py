@@ -1,6 +1,89 @@
+import os
 from pathlib import Path
+from dotenv import load_dotenv
+
+load_dotenv()
 
 BASE_DIR = Path(__file__).resolve().parents[2]  # sobe 2 níveis
 PATH_ESTB_SILVER = BASE_DIR / 'silver' / 'data' / 'estabelecimentos'
 PATH_ESTB_GOLD = BASE_DIR / 'gold' / 'data' / 'estabelecimentos'
 DIM_PATH = BASE_DIR / 'silver' / 'data' / 'dimensions'
+
+
+# Coluna com a contagem de estabelecimentos quando a Silver é pré-agregada
+COUNT_COLUMN = 'qtd_estabelecimentos'
+
+# Chaves armazenadas como varchar no banco e largura do zero-padding usado na
+# apresentação quando a Silver grava chaves inteiras (SILVER_INTEGER_KEYS)
+TEXT_KEYS = ['id_uf', 'id_mesorregiao', 'id_microrregiao', 'id_municipio', 'classe', 'grupo', 'divisao', 'secao']
+KEY_WIDTHS = {'classe': 5}
+
+
+# Engine do QL: 'pandas' (groupbys sobre o arquivo enriquecido), 'cube'
+# (contagem única por ano × município × classe, agregada na hierarquia),
+# 'sparse' (todas as tabelas fato pela matriz esparsa região × atividade) ou
+# 'duckdb' (leitura da Silver, enriquecimento e contagens em um plano DuckDB
+# multi-thread; utils/duckdb_ql.py)
+QL_ENGINE = os.getenv("GOLD_QL_ENGINE", "pandas")
+
+# Threads da engine DuckDB (vazio: uma por núcleo)
+DUCKDB_THREADS = int(os.getenv("GOLD_DUCKDB_THREADS")) if os.getenv("GOLD_DUCKDB_THREADS") else None
+
+# Níveis CNAE finos (grupo, classe) calculados além de seção e divisão, pela
+# engine selecionada, e os níveis geográficos em que são calculados (muni,
+# micro, meso). Opcionais: vazios (padrão) não calculam os níveis finos;
+# exigem a dim_cnae com grupo, gerada pela Silver
+FINE_CNAE_LEVELS = [level for level in os.getenv("GOLD_FINE_CNAE_LEVELS", "").split(",") if level]
+FINE_GEO_LEVELS = [level for level in os.getenv("GOLD_FINE_GEO_LEVELS", "").split(",") if level]
+
+# Indicadores de especialização e concentração (HHI, coeficiente de
+# especialização e Gini locacional; utils/indicators.py) gravados junto com o
+# QL de seção e divisão; opcionais (GOLD_INDICATORS=1)
+INDICATORS = os.getenv("GOLD_INDICATORS", "0") == "1"
+
+# Grão do cubo após o roll-up de classe para divisão: todas as colunas usadas
+# pelas tabelas fato (a seção é função da divisão); os níveis CNAE finos
+# habilitados entram no grão (cube_columns)
+CUBE_COLUMNS = ['ano', 'id_uf', 'id_mesorregiao', 'id_microrregiao', 'id_municipio', 'secao', 'divisao']
+
+# Entrega do DataFrame enriquecido aos processos de QL: com GOLD_SHARED_HANDOFF=1
+# ele é publicado uma vez como arquivo Arrow IPC em SHARED_DIR (memória
+# compartilhada em /dev/shm) e mapeado pelos workers, em vez de ser serializado
+# (pickle) uma vez por worker; o pool de processos é mantido entre os anos
+SHARED_HANDOFF = os.getenv("GOLD_SHARED_HANDOFF", "0") == "1"
+SHARED_DIR = os.getenv("GOLD_SHARED_DIR", "/dev/shm" if os.path.isdir("/dev/shm") else None)
+
+# Passagem única sobre vários anos (GOLD_MULTI_YEAR=1): todos os anos da Silver
+# são contados em um único cubo e cada tabela fato é calculada e gravada uma
+# vez; GOLD_YEAR_START/GOLD_YEAR_END restringem os anos (inclusive) nos dois modos
+MULTI_YEAR = os.getenv("GOLD_MULTI_YEAR", "0") == "1"
+YEAR_START = int(os.getenv("GOLD_YEAR_START")) if os.getenv("GOLD_YEAR_START") else None
+YEAR_END = int(os.getenv("GOLD_YEAR_END")) if os.getenv("GOLD_YEAR_END") else None
+
+# Carga incremental (GOLD_INCREMENTAL=1): mantém o banco carregado e recalcula
+# apenas os anos cuja Silver mudou desde a última carga (dimensional.carga_gold),
+# substituindo só as linhas desses anos nas tabelas fato; mudança de dimensão
+# ou da versão da Gold leva a uma carga completa
+INCREMENTAL = os.getenv("GOLD_INCREMENTAL", "0") == "1"
+
+# Carga das tabelas no PostgreSQL: 'copy' (COPY ... FROM STDIN em CSV, a partir
+# de um buffer em memória, em blocos de GOLD_LOAD_CHUNKSIZE linhas) ou 'insert'
+# (DataFrame.to_sql, também usado quando o driver não oferece COPY)
+LOAD_METHOD = os.getenv("GOLD_LOAD_METHOD", "copy")
+LOAD_CHUNKSIZE = int(os.getenv("GOLD_LOAD_CHUNKSIZE", "100000"))
+
+# Conexão com o PostgreSQL (variáveis de ambiente ou .env); sem
+# GOLD_DB_PASSWORD o libpq usa PGPASSWORD ou ~/.pgpass
+DB_USER = os.getenv("GOLD_DB_USER", "postgres")
+DB_PASSWORD = os.getenv("GOLD_DB_PASSWORD")
+DB_HOST = os.getenv("GOLD_DB_HOST", "localhost")
+DB_PORT = int(os.getenv("GOLD_DB_PORT", "5432"))
+DB_NAME = os.getenv("GOLD_DB_NAME", "rais")
+
+# Pool de conexões, um por processo (utils/db_config.py): conexões mantidas
+# abertas, conexões extras permitidas nos picos, segundos de espera por uma
+# conexão livre antes do erro e idade máxima de uma conexão (-1: sem limite)
+DB_POOL_SIZE = int(os.getenv("GOLD_DB_POOL_SIZE", "5"))
+DB_MAX_OVERFLOW = int(os.getenv("GOLD_DB_MAX_OVERFLOW", "10"))
+DB_POOL_TIMEOUT = float(os.getenv("GOLD_DB_POOL_TIMEOUT", "30"))
+DB_POOL_RECYCLE = int(os.getenv("GOLD_DB_POOL_RECYCLE", "-1"))
\ No newline at end of file
@@ -0,0 +1,90 @@
+#%%
+import time
+import argparse
+import pandas as pd
+from layers.gold.utils import process_data
+from layers.gold.utils.db_config import create_engine_connection
+from layers.gold.utils.db_insertion import format_keys, write_frame
+from layers.gold.config.config_gold import PATH_ESTB_SILVER, DIM_PATH, LOAD_CHUNKSIZE
+
+def calcula_tabelas(file_name, silver_path=PATH_ESTB_SILVER, dim_path=DIM_PATH, engine='sparse') -> dict:
+    """
+    Compute the fact tables of one Silver year without writing them.
+    
+    Args:
+        file_name: Silver file or partition (e.g., 'ESTB2019.parquet')
+        silver_path: Silver establishments directory
+        dim_path: Dimension directory
+        engine: A QL engine that runs in the calling process ('sparse' or 'duckdb')
+    
+    Returns:
+        dict: Table name -> DataFrame as it is loaded (format_keys)
+    """
+    tabelas = {}
+    def captura(df1, df2, table_names):
+        for df, table_name in zip((df1, df2), table_names):
+            if df is not None:
+                tabelas.setdefault(table_name, []).append(df)
+
+    save_to_db = process_data.save_to_db
+    process_data.save_to_db = captura
+    try:
+        process_data.process_data(file_name, silver_path, None, dim_path, engine=engine)
+    finally:
+        process_data.save_to_db = save_to_db
+    return {table_name: format_keys(pd.concat(frames, ignore_index=True)) for table_name, frames in tabelas.items()}
+
+def compara_carga(file_name, silver_path=PATH_ESTB_SILVER, dim_path=DIM_PATH, chunksize=LOAD_CHUNKSIZE,
+                  methods=('insert', 'copy')) -> pd.DataFrame:
+    """
+    Measure the load rate (rows/second) of every fact table with each load method.
+    
+    The tables of one Silver year are computed once, then appended to the
+    existing dimensional schema of the configured PostgreSQL database with
+    each method (write_frame) inside a transaction that is rolled back, so
+    the database is left untouched.
+    
+    Args:
+        file_name: Silver file or partition (e.g., 'ESTB2019.parquet')
+        silver_path: Silver establishments directory
+        dim_path: Dimension directory, in the same key mode as the Silver file
+        chunksize: Rows per COPY chunk
+        methods: Load methods to compare ('insert' and/or 'copy')
+    
+    Returns:
+        pd.DataFrame: One row per table and method with rows, seconds and rows/s
+    
+    Notes:
+        - Requires the schema to exist (a previous gold run or create_database)
+          with its dimensions loaded, since the fact tables have foreign keys
+    """
+    tabelas = calcula_tabelas(file_name, silver_path, dim_path)
+    engine = create_engine_connection()
+    results = []
+    for table_name, df in sorted(tabelas.items()):
+        for method in methods:
+            with engine.connect() as conn:
+                transaction = conn.begin()
+                start = time.perf_counter()
+                write_frame(conn, df, table_name, method=method, chunksize=chunksize)
+                segundos = time.perf_counter() - start
+                transaction.rollback()
+            results.append({'tabela': table_name, 'metodo': method, 'linhas': len(df),
+                            'segundos': segundos, 'linhas_s': len(df) / segundos})
+
+    results = pd.DataFrame(results)
+    print(f"Carga das tabelas fato ({file_name}, blocos de {chunksize} linhas):")
+    print(results.to_string(index=False, float_format=lambda v: f"{v:.2f}"))
+    totais = results.groupby('metodo')[['linhas', 'segundos']].sum()
+    print((totais['linhas'] / totais['segundos']).rename('linhas_s').to_string(float_format=lambda v: f"{v:.0f}"))
+    return results
+
+if __name__ == "__main__":
+    # Uso: python -m layers.gold.scripts.benchmark_copy ESTB2019.parquet [diretório_silver] [diretório_dimensões] [--chunksize 100000]
+    parser = argparse.ArgumentParser(description="Compara a carga por INSERT (to_sql) e por COPY em cada tabela fato")
+    parser.add_argument('file_name')
+    parser.add_argument('silver_path', nargs='?', default=PATH_ESTB_SILVER)
+    parser.add_argument('dim_path', nargs='?', default=DIM_PATH)
+    parser.add_argument('--chunksize', type=int, default=LOAD_CHUNKSIZE)
+    args = parser.parse_args()
+    compara_carga(args.file_name, args.silver_path, args.dim_path, args.chunksize)
\ No newline at end of file
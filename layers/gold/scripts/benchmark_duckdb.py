@@ -0,0 +1,84 @@
+#%%
+import os
+import time
+import pickle
+import argparse
+import tempfile
+import pandas as pd
+from layers.gold.utils import process_data
+from layers.gold.config.config_gold import PATH_ESTB_SILVER, DIM_PATH, YEAR_START, YEAR_END
+
+def captura(diretorio):
+    """save_to_db substituto: grava cada tabela em diretorio com pickle (funciona também nos workers)."""
+    def save(df1, df2, table_names):
+        for df, table_name in zip((df1, df2), table_names):
+            if df is not None:
+                with tempfile.NamedTemporaryFile(dir=diretorio, prefix=table_name + '__', delete=False) as f:
+                    pickle.dump(df, f)
+    return save
+
+def tabelas(diretorio) -> dict:
+    """Lê as tabelas gravadas por captura, concatenando as partes de cada uma em ordem de chave."""
+    partes = {}
+    for name in sorted(os.listdir(diretorio)):
+        with open(os.path.join(diretorio, name), 'rb') as f:
+            partes.setdefault(name.split('__')[0], []).append(pickle.load(f))
+    return {table_name: ordena(pd.concat(frames, ignore_index=True)) for table_name, frames in partes.items()}
+
+def ordena(df) -> pd.DataFrame:
+    """Ordena uma tabela fato pelas chaves (ano, região, atividade)."""
+    return df.sort_values(list(df.columns[:3])).reset_index(drop=True)
+
+def compara_backends(silver_path=PATH_ESTB_SILVER, dim_path=DIM_PATH, inicio=YEAR_START, fim=YEAR_END,
+                     engines=('pandas', 'duckdb')) -> pd.DataFrame:
+    """
+    Compare the gold backends on a range of Silver years.
+    
+    Each engine computes every fact table of the selected years in one pass
+    (process_years). The tables are captured instead of written to the
+    database and checked to be identical to the first engine's.
+    
+    Args:
+        silver_path: Silver establishments directory
+        dim_path: Dimension directory, in the same key mode as the Silver files
+        inicio: First year (None: the earliest)
+        fim: Last year (None: the latest)
+        engines: QL engines to compare; the first one is the reference
+    
+    Returns:
+        pd.DataFrame: One row per engine with the total seconds
+    """
+    file_names = process_data.select_years(os.listdir(silver_path), inicio, fim)
+    results, referencia = [], None
+    for engine in engines:
+        with tempfile.TemporaryDirectory() as diretorio:
+            process_data.save_to_db = captura(diretorio)
+            start = time.perf_counter()
+            process_data.process_years(file_names, silver_path, dim_path, engine=engine)
+            segundos = time.perf_counter() - start
+            process_data.shutdown_executor()
+            saida = tabelas(diretorio)
+
+        if referencia is None:
+            referencia = saida
+        assert saida.keys() == referencia.keys(), f"{engine}: tabelas diferentes"
+        for table_name, df in saida.items():
+            pd.testing.assert_frame_equal(referencia[table_name], df, obj=f"{engine} {table_name}")
+        results.append({'engine': engine, 'segundos': segundos})
+
+    results = pd.DataFrame(results)
+    anos = f"{process_data.file_year(file_names[0])}–{process_data.file_year(file_names[-1])}"
+    print(f"Backends da Gold ({len(file_names)} anos, {anos}, {len(referencia)} tabelas idênticas):")
+    print(results.to_string(index=False, float_format=lambda v: f"{v:.2f}"))
+    return results
+
+if __name__ == "__main__":
+    # Uso: python -m layers.gold.scripts.benchmark_duckdb [diretório_silver] [diretório_dimensões] [--inicio 2007] [--fim 2024] [--engines pandas,duckdb]
+    parser = argparse.ArgumentParser(description="Compara as engines da Gold (pandas e DuckDB) em um intervalo de anos")
+    parser.add_argument('silver_path', nargs='?', default=PATH_ESTB_SILVER)
+    parser.add_argument('dim_path', nargs='?', default=DIM_PATH)
+    parser.add_argument('--inicio', type=int, default=YEAR_START)
+    parser.add_argument('--fim', type=int, default=YEAR_END)
+    parser.add_argument('--engines', default='pandas,duckdb')
+    args = parser.parse_args()
+    compara_backends(args.silver_path, args.dim_path, args.inicio, args.fim, args.engines.split(','))
\ No newline at end of file
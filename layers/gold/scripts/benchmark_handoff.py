@@ -0,0 +1,151 @@
+#%%
+import os
+import sys
+import json
+import time
+import pickle
+import argparse
+import resource
+import threading
+import subprocess
+import pandas as pd
+from layers.gold.utils import process_data
+from layers.gold.config.config_gold import PATH_ESTB_SILVER, DIM_PATH
+
+def mede_modo(modo, file_path, dim_path, anos) -> dict:
+    """
+    Run calculate_indexes anos times on one enriched year in the given hand-off mode.
+    
+    Meant to run in a fresh process (see compara_handoff), so that peak RSS
+    reflects only this mode. Database writes are disabled.
+    
+    Args:
+        modo: 'pickle' (fresh pool, frame pickled per worker) or 'shared'
+            (Arrow IPC in shared memory, pool kept alive across years)
+        file_path: Silver file or partition directory
+        dim_path: Dimension directory
+        anos: Number of simulated years (calculate_indexes calls)
+        
+    Returns:
+        dict: Seconds per year, parent serialization seconds per year and peak
+        RSS (MB) of the parent and of the largest worker (sampled VmRSS)
+    """
+    process_data.save_to_db = lambda *args, **kwargs: None  # sem gravar no banco
+    shared = modo == 'shared'
+    if shared:
+        process_data.start_executor()
+    df = process_data.merge_dimensions(file_path, dim_path)
+
+    pico = {'rss': 0}
+    parar = threading.Event()
+    amostrador = threading.Thread(target=amostra_rss_workers, args=(pico, parar))
+    amostrador.start()
+    start = time.perf_counter()
+    try:
+        for _ in range(anos):
+            process_data.calculate_indexes(df, shared=shared)
+        process_data.shutdown_executor()
+    finally:
+        parar.set()
+        amostrador.join()
+    elapsed = (time.perf_counter() - start) / anos
+
+    # ru_maxrss em KB no Linux
+    rss_pai = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+    rss_worker = pico['rss'] / 1024
+
+    # Custo de serialização no processo pai, medido depois para não afetar o pico
+    start = time.perf_counter()
+    if shared:
+        os.remove(process_data.publish_frame(df))
+    else:
+        for _ in range(3):
+            pickle.dumps(df, protocol=pickle.HIGHEST_PROTOCOL)
+    serializacao = time.perf_counter() - start
+
+    return {
+        'modo': modo,
+        'segundos_ano': elapsed,
+        'serializacao_s': serializacao,
+        'rss_pai_mb': rss_pai,
+        'rss_worker_mb': rss_worker,
+    }
+
+def amostra_rss_workers(pico, parar, intervalo=0.05) -> None:
+    """
+    Sample the resident memory of the worker processes until parar is set.
+    
+    The workers' own ru_maxrss is not used: a forked child starts with the
+    high-water mark of its parent, which would hide the difference between
+    the modes.
+    
+    Args:
+        pico: Dict whose 'rss' key receives the largest VmRSS seen (KB)
+        parar: threading.Event that ends the sampling
+        intervalo: Seconds between samples
+    """
+    while not parar.wait(intervalo):
+        for pid in filhos():
+            try:
+                with open(f'/proc/{pid}/status') as status:
+                    for line in status:
+                        if line.startswith('VmRSS:'):
+                            pico['rss'] = max(pico['rss'], int(line.split()[1]))
+            except (FileNotFoundError, ProcessLookupError):
+                continue
+
+def filhos() -> list:
+    """Return the pids of the direct children of this process (Linux /proc)."""
+    pids = []
+    for task in os.listdir('/proc/self/task'):
+        with open(f'/proc/self/task/{task}/children') as children:
+            pids.extend(children.read().split())
+    return pids
+
+def compara_handoff(file_name, silver_path=PATH_ESTB_SILVER, dim_path=DIM_PATH, anos=3) -> pd.DataFrame:
+    """
+    Compare the pickled hand-off with the shared-memory hand-off on one Silver year.
+    
+    Each mode runs in its own Python process (mede_modo) so peak RSS is not
+    shared between them; the year is processed anos times to show the effect
+    of keeping the pool alive.
+    
+    Args:
+        file_name: Silver file or partition (e.g., 'ESTB2019.parquet' or 'ano=2019')
+        silver_path: Silver establishments directory
+        dim_path: Dimension directory
+        anos: Number of simulated years
+        
+    Returns:
+        pd.DataFrame: One row per mode
+    """
+    results = []
+    for modo in ('pickle', 'shared'):
+        output = subprocess.run(
+            [sys.executable, '-m', 'layers.gold.scripts.benchmark_handoff', '--modo', modo,
+             file_name, str(silver_path), str(dim_path), '--anos', str(anos)],
+            check=True, capture_output=True, text=True,
+        ).stdout
+        results.append(json.loads(output.strip().splitlines()[-1]))
+
+    results = pd.DataFrame(results)
+    print(f"Entrega do DataFrame aos workers de QL ({file_name}, {anos} anos):")
+    print(results.to_string(index=False, float_format=lambda v: f"{v:.2f}"))
+    return results
+
+if __name__ == "__main__":
+    # Uso: python -m layers.gold.scripts.benchmark_handoff ESTB2019.parquet [diretório_silver] [diretório_dimensões]
+    parser = argparse.ArgumentParser(description="Compara pickle e memória compartilhada na entrega aos workers de QL")
+    parser.add_argument('file_name')
+    parser.add_argument('silver_path', nargs='?', default=PATH_ESTB_SILVER)
+    parser.add_argument('dim_path', nargs='?', default=DIM_PATH)
+    parser.add_argument('--anos', type=int, default=3)
+    parser.add_argument('--modo', choices=['pickle', 'shared'], help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.modo:
+        # Chamado por compara_handoff: mede um modo e devolve o resultado em JSON
+        file_path = os.path.join(args.silver_path, args.file_name)
+        print(json.dumps(mede_modo(args.modo, file_path, args.dim_path, args.anos)))
+    else:
+        compara_handoff(args.file_name, args.silver_path, args.dim_path, args.anos)
\ No newline at end of file
@@ -0,0 +1,83 @@
+#%%
+import os
+import sys
+import time
+import tempfile
+import tracemalloc
+import pandas as pd
+from layers.gold.utils import process_data
+from layers.gold.config.config_gold import PATH_ESTB_SILVER, DIM_PATH
+from layers.silver.utils.process_data import chaves_inteiras
+from layers.silver.utils.process_dimensions import INTEGER_CONVERSIONS
+
+def mede(func) -> tuple:
+    """Run func and return (seconds, peak traced memory in MB)."""
+    tracemalloc.start()
+    start = time.perf_counter()
+    func()
+    elapsed = time.perf_counter() - start
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return elapsed, peak / 1e6
+
+def executa_gold(file_path, dim_path) -> None:
+    """Merge dimensions and compute every QL level without writing to the database."""
+    df = process_data.merge_dimensions(file_path, dim_path)
+    for func in (process_data.calculate_idx_muni, process_data.calculate_idx_micro, process_data.calculate_idx_meso):
+        func(df)
+
+def compara_chaves(file_name, silver_path=PATH_ESTB_SILVER, dim_path=DIM_PATH) -> pd.DataFrame:
+    """
+    Compare textual and integer-coded keys on one full Silver year.
+    
+    The Silver file (textual keys) and the dimensions are converted in memory
+    to the integer mode (chaves_inteiras / INTEGER_CONVERSIONS) and written to a
+    temporary directory. For both modes it reports the in-memory size of the
+    Silver frame and the time and peak memory of merge_dimensions plus the
+    three QL calculations. Database writes are disabled during the run.
+    
+    Args:
+        file_name: Silver file with textual keys (e.g., 'ESTB2019.parquet')
+        silver_path: Silver establishments directory
+        dim_path: Dimension directory (textual keys)
+        
+    Returns:
+        pd.DataFrame: One row per key mode
+    """
+    save_to_db = process_data.save_to_db
+    process_data.save_to_db = lambda *args, **kwargs: None  # sem gravar no banco
+
+    try:
+        with tempfile.TemporaryDirectory() as tmp:
+            text_file = os.path.join(silver_path, file_name)
+            df_text = pd.read_parquet(text_file)
+            df_int = chaves_inteiras(df_text.copy())
+            int_file = os.path.join(tmp, file_name)
+            df_int.to_parquet(int_file, index=False)
+
+            int_dim_path = os.path.join(tmp, 'dimensions')
+            os.makedirs(int_dim_path)
+            for name, conv in INTEGER_CONVERSIONS.items():
+                dim = pd.read_parquet(os.path.join(dim_path, name + '.parquet'))
+                dim.astype({col: str for col in conv}).astype(conv).to_parquet(os.path.join(int_dim_path, name + '.parquet'), index=False)
+
+            results = []
+            for mode, path, dims, frame in [('texto', text_file, dim_path, df_text), ('inteiro', int_file, int_dim_path, df_int)]:
+                seconds, peak = mede(lambda: executa_gold(path, dims))
+                results.append({
+                    'chaves': mode,
+                    'silver_mb': frame.memory_usage(deep=True).sum() / 1e6,
+                    'gold_s': seconds,
+                    'pico_mb': peak,
+                })
+    finally:
+        process_data.save_to_db = save_to_db
+
+    results = pd.DataFrame(results)
+    print(f"Chaves texto vs inteiras ({file_name}, {len(df_text)} linhas):")
+    print(results.to_string(index=False, float_format=lambda v: f"{v:.2f}"))
+    return results
+
+if __name__ == "__main__":
+    # Uso: python -m layers.gold.scripts.benchmark_keys ESTB2019.parquet [diretório_silver]
+    compara_chaves(sys.argv[1], *sys.argv[2:3])
\ No newline at end of file
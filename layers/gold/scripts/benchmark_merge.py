@@ -0,0 +1,53 @@
+#%%
+import os
+import sys
+import pandas as pd
+from layers.gold.utils import process_data
+from layers.gold.config.config_gold import PATH_ESTB_SILVER, DIM_PATH
+from layers.gold.scripts.benchmark_keys import mede
+
+def merge_encadeado(file_path, dim_path) -> pd.DataFrame:
+    """Reference implementation: the five chained inner merges replaced by build_lookup/apply_lookup."""
+    df = process_data.read_establishments(file_path)
+    dims = {name: pd.read_parquet(os.path.join(dim_path, name + '.parquet'))
+            for name in ('dim_municipio', 'dim_microrregiao', 'dim_mesorregiao', 'dim_cnae', 'dim_uf')}
+
+    df = pd.merge(df, process_data.align_key(df, dims['dim_municipio'], 'id_municipio'), how='inner', on='id_municipio')
+    df = pd.merge(df, process_data.align_key(df, dims['dim_microrregiao'], 'id_microrregiao'), how='inner', on='id_microrregiao')
+    df = pd.merge(df, process_data.align_key(df, dims['dim_mesorregiao'], 'id_mesorregiao'), how='inner', on='id_mesorregiao')
+    df = pd.merge(df, process_data.align_key(df, dims['dim_cnae'], 'classe'), how='inner', on='classe')
+    df = pd.merge(df, process_data.align_key(df, dims['dim_uf'], 'id_uf'), how='inner', on='id_uf')
+    return df
+
+def compara_merge(file_name, silver_path=PATH_ESTB_SILVER, dim_path=DIM_PATH) -> pd.DataFrame:
+    """
+    Compare the chained merges with the precomputed lookup on one full Silver year.
+    
+    Both implementations run on the same file and dimensions; the time and
+    peak traced memory of each are reported, and the outputs are checked to
+    be identical (columns, dtypes and row order).
+    
+    Args:
+        file_name: Silver file or partition (e.g., 'ESTB2019.parquet' or 'ano=2019')
+        silver_path: Silver establishments directory
+        dim_path: Dimension directory, in the same key mode as the Silver file
+        
+    Returns:
+        pd.DataFrame: One row per implementation
+    """
+    file_path = os.path.join(silver_path, file_name)
+    outputs, results = {}, []
+    for name, func in [('merges', merge_encadeado), ('lookup', process_data.merge_dimensions)]:
+        seconds, peak = mede(lambda: outputs.__setitem__(name, func(file_path, dim_path)))
+        results.append({'metodo': name, 'segundos': seconds, 'pico_mb': peak})
+
+    pd.testing.assert_frame_equal(outputs['merges'], outputs['lookup'])
+
+    results = pd.DataFrame(results)
+    print(f"Merges encadeados vs lookup ({file_name}, {len(outputs['lookup'])} linhas, saídas idênticas):")
+    print(results.to_string(index=False, float_format=lambda v: f"{v:.2f}"))
+    return results
+
+if __name__ == "__main__":
+    # Uso: python -m layers.gold.scripts.benchmark_merge ESTB2019.parquet [diretório_silver] [diretório_dimensões]
+    compara_merge(sys.argv[1], *sys.argv[2:4])
\ No newline at end of file
@@ -0,0 +1,60 @@
+#%%
+import os
+import time
+import argparse
+import pandas as pd
+from layers.gold.utils import process_data
+from layers.gold.config.config_gold import PATH_ESTB_SILVER, DIM_PATH, QL_ENGINE, YEAR_START, YEAR_END
+
+def compara_anos(silver_path=PATH_ESTB_SILVER, dim_path=DIM_PATH, engine=QL_ENGINE, inicio=YEAR_START, fim=YEAR_END) -> pd.DataFrame:
+    """
+    Compare the per-file loop with the multi-year single pass on the Silver years.
+    
+    The same years are processed file by file (process_data) and in one pass
+    (process_years) with the same engine. Database writes are disabled, so
+    the times cover reading, enrichment and the indices only.
+    
+    Args:
+        silver_path: Silver establishments directory
+        dim_path: Dimension directory, in the same key mode as the Silver files
+        engine: QL engine ('pandas', 'cube', 'sparse' or 'duckdb')
+        inicio: First year (None: the earliest)
+        fim: Last year (None: the latest)
+        
+    Returns:
+        pd.DataFrame: Seconds per year in each mode; the single-pass time is
+        the year's read plus an even share of the joint computation
+    """
+    process_data.save_to_db = lambda *args, **kwargs: None  # sem gravar no banco
+    file_names = process_data.select_years(os.listdir(silver_path), inicio, fim)
+
+    por_arquivo = []
+    for file_name in file_names:
+        start = time.perf_counter()
+        process_data.process_data(file_name, silver_path, None, dim_path, engine=engine)
+        por_arquivo.append(time.perf_counter() - start)
+    process_data.shutdown_executor()
+
+    unica = process_data.process_years(file_names, silver_path, dim_path, engine=engine)
+    process_data.shutdown_executor()
+
+    results = pd.DataFrame({
+        'ano': unica['ano'],
+        'por_arquivo_s': por_arquivo,
+        'passagem_unica_s': unica['total_s'],
+    })
+    print(f"Por arquivo vs passagem única ({len(file_names)} anos, engine {engine}):")
+    print(results.to_string(index=False, float_format=lambda v: f"{v:.2f}"))
+    print(f"Total: {results['por_arquivo_s'].sum():.2f} s vs {results['passagem_unica_s'].sum():.2f} s")
+    return results
+
+if __name__ == "__main__":
+    # Uso: python -m layers.gold.scripts.benchmark_multi_year [diretório_silver] [diretório_dimensões] [--engine cube] [--inicio 2015] [--fim 2019]
+    parser = argparse.ArgumentParser(description="Compara o processamento por arquivo com a passagem única sobre vários anos")
+    parser.add_argument('silver_path', nargs='?', default=PATH_ESTB_SILVER)
+    parser.add_argument('dim_path', nargs='?', default=DIM_PATH)
+    parser.add_argument('--engine', choices=['pandas', 'cube', 'sparse', 'duckdb'], default=QL_ENGINE)
+    parser.add_argument('--inicio', type=int, default=YEAR_START)
+    parser.add_argument('--fim', type=int, default=YEAR_END)
+    args = parser.parse_args()
+    compara_anos(args.silver_path, args.dim_path, args.engine, args.inicio, args.fim)
\ No newline at end of file
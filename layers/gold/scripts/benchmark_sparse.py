@@ -0,0 +1,69 @@
+#%%
+import os
+import argparse
+import pandas as pd
+from layers.gold.utils import process_data
+from layers.gold.utils.sparse_ql import sparse_ql, GEO_LEVELS, CNAE_LEVELS
+from layers.gold.config.config_gold import PATH_ESTB_SILVER, DIM_PATH
+from layers.gold.scripts.benchmark_keys import mede
+
+def ql_groupby(df, geo_level, cnae_level) -> pd.DataFrame:
+    """Reference implementation: the groupby-and-merge pattern of calculate_idx_* at any level."""
+    count = process_data.count_establishments
+    id_cols = ['id_uf', GEO_LEVELS[geo_level]]
+    nac, est = f'indice_{geo_level}_nac', f'indice_{geo_level}_est'
+
+    numerador = count(df, ['ano'] + id_cols + [cnae_level]) / count(df, ['ano'] + id_cols)
+    denominador_nac = count(df, ['ano', cnae_level]) / count(df, ['ano'])
+    denominador_est = count(df, ['ano', cnae_level, 'id_uf']) / count(df, ['ano', 'id_uf'])
+
+    ql_nac = (numerador / denominador_nac).reset_index(name=nac)
+    ql_est = (numerador / denominador_est).reset_index(name=est)
+    ql_nac[nac] = round(ql_nac[nac].replace([float('inf'), -float('inf')], 0).fillna(0), 3)
+    ql_est[est] = round(ql_est[est].replace([float('inf'), -float('inf')], 0).fillna(0), 3)
+
+    return pd.merge(ql_nac, ql_est, how='outer', on=['ano'] + id_cols + [cnae_level]).drop(axis=1, columns=['id_uf'])
+
+def compara_sparse(file_name, silver_path=PATH_ESTB_SILVER, dim_path=DIM_PATH, cnae_level='classe', geo_level='muni') -> pd.DataFrame:
+    """
+    Compare the groupby-and-merge QL with the sparse-matrix QL on one full Silver year.
+    
+    Both run on the same enriched establishment frame (merge_dimensions); the
+    time and peak traced memory of each are reported, and the outputs are
+    checked to be identical once sorted by year, region and activity.
+    
+    Args:
+        file_name: Silver file or partition (e.g., 'ESTB2019.parquet' or 'ano=2019')
+        silver_path: Silver establishments directory
+        dim_path: Dimension directory, in the same key mode as the Silver file
+        cnae_level: CNAE level ('secao', 'divisao', 'grupo' or 'classe')
+        geo_level: Geographic level ('muni', 'micro' or 'meso')
+    
+    Returns:
+        pd.DataFrame: One row per implementation
+    """
+    df = process_data.merge_dimensions(os.path.join(silver_path, file_name), dim_path)
+    outputs, results = {}, []
+    for name, func in [('groupby', ql_groupby), ('sparse', sparse_ql)]:
+        seconds, peak = mede(lambda: outputs.__setitem__(name, func(df, geo_level, cnae_level)))
+        results.append({'metodo': name, 'segundos': seconds, 'pico_mb': peak})
+
+    keys = ['ano', GEO_LEVELS[geo_level], cnae_level]
+    pd.testing.assert_frame_equal(outputs['groupby'].sort_values(keys).reset_index(drop=True),
+                                  outputs['sparse'].sort_values(keys).reset_index(drop=True))
+
+    results = pd.DataFrame(results)
+    print(f"QL {geo_level} × {cnae_level} ({file_name}, {len(df)} linhas, {len(outputs['sparse'])} células, saídas idênticas):")
+    print(results.to_string(index=False, float_format=lambda v: f"{v:.2f}"))
+    return results
+
+if __name__ == "__main__":
+    # Uso: python -m layers.gold.scripts.benchmark_sparse ESTB2019.parquet [diretório_silver] [diretório_dimensões] [--cnae classe] [--geo muni]
+    parser = argparse.ArgumentParser(description="Compara o QL por groupby e por matriz esparsa")
+    parser.add_argument('file_name')
+    parser.add_argument('silver_path', nargs='?', default=PATH_ESTB_SILVER)
+    parser.add_argument('dim_path', nargs='?', default=DIM_PATH)
+    parser.add_argument('--cnae', choices=list(CNAE_LEVELS), default='classe')
+    parser.add_argument('--geo', choices=list(GEO_LEVELS), default='muni')
+    args = parser.parse_args()
+    compara_sparse(args.file_name, args.silver_path, args.dim_path, args.cnae, args.geo)
\ No newline at end of file
@@ -365,6 +365,37 @@ def create_all_materialized_views(schema: str = "dimensional"):
     create_indexes(engine, schema)
     print("\nÍndices criados")
 
+def refresh_all_materialized_views(schema: str = "dimensional"):
+    """
+    Atualiza as views materializadas sem removê-las (carga incremental).
+    
+    As views e seus índices são mantidos; se alguma view não existir, todas
+    são criadas com create_all_materialized_views.
+    """
+    engine = create_engine_connection()
+    
+    views = [
+        "fact_sec_muni_mv",
+        "fact_div_muni_mv",
+        "fact_sec_micro_mv",
+        "fact_div_micro_mv",
+        "fact_sec_meso_mv",
+        "fact_div_meso_mv"
+    ]
+    
+    with engine.connect() as conn:
+        missing = [view for view in views
+                   if conn.execute(text(f"SELECT to_regclass('{schema}.{view}')")).scalar() is None]
+    if missing:
+        create_all_materialized_views(schema)
+        return
+    
+    with engine.connect() as conn:
+        for view in views:
+            conn.execute(text(f"REFRESH MATERIALIZED VIEW {schema}.{view}"))
+        conn.commit()
+    print("\nViews materializadas atualizadas.")
+
 if __name__ == "__main__":
     # Executa a criação das views quando chamado diretamente
     create_all_materialized_views()
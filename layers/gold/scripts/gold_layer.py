@@ -1,14 +1,22 @@
 #%%
 import os
+import argparse
 import pandas as pd
 import time
-from layers.gold.utils.process_data import process_data
-from layers.gold.utils.db_start import create_database
+from layers.gold.utils.process_data import (process_data, process_years, select_years, file_year, start_executor,
+                                            shutdown_executor)
+from layers.gold.utils.db_start import create_database, migrate_database
 from layers.gold.utils.db_insertion import insert_dimensions
-from layers.gold.config.config_gold import PATH_ESTB_SILVER, PATH_ESTB_GOLD, DIM_PATH
-from layers.gold.scripts.create_materialized_views import create_all_materialized_views
+from layers.gold.utils.db_config import pool_stats, dispose_engine
+from layers.gold.utils.dimension_cache import clear_cache, cache_stats
+from layers.gold.utils.refresh import (load_state, save_state, base_state, full_load_reason, changed_years,
+                                       removed_years, remove_years, year_item)
+from layers.gold.config.config_gold import (PATH_ESTB_SILVER, PATH_ESTB_GOLD, DIM_PATH, SHARED_HANDOFF, MULTI_YEAR,
+                                           YEAR_START, YEAR_END, INCREMENTAL)
+from layers.gold.scripts.create_materialized_views import (create_all_materialized_views,
+                                                           refresh_all_materialized_views)
 
-def run_gold_layer() -> None:
+def run_gold_layer(multi_year=MULTI_YEAR, year_start=YEAR_START, year_end=YEAR_END, incremental=INCREMENTAL) -> None:
     """
     Execute the complete Gold layer ETL pipeline.
     
@@ -23,28 +31,118 @@ def run_gold_layer() -> None:
     geographic levels: municipality, microregion, and mesoregion, comparing
     industrial concentration against both state and national benchmarks.
     
+    Args:
+        multi_year: Process every selected year in a single pass (process_years)
+            instead of one file at a time
+        year_start: First Silver year to process (None: the earliest)
+        year_end: Last Silver year to process (None: the latest)
+        incremental: Keep the loaded database and recompute only the years
+            whose Silver file changed since the last load (refresh.py); falls
+            back to a full load when there is no previous load, the gold
+            version changed or a dimension changed
+    
     Returns:
         None
         
     Notes:
         - Requires Silver layer to be completed first
         - Creates 'dimensional' schema in PostgreSQL
-        - Processes files sequentially from PATH_ESTB_SILVER
+        - Processes files sequentially from PATH_ESTB_SILVER, or all of them
+          at once with multi_year=True; both modes print the time per year
         - Each file triggers parallel index calculation (municipality, micro, meso)
         - Creates 6 materialized views with indexes for API queries
+        - Dimension files are read once per run (dimension_cache) and shared by
+          every year; cache hits and misses are printed at the end
+        - The main process and each QL worker share one connection pool per
+          process (db_config); its statistics are printed at the end and
+          the pool is closed
+        - Every run records the fingerprint of each loaded year and the
+          dimension hashes in dimensional.carga_gold; a year is recorded only
+          after all of its fact tables were written
+        - In incremental mode each changed year replaces its own rows in every
+          fact table (save_to_db swaps its partition in one transaction), years
+          removed from the Silver are deleted, the dimensions and the other
+          years are left untouched and the views are refreshed, not re-created
+        - An incremental run over a database loaded before the fact tables
+          were partitioned converts them first, keeping the loaded years
+          (migrate_database), and then re-creates the views
     """
-    create_database()
-    insert_dimensions()
-    
-    file_list = os.listdir(PATH_ESTB_SILVER)
-    for file_name in file_list:
-        print(f"Processando: {file_name}")
-        process_data(file_name, PATH_ESTB_SILVER, PATH_ESTB_GOLD, DIM_PATH)
-    create_all_materialized_views()
+    clear_cache()
+    file_list = select_years(os.listdir(PATH_ESTB_SILVER), year_start, year_end)
+    
+    state = load_state() if incremental else None
+    reason = full_load_reason(state) if incremental else None
+    full_load = not incremental or reason is not None
+    if full_load:
+        if incremental:
+            print(f"Carga completa: {reason}")
+        create_database()
+        insert_dimensions()
+        state = {}
+        save_state(base_state())
+    
+    migrated = [] if full_load else migrate_database()
+    if migrated:
+        print(f"Tabelas fato convertidas para partições por ano: {len(migrated)}")
+    
+    pending, fingerprints = changed_years(file_list, PATH_ESTB_SILVER, state)
+    removed = [] if full_load else removed_years(file_list, state, year_start, year_end)
+    if not full_load:
+        print(f"Carga incremental: {len(pending)} de {len(file_list)} anos alterados, {len(removed)} removidos")
+        remove_years(removed)
+    
+    if SHARED_HANDOFF:
+        start_executor()
+    try:
+        if multi_year:
+            print(f"Processando {len(pending)} anos em uma única passagem")
+            timings = process_years(pending, PATH_ESTB_SILVER, DIM_PATH)
+            save_state({year_item(file_year(name)): fingerprints[name] for name in pending})
+        else:
+            timings = []
+            for file_name in pending:
+                print(f"Processando: {file_name}")
+                start = time.perf_counter()
+                try:
+                    process_data(file_name, PATH_ESTB_SILVER, PATH_ESTB_GOLD, DIM_PATH)
+                except RuntimeError as exc:
+                    print(f"✗ {file_name} não registrado na carga: {exc}")
+                    continue
+                save_state({year_item(file_year(file_name)): fingerprints[file_name]})
+                timings.append({'ano': file_year(file_name), 'total_s': time.perf_counter() - start})
+            timings = pd.DataFrame(timings, columns=['ano', 'total_s'])
+    finally:
+        shutdown_executor()
+    if full_load or migrated:
+        create_all_materialized_views()
+    elif pending or removed:
+        refresh_all_materialized_views()
+
+    print("Tempo por ano:")
+    print(timings.to_string(index=False, float_format=lambda v: f"{v:.2f}"))
+
+    stats = cache_stats()
+    print(f"Cache de dimensões: {stats['hits']} acertos, {stats['misses']} leituras")
+
+    stats = pool_stats()
+    print(f"Pool de conexões: {stats['checkouts']} checkouts, {stats['connects']} conexões abertas, "
+          f"pico de {stats['peak_checked_out']} em uso, espera total {stats['wait_s']:.2f}s "
+          f"(máx. {stats['max_wait_s']:.2f}s), {stats['timeouts']} timeouts")
+    dispose_engine()
         
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Gold Layer - cálculo do quociente locacional")
+    parser.add_argument('--multi-year', action='store_true', default=MULTI_YEAR,
+                        help="processa todos os anos em uma única passagem (padrão: GOLD_MULTI_YEAR)")
+    parser.add_argument('--inicio', type=int, default=YEAR_START, help="primeiro ano (padrão: GOLD_YEAR_START)")
+    parser.add_argument('--fim', type=int, default=YEAR_END, help="último ano (padrão: GOLD_YEAR_END)")
+    parser.add_argument('--incremental', action='store_true', default=INCREMENTAL,
+                        help="recalcula apenas os anos alterados na Silver (padrão: GOLD_INCREMENTAL)")
+    args = parser.parse_args()
+
     start_time = time.time()
-    run_gold_layer()
+    run_gold_layer(multi_year=args.multi_year, year_start=args.inicio, year_end=args.fim,
+                   incremental=args.incremental)
     end_time = time.time()
     elapsed = end_time - start_time
     
@@ -1,8 +1,35 @@
 #%%
+import io
 import os
 import pandas as pd
+import pyarrow as pa
+import pyarrow.csv as pa_csv
+from sqlalchemy import text
 from layers.gold.utils.db_config import create_engine_connection
-from layers.gold.config.config_gold import DIM_PATH
+from layers.gold.utils.dimension_cache import load_dimension
+from layers.gold.config.config_gold import DIM_PATH, TEXT_KEYS, KEY_WIDTHS, LOAD_METHOD, LOAD_CHUNKSIZE
+
+def format_keys(df) -> pd.DataFrame:
+    """
+    Convert integer-coded keys back to their textual (presentation) form.
+    
+    Silver can store keys as compact integers (e.g., classe 1234); the
+    database keeps them as zero-padded text (e.g., '01234'). Columns listed
+    in TEXT_KEYS that hold integers are converted to strings, padded to
+    KEY_WIDTHS when a width is defined. Textual columns are left untouched.
+    
+    Args:
+        df: Dimension or fact DataFrame
+        
+    Returns:
+        pd.DataFrame: DataFrame with textual keys
+    """
+    conv = {
+        col: df[col].astype(str).str.zfill(KEY_WIDTHS.get(col, 0))
+        for col in TEXT_KEYS
+        if col in df.columns and pd.api.types.is_integer_dtype(df[col])
+    }
+    return df.assign(**conv) if conv else df
 
 def insert_dimensions() -> None:
     """
@@ -23,28 +50,26 @@ def insert_dimensions() -> None:
         None
         
     Notes:
-        - Uses pandas.to_sql() with SQLAlchemy engine for bulk insertion
+        - Uses write_frame (COPY, or pandas.to_sql() as fallback) for bulk
+          insertion, all dimensions in one transaction
         - Prints confirmation for each dimension with record count
-        - Engine is properly disposed after use
+        - Uses the process engine (create_engine_connection), whose pool is
+          reused across calls
         - Uses 'append' mode assuming tables are already created
+        - Integer-coded keys are converted to zero-padded text (format_keys)
+        - Dimensions are read through the run-scoped cache, so the year
+          processing that follows reuses them
     """
     engine = create_engine_connection()
     
     # Insertion order respecting foreign keys
     dim_list = ['dim_uf', 'dim_mesorregiao', 'dim_microrregiao', 'dim_municipio', 'dim_cnae']
     
-    for dim_name in dim_list:
-        dim = pd.read_parquet(os.path.join(DIM_PATH, dim_name + '.parquet'))
-        dim.to_sql(
-            name=dim_name,
-            con=engine,
-            schema='dimensional',
-            if_exists='append',
-            index=False
-        )
-        print(f"✓ Inserido: {dim_name} ({len(dim)} registros)")
-    
-    engine.dispose()
+    with engine.begin() as conn:
+        for dim_name in dim_list:
+            dim = format_keys(load_dimension(DIM_PATH, dim_name))
+            write_frame(conn, dim, dim_name)
+            print(f"✓ Inserido: {dim_name} ({len(dim)} registros)")
 
 def save_to_db(df1, df2, table_names) -> None:
     """
@@ -60,34 +85,213 @@ def save_to_db(df1, df2, table_names) -> None:
         table_names: List with two table names [section_table, division_table]
         
     Notes:
-        - Uses pandas.to_sql() with SQLAlchemy for bulk insertion
-        - Both DataFrames use 'append' mode (tables must exist)
+        - Uses write_frame (COPY, or pandas.to_sql() as fallback) for bulk insertion
+        - Each year present in a DataFrame replaces that year's partition:
+          the rows are loaded into a standalone table (stage_partition) and
+          swapped in (attach_partition) in one transaction, so a recomputed
+          year never shows up twice or half-written
+        - Every table is staged before any partition is swapped, so the
+          locks on the fact tables are only held for the swaps
         - Prints confirmation with record counts for each table
-        - Engine is properly disposed after use
+        - Uses the process engine (create_engine_connection), whose pool is
+          reused across calls
         - Handles None values gracefully (skips if DataFrame is None)
+        - Integer-coded keys are converted to text before insertion (format_keys)
     """
     engine = create_engine_connection()
     
-    # Save first table (section)
-    if df1 is not None and len(table_names) > 0:
-        df1.to_sql(
-            name=table_names[0],
-            con=engine,
-            schema='dimensional',
-            if_exists='append',
-            index=False
-        )
-        print(f"✓ Inserido: {table_names[0]} ({len(df1)} registros)")
-    
-    # Save second table (division)
-    if df2 is not None and len(table_names) > 1:
-        df2.to_sql(
-            name=table_names[1],
-            con=engine,
-            schema='dimensional',
-            if_exists='append',
-            index=False
-        )
-        print(f"✓ Inserido: {table_names[1]} ({len(df2)} registros)")
-    
-    engine.dispose()
\ No newline at end of file
+    # Section and division tables in the same transaction
+    with engine.begin() as conn:
+        staged = []
+        for df, table_name in zip((df1, df2), table_names):
+            if df is None:
+                continue
+            df = format_keys(df)
+            for year, rows in df.groupby('ano', sort=True):
+                staged.append((table_name, year, stage_partition(conn, rows, table_name, year)))
+            print(f"✓ Inserido: {table_name} ({len(df)} registros)")
+        for table_name, year, stage in staged:
+            attach_partition(conn, table_name, year, stage)
+
+def partition_name(table_name, year) -> str:
+    """Partition of one year of a fact table (e.g., 'fact_sec_muni_2019')."""
+    return f"{table_name}_{int(year)}"
+
+def stage_partition(conn, df, table_name, year, source=None) -> str:
+    """
+    Load one year of a fact table into a standalone table, ready to be attached.
+    
+    The table is created like the fact table (same columns and id sequence),
+    filled with write_frame and only then given its primary key and a CHECK
+    (ano = year), in a single ALTER TABLE: building the key after the load is
+    faster than maintaining it row by row. The foreign keys are left to the
+    fact table, which adds them to the partition at attach_partition, so
+    staging takes no lock on the dimensions.
+    
+    Args:
+        conn: Open SQLAlchemy connection; the caller owns the transaction
+        df: Rows of the year, with the fact table's columns (format_keys)
+        table_name: Fact table in the dimensional schema (e.g., 'fact_sec_muni')
+        year: Year of the rows
+        source: Table of the dimensional schema to copy the year's rows from
+            (INSERT ... SELECT, ids included) instead of df (partition_table)
+    
+    Returns:
+        str: Name of the staging table ({partition}_carga)
+    """
+    stage = f"{partition_name(table_name, year)}_carga"
+    conn.execute(text(f"CREATE TABLE dimensional.{stage} (LIKE dimensional.{table_name} INCLUDING DEFAULTS)"))
+    if source is None:
+        write_frame(conn, df, stage)
+    else:
+        columns = ', '.join(conn.execute(text(
+            "SELECT column_name FROM information_schema.columns "
+            "WHERE table_schema = 'dimensional' AND table_name = :t ORDER BY ordinal_position"
+        ), {'t': table_name}).scalars().all())
+        conn.execute(text(f"INSERT INTO dimensional.{stage} ({columns}) "
+                          f"SELECT {columns} FROM dimensional.{source} WHERE ano = {int(year)}"))
+
+    conn.execute(text(f"ALTER TABLE dimensional.{stage} ADD CONSTRAINT {stage}_ano CHECK (ano = {int(year)}), "
+                      f"ADD CONSTRAINT {stage}_pkey PRIMARY KEY (id, ano)"))
+    return stage
+
+def attach_partition(conn, table_name, year, stage) -> None:
+    """
+    Swap a staged table in as the partition of its year.
+    
+    The previous partition of the year, if any, is dropped; the staged table
+    takes its name and is attached. The CHECK added by stage_partition lets
+    PostgreSQL skip the scan that validates the partition bound, and the
+    primary key is adopted as the partition's. The foreign keys of the fact
+    table are added to the partition by the attach itself, which checks the
+    year's rows against the dimensions once. The CHECK is then redundant and
+    dropped.
+    
+    Args:
+        conn: Open SQLAlchemy connection; the caller owns the transaction
+        table_name: Fact table in the dimensional schema
+        year: Year of the partition
+        stage: Staging table returned by stage_partition
+    """
+    partition = partition_name(table_name, year)
+    conn.execute(text(f"DROP TABLE IF EXISTS dimensional.{partition}"))
+    conn.execute(text(f"ALTER TABLE dimensional.{stage} RENAME TO {partition}"))
+    conn.execute(text(f"ALTER INDEX dimensional.{stage}_pkey RENAME TO {partition}_pkey"))
+    conn.execute(text(f"ALTER TABLE dimensional.{table_name} ATTACH PARTITION dimensional.{partition} "
+                      f"FOR VALUES IN ({int(year)})"))
+    conn.execute(text(f"ALTER TABLE dimensional.{partition} DROP CONSTRAINT {stage}_ano"))
+
+def partition_table(conn, table_name, legacy) -> None:
+    """
+    Move the rows of an unpartitioned fact table into the partitioned one.
+    
+    Databases loaded before the fact tables were partitioned by year keep
+    their data: migrate_database renames each old table ({table}_antiga) and
+    creates the partitioned table, and this function fills it one partition
+    per year, with the same staging and swap as save_to_db.
+    
+    Args:
+        conn: Open SQLAlchemy connection; the caller owns the transaction
+        table_name: Partitioned fact table in the dimensional schema
+        legacy: Old, unpartitioned table holding the rows
+    
+    Notes:
+        - The ids are copied and the id sequence of the partitioned table
+          continues after the largest one
+        - Rows without a year cannot be placed in a partition and are dropped
+        - The old table is dropped with CASCADE, which also drops the
+          materialized views built on it; the caller re-creates them
+    """
+    years = conn.execute(text(
+        f"SELECT DISTINCT ano FROM dimensional.{legacy} WHERE ano IS NOT NULL ORDER BY ano"
+    )).scalars().all()
+    for year in years:
+        attach_partition(conn, table_name, year, stage_partition(conn, None, table_name, year, source=legacy))
+    conn.execute(text(f"SELECT setval(pg_get_serial_sequence('dimensional.{table_name}', 'id'), max(id)) "
+                      f"FROM dimensional.{legacy} HAVING max(id) IS NOT NULL"))
+    conn.execute(text(f"DROP TABLE dimensional.{legacy} CASCADE"))
+    print(f"✓ Particionada: {table_name} ({len(years)} anos)")
+
+def delete_years(conn, table_name, years) -> None:
+    """
+    Delete the given years from a fact table.
+    
+    Args:
+        conn: Open SQLAlchemy connection; the caller owns the transaction
+        table_name: Fact table in the dimensional schema (e.g., 'fact_sec_muni')
+        years: Years to delete
+        
+    Notes:
+        - Drops the partition of each year (partition_name) instead of
+          deleting rows, so the other years are not touched
+    """
+    for year in years:
+        conn.execute(text(f"DROP TABLE IF EXISTS dimensional.{partition_name(table_name, year)}"))
+
+def write_frame(conn, df, table_name, method=LOAD_METHOD, chunksize=LOAD_CHUNKSIZE) -> None:
+    """
+    Append a DataFrame to a table of the dimensional schema.
+    
+    Args:
+        conn: Open SQLAlchemy connection; the caller owns the transaction
+        df: Rows to append, with the table's column names
+        table_name: Table in the dimensional schema
+        method: 'copy' (copy_frame) or 'insert' (pandas.to_sql)
+        chunksize: Rows per COPY chunk
+        
+    Notes:
+        - 'copy' falls back to pandas.to_sql when the database driver has no
+          COPY support (copy_frame returns False)
+    """
+    if method == 'copy' and copy_frame(conn, df, table_name, chunksize):
+        return
+    df.to_sql(
+        name=table_name,
+        con=conn,
+        schema='dimensional',
+        if_exists='append',
+        index=False
+    )
+
+def copy_frame(conn, df, table_name, chunksize=LOAD_CHUNKSIZE) -> bool:
+    """
+    Stream a DataFrame into a table with COPY ... FROM STDIN.
+    
+    The frame is converted once to Arrow; each chunk of rows is written as
+    CSV to an in-memory buffer by Arrow's C++ writer and sent with the
+    driver's COPY, instead of the INSERT statements of to_sql.
+    
+    Args:
+        conn: Open SQLAlchemy connection (psycopg2); the caller owns the transaction
+        df: Rows to append, with the table's column names
+        table_name: Table in the dimensional schema
+        chunksize: Rows per buffer, bounding the memory of the CSV text
+        
+    Returns:
+        bool: False if the driver has no COPY support (nothing was written)
+        
+    Notes:
+        - Strings are always quoted and missing values (None, NaN) are left
+          unquoted and empty, so PostgreSQL reads NULL only for missing
+          values and keeps empty strings
+        - Floats are written with their shortest exact representation, so
+          the stored values are the same as with to_sql
+        - Arrow writes CSV about 10x faster than DataFrame.to_csv
+    """
+    cursor = conn.connection.cursor()
+    if not hasattr(cursor, 'copy_expert'):
+        cursor.close()
+        return False
+
+    table = pa.Table.from_pandas(df, preserve_index=False)
+    sql = f"COPY dimensional.{table_name} ({', '.join(table.column_names)}) FROM STDIN WITH (FORMAT csv)"
+    options = pa_csv.WriteOptions(include_header=False)
+    try:
+        for start in range(0, table.num_rows, chunksize):
+            buffer = io.BytesIO()
+            pa_csv.write_csv(table.slice(start, chunksize), buffer, options)
+            buffer.seek(0)
+            cursor.copy_expert(sql, buffer)
+    finally:
+        cursor.close()
+    return True
\ No newline at end of file
@@ -1,6 +1,12 @@
 #%%
 from sqlalchemy import text
 
+# Tabelas fato, no padrão fact_{classificação}_{geografia}, e dos indicadores
+# de especialização (fact_espec_{geografia}) e de Gini locacional
+FACT_TABLES = [f'fact_{cnae}_{geo}' for cnae in ('sec', 'div', 'gru', 'cla') for geo in ('muni', 'micro', 'meso')]
+FACT_TABLES += [f'fact_espec_{geo}' for geo in ('muni', 'micro', 'meso')]
+FACT_TABLES += [f'fact_gini_{cnae}_{geo}' for cnae in ('sec', 'div') for geo in ('muni', 'micro', 'meso')]
+
 def create_schema(engine, schema_name):
     """
     Create a PostgreSQL schema if it doesn't exist.
@@ -38,7 +44,7 @@ def create_dimensions(engine, schema):
           UF → Mesoregion → Microregion → Municipality
         - Uses varchar for IDs to preserve leading zeros (e.g., '01' for state codes)
         - All tables use IF NOT EXISTS for idempotent creation
-        - CNAE dimension includes both section and division levels
+        - CNAE dimension includes the section, division, group and class levels
     """
     with engine.connect() as conn:
         conn.execute(text(f"""
@@ -75,6 +81,9 @@ def create_dimensions(engine, schema):
         conn.execute(text(f"""
             CREATE TABLE IF NOT EXISTS {schema}.dim_cnae (
                 classe varchar PRIMARY KEY,
+                descricao_classe varchar,
+                grupo varchar,
+                descricao_grupo varchar,
                 divisao varchar,
                 descricao_divisao varchar,
                 secao varchar,
@@ -97,6 +106,15 @@ def create_facts(engine, schema):
     - fact_sec_meso: Mesoregion × CNAE Section indices
     - fact_div_meso: Mesoregion × CNAE Division indices
     
+    and, for the fine CNAE levels computed by the sparse engine, the same three
+    geographic levels per CNAE group (fact_gru_*) and class (fact_cla_*).
+    
+    Per geographic level, the indicators computed with the QL:
+    - fact_espec_*: HHI (hhi_*) and coefficient of specialization (ce_*) of
+      each region and year, at section and division level
+    - fact_gini_sec_* / fact_gini_div_*: locational Gini of each section /
+      division and year
+    
     Each table contains:
     - Year dimension (ano)
     - Geographic dimension (municipality/microregion/mesoregion)
@@ -109,76 +127,158 @@ def create_facts(engine, schema):
         schema: Schema name where tables will be created
         
     Notes:
-        - All tables use serial PRIMARY KEY for unique row identification
+        - All tables use a serial id for row identification; the primary key
+          is (id, ano), since a partitioned table's key must include the
+          partition column
         - Foreign keys ensure referential integrity with dimension tables
         - Indices stored as float values (rounded to 3 decimal places)
         - Tables follow naming pattern: fact_{classification}_{geography}
+          (FACT_TABLES)
+        - Every table is partitioned by list on 'ano', one partition per year
+          ({table}_{ano}), attached when the year is loaded (stage_partition,
+          attach_partition); queries filtering on ano only scan that year's
+          partition (partition pruning)
+        - Fact tables created before the partitioning are converted by
+          migrate_database (db_start)
     """
     with engine.connect() as conn:
         conn.execute(text(f"""
             CREATE TABLE IF NOT EXISTS {schema}.fact_sec_muni (
-                id serial PRIMARY KEY,
+                id serial,
                 ano int,
                 id_municipio varchar REFERENCES {schema}.dim_municipio(id_municipio),
                 secao integer,
                 indice_muni_nac float,
-                indice_muni_est float
-            )
+                indice_muni_est float,
+                PRIMARY KEY (id, ano)
+            ) PARTITION BY LIST (ano)
         """))
         
         conn.execute(text(f"""
             CREATE TABLE IF NOT EXISTS {schema}.fact_div_muni (
-                id serial PRIMARY KEY,
+                id serial,
                 ano int,
                 id_municipio varchar REFERENCES {schema}.dim_municipio(id_municipio),
                 divisao integer,
                 indice_muni_nac float,
-                indice_muni_est float
-            )
+                indice_muni_est float,
+                PRIMARY KEY (id, ano)
+            ) PARTITION BY LIST (ano)
         """))
         
         conn.execute(text(f"""
             CREATE TABLE IF NOT EXISTS {schema}.fact_sec_micro (
-                id serial PRIMARY KEY,
+                id serial,
                 ano int,
                 id_microrregiao varchar REFERENCES {schema}.dim_microrregiao(id_microrregiao),
                 secao integer,
                 indice_micro_nac float,
-                indice_micro_est float
-            )
+                indice_micro_est float,
+                PRIMARY KEY (id, ano)
+            ) PARTITION BY LIST (ano)
         """))
         
         conn.execute(text(f"""
             CREATE TABLE IF NOT EXISTS {schema}.fact_div_micro (
-                id serial PRIMARY KEY,
+                id serial,
                 ano int,
                 id_microrregiao varchar REFERENCES {schema}.dim_microrregiao(id_microrregiao),
                 divisao integer,
                 indice_micro_nac float,
-                indice_micro_est float
-            )
+                indice_micro_est float,
+                PRIMARY KEY (id, ano)
+            ) PARTITION BY LIST (ano)
         """))
         
         conn.execute(text(f"""
             CREATE TABLE IF NOT EXISTS {schema}.fact_sec_meso (
-                id serial PRIMARY KEY,
+                id serial,
                 ano int,
                 id_mesorregiao varchar REFERENCES {schema}.dim_mesorregiao(id_mesorregiao),
                 secao integer,
                 indice_meso_nac float,
-                indice_meso_est float
-            )
+                indice_meso_est float,
+                PRIMARY KEY (id, ano)
+            ) PARTITION BY LIST (ano)
         """))
         
         conn.execute(text(f"""
             CREATE TABLE IF NOT EXISTS {schema}.fact_div_meso (
-                id serial PRIMARY KEY,
+                id serial,
                 ano int,
                 id_mesorregiao varchar REFERENCES {schema}.dim_mesorregiao(id_mesorregiao),
                 divisao integer,
                 indice_meso_nac float,
-                indice_meso_est float
-            )
+                indice_meso_est float,
+                PRIMARY KEY (id, ano)
+            ) PARTITION BY LIST (ano)
         """))
+
+        # Níveis CNAE finos (engine esparsa): grupo e classe em cada nível geográfico
+        for geo, region, dim in (('muni', 'id_municipio', 'dim_municipio'),
+                                 ('micro', 'id_microrregiao', 'dim_microrregiao'),
+                                 ('meso', 'id_mesorregiao', 'dim_mesorregiao')):
+            for prefix, activity in (('gru', 'grupo integer'),
+                                     ('cla', f'classe varchar REFERENCES {schema}.dim_cnae(classe)')):
+                conn.execute(text(f"""
+                    CREATE TABLE IF NOT EXISTS {schema}.fact_{prefix}_{geo} (
+                        id serial,
+                        ano int,
+                        {region} varchar REFERENCES {schema}.{dim}({region}),
+                        {activity},
+                        indice_{geo}_nac float,
+                        indice_{geo}_est float,
+                        PRIMARY KEY (id, ano)
+                    ) PARTITION BY LIST (ano)
+                """))
+
+        # Indicadores de especialização por região e de Gini locacional por atividade
+        for geo, region, dim in (('muni', 'id_municipio', 'dim_municipio'),
+                                 ('micro', 'id_microrregiao', 'dim_microrregiao'),
+                                 ('meso', 'id_mesorregiao', 'dim_mesorregiao')):
+            conn.execute(text(f"""
+                CREATE TABLE IF NOT EXISTS {schema}.fact_espec_{geo} (
+                    id serial,
+                    ano int,
+                    {region} varchar REFERENCES {schema}.{dim}({region}),
+                    hhi_sec float,
+                    ce_sec float,
+                    hhi_div float,
+                    ce_div float,
+                    PRIMARY KEY (id, ano)
+                ) PARTITION BY LIST (ano)
+            """))
+            for prefix, activity in (('sec', 'secao integer'), ('div', 'divisao integer')):
+                conn.execute(text(f"""
+                    CREATE TABLE IF NOT EXISTS {schema}.fact_gini_{prefix}_{geo} (
+                        id serial,
+                        ano int,
+                        {activity},
+                        gini float,
+                        PRIMARY KEY (id, ano)
+                    ) PARTITION BY LIST (ano)
+                """))
         
+        conn.commit()
+
+def create_load_state(engine, schema):
+    """
+    Create the table recording what the gold layer has loaded (refresh.py).
+    
+    One row per item: each loaded year ('ano=2019') with the fingerprint of
+    its Silver file, each dimension with its Silver output hash, and 'versao'
+    with the version of the gold computation.
+    
+    Args:
+        engine: SQLAlchemy engine with database connection
+        schema: Schema name where the table will be created
+    """
+    with engine.connect() as conn:
+        conn.execute(text(f"""
+            CREATE TABLE IF NOT EXISTS {schema}.carga_gold (
+                item varchar PRIMARY KEY,
+                hash varchar,
+                carregado_em timestamp DEFAULT now()
+            )
+        """))
         conn.commit()
\ No newline at end of file
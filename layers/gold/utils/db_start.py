@@ -1,7 +1,8 @@
 #%%
 from sqlalchemy import text
-from layers.gold.utils.db_model import create_schema, create_dimensions, create_facts
+from layers.gold.utils.db_model import create_schema, create_dimensions, create_facts, create_load_state, FACT_TABLES
 from layers.gold.utils.db_config import create_engine_connection
+from layers.gold.utils.db_insertion import partition_table
 
 #%%
 def create_database() -> None:
@@ -13,6 +14,7 @@ def create_database() -> None:
     2. Creates fresh 'dimensional' schema
     3. Creates all dimension tables with foreign key relationships
     4. Creates all fact tables for location quotient metrics
+    5. Creates the load state table (carga_gold) used by incremental refreshes
     
     Returns:
         None
@@ -21,7 +23,8 @@ def create_database() -> None:
         - Destructive operation: drops existing schema if present
         - Creates clean slate for each ETL run
         - Ensures schema consistency by recreating from scratch
-        - Engine is properly disposed after use
+        - Uses the process engine (create_engine_connection), whose pool is
+          reused across calls
         
     Warning:
         This will DELETE all existing data in the dimensional schema.
@@ -33,8 +36,7 @@ def create_database() -> None:
     create_schema(engine, 'dimensional')
     create_dimensions(engine, 'dimensional')
     create_facts(engine, 'dimensional')
-    
-    engine.dispose()
+    create_load_state(engine, 'dimensional')
 
 def drop_database(engine) -> None:
     """
@@ -59,3 +61,43 @@ def drop_database(engine) -> None:
         conn.execute(text("DROP SCHEMA IF EXISTS dimensional CASCADE;"))
         conn.commit()
 
+def migrate_database() -> list:
+    """
+    Convert the fact tables of an existing database to year partitions.
+    
+    Used by incremental runs, which keep the loaded database: fact tables
+    created before the partitioning (plain tables) are renamed to
+    {table}_antiga, the partitioned tables are created (create_facts) and
+    the rows are moved year by year (partition_table). Fact tables missing
+    from the database are created empty.
+    
+    Returns:
+        list: Fact tables that were migrated (empty if the database was
+        already partitioned)
+        
+    Notes:
+        - Each step is idempotent: a run interrupted after the renames finds
+          the {table}_antiga tables and resumes the move
+        - The materialized views are dropped with the old tables; the caller
+          must re-create them (create_all_materialized_views)
+    """
+    engine = create_engine_connection()
+    
+    with engine.begin() as conn:
+        plain = conn.execute(text(
+            "SELECT c.relname FROM pg_class c JOIN pg_namespace n ON n.oid = c.relnamespace "
+            "WHERE n.nspname = 'dimensional' AND c.relkind = 'r' AND c.relname = ANY(:tables)"
+        ), {'tables': FACT_TABLES}).scalars().all()
+        for table_name in plain:
+            conn.execute(text(f"ALTER TABLE dimensional.{table_name} RENAME TO {table_name}_antiga"))
+            conn.execute(text(f"ALTER TABLE dimensional.{table_name}_antiga "
+                              f"RENAME CONSTRAINT {table_name}_pkey TO {table_name}_antiga_pkey"))
+    
+    create_facts(engine, 'dimensional')
+    
+    with engine.begin() as conn:
+        legacy = [table_name for table_name in FACT_TABLES
+                  if conn.execute(text(f"SELECT to_regclass('dimensional.{table_name}_antiga')")).scalar()]
+        for table_name in legacy:
+            partition_table(conn, table_name, f"{table_name}_antiga")
+    return legacy
\ No newline at end of file
@@ -0,0 +1,83 @@
+#%%
+import os
+import pandas as pd
+
+# Cache de uma execução da Gold: caminho -> (assinatura do arquivo, conteúdo)
+_CACHE = {}
+_STATS = {'hits': 0, 'misses': 0}
+
+def file_signature(path) -> tuple:
+    """
+    Identify the current version of a file without reading it.
+    
+    Args:
+        path: Full path to the file
+    
+    Returns:
+        tuple: (mtime in nanoseconds, size in bytes)
+    """
+    stat = os.stat(path)
+    return stat.st_mtime_ns, stat.st_size
+
+def cached(key, paths, loader):
+    """
+    Return the cached value for key, rebuilding it when any source file changed.
+    
+    Args:
+        key: Cache key (e.g., a dimension file path)
+        paths: Files the value is built from; their signatures invalidate the entry
+        loader: Zero-argument callable that builds the value on a miss
+    
+    Returns:
+        The cached or freshly built value
+    """
+    signature = tuple(file_signature(path) for path in paths)
+    entry = _CACHE.get(key)
+    if entry is not None and entry[0] == signature:
+        _STATS['hits'] += 1
+        return entry[1]
+
+    _STATS['misses'] += 1
+    value = loader()
+    _CACHE[key] = (signature, value)
+    return value
+
+def load_dimension(dim_path, dim_name) -> pd.DataFrame:
+    """
+    Load a dimension Parquet file through the run-scoped cache.
+    
+    The file is read once per gold run and reused for every year; it is read
+    again only if its mtime or size changed since it was cached.
+    
+    Args:
+        dim_path: Path to the directory containing dimension parquet files
+        dim_name: Dimension name (e.g., 'dim_municipio')
+    
+    Returns:
+        pd.DataFrame: Dimension table, shared by every caller
+    
+    Notes:
+        - The returned DataFrame is shared and must be treated as read-only;
+          callers derive new frames (assign, merge, take) instead of mutating it
+        - The cache lives in the parent process, which does every dimension
+          read (insert_dimensions, build_lookup); the QL workers receive the
+          already enriched frame and never load a dimension
+    """
+    path = os.path.join(dim_path, dim_name + '.parquet')
+    return cached(path, [path], lambda: pd.read_parquet(path))
+
+def cache_stats() -> dict:
+    """
+    Return the cache hit/miss counters of the current run.
+    
+    Returns:
+        dict: 'hits', 'misses' and 'entries'
+    """
+    return {**_STATS, 'entries': len(_CACHE)}
+
+def clear_cache() -> None:
+    """
+    Drop every cached dimension and reset the counters (start of a gold run).
+    """
+    _CACHE.clear()
+    _STATS.update(hits=0, misses=0)
\ No newline at end of file
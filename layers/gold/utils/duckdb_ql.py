@@ -0,0 +1,195 @@
+#%%
+import os
+import duckdb
+import numpy as np
+import pandas as pd
+import pyarrow.parquet as pq
+from layers.gold.config.config_gold import COUNT_COLUMN, DUCKDB_THREADS
+from layers.gold.utils.sparse_ql import GEO_LEVELS, CNAE_LEVELS, clean
+
+def connect() -> duckdb.DuckDBPyConnection:
+    """
+    Open an in-memory DuckDB database for one gold computation.
+    
+    Returns:
+        duckdb.DuckDBPyConnection: Connection using DUCKDB_THREADS threads
+        (None: DuckDB's default, one per core)
+    """
+    con = duckdb.connect()
+    if DUCKDB_THREADS:
+        con.execute(f"SET threads = {int(DUCKDB_THREADS)}")
+    return con
+
+def parquet_files(file_path) -> list:
+    """
+    Parquet files of one Silver year, in either Silver layout.
+    
+    Args:
+        file_path: Silver Parquet file or ano=YYYY partition directory
+    
+    Returns:
+        list: Full paths; a partition keeps its ano=YYYY directory in the path,
+        so the year is read from it (hive partitioning)
+    """
+    if not os.path.isdir(file_path):
+        return [str(file_path)]
+    return [os.path.join(file_path, name) for name in sorted(os.listdir(file_path))]
+
+def load_base(con, file_paths, years, dim_path, validated=False) -> dict:
+    """
+    Create the enriched class cube 'base' as a DuckDB temporary table.
+    
+    The Silver files are scanned by DuckDB itself: only ano, id_municipio,
+    classe (and COUNT_COLUMN, when pre-aggregated) are read, and the year
+    filter is pushed into the scan (partition and row group pruning). The
+    counts per year × municipality × class are then joined with the
+    dimensions, with the inner join semantics of merge_dimensions.
+    
+    Args:
+        con: DuckDB connection (connect)
+        file_paths: Silver files or ano=YYYY partitions of the selected years
+        years: The selected years
+        dim_path: Path to the directory containing dimension parquet files
+        validated: True if the keys were already validated in silver, in which
+            case the loss accounting is skipped
+    
+    Returns:
+        dict: pandas dtype of each key column as the pandas engine reads it
+        (from the Parquet schemas and their pandas metadata), to be applied
+        to the results (duckdb_ql)
+    
+    Notes:
+        - 'base' has one row per year × municipality × class, with the
+          geographic and CNAE hierarchy columns and the count column 'n'
+        - Rows with a missing key are dropped, as in groupby
+    """
+    files = [path for file_path in file_paths for path in parquet_files(file_path)]
+    count = f"sum({COUNT_COLUMN})" if COUNT_COLUMN in pq.read_schema(files[0]).names else "count(*)"
+    dim = lambda name: os.path.join(str(dim_path), name + '.parquet')
+    cnae_columns = [column for column in CNAE_LEVELS if column in pq.read_schema(dim('dim_cnae')).names]
+
+    con.execute(f"""
+        CREATE OR REPLACE TEMP TABLE contagem AS
+        SELECT ano, id_municipio, classe, CAST({count} AS BIGINT) AS n
+        FROM read_parquet($files, hive_partitioning = true, union_by_name = true)
+        WHERE ano IN (SELECT unnest($years)) AND id_municipio IS NOT NULL AND classe IS NOT NULL
+        GROUP BY ALL
+    """, {'files': files, 'years': [int(year) for year in years]})
+    con.execute(f"""
+        CREATE OR REPLACE TEMP TABLE base AS
+        SELECT c.ano, uf.id_uf, meso.id_mesorregiao, micro.id_microrregiao, c.id_municipio,
+               {', '.join('cnae.' + column for column in cnae_columns)}, c.n
+        FROM contagem c
+        JOIN read_parquet('{dim('dim_municipio')}') m ON m.id_municipio = c.id_municipio
+        JOIN read_parquet('{dim('dim_microrregiao')}') micro ON micro.id_microrregiao = m.id_microrregiao
+        JOIN read_parquet('{dim('dim_mesorregiao')}') meso ON meso.id_mesorregiao = micro.id_mesorregiao
+        JOIN read_parquet('{dim('dim_uf')}') uf ON uf.id_uf = meso.id_uf
+        JOIN read_parquet('{dim('dim_cnae')}') cnae ON cnae.classe = c.classe
+    """)
+
+    dtypes = {**pandas_dtypes(dim('dim_cnae')), **pandas_dtypes(dim('dim_mesorregiao')),
+              **pandas_dtypes(dim('dim_microrregiao')), **pandas_dtypes(files[0])}
+    dtypes.pop('ano', None)
+
+    if validated:
+        return dtypes
+    original_size, final_size = con.execute(
+        "SELECT (SELECT coalesce(sum(n), 0) FROM contagem), (SELECT coalesce(sum(n), 0) FROM base)").fetchone()
+    if final_size < original_size:
+        lost = original_size - final_size
+        print(f"⚠️ ATENÇÃO: {lost} registros removidos por falta de correspondência nas dimensões ({lost/original_size*100:.2f}%)")
+    return dtypes
+
+def pandas_dtypes(path) -> dict:
+    """Column dtypes pandas gives a Parquet file, read from its schema only."""
+    return pq.read_schema(path).empty_table().to_pandas().dtypes.to_dict()
+
+def duckdb_ql(con, geo_level, cnae_level, dtypes=None) -> pd.DataFrame:
+    """
+    Calculate national and state location quotients from the 'base' table.
+    
+    DuckDB sums the counts of every (year, region, activity) and the region,
+    year and state totals over them, joined back to each cell (hash joins,
+    about twice as fast as the equivalent window functions, which sort); only
+    these integer counts leave the database. The quotients are then computed
+    with numpy, in the same order of operations as calculate_idx_*
+    
+        national: (E_ij / E_i) / (E_nj / E_n)
+        state:    (E_ij / E_i) / (E_uj / E_u)
+    
+    so the results, including the inf/NaN -> 0 rule and the 3-decimal
+    rounding, are identical to the pandas engine.
+    
+    Args:
+        con: DuckDB connection holding 'base' (load_base)
+        geo_level: 'muni', 'micro' or 'meso' (GEO_LEVELS)
+        cnae_level: 'secao', 'divisao', 'grupo' or 'classe'
+        dtypes: Key column dtypes returned by load_base
+    
+    Returns:
+        pd.DataFrame: One row per (year, region, activity) with at least one
+        establishment, sorted by them, with the columns of the fact tables
+    
+    Raises:
+        ValueError: If geo_level or cnae_level is unknown
+    """
+    if geo_level not in GEO_LEVELS or cnae_level not in CNAE_LEVELS:
+        raise ValueError(f"Nível de QL desconhecido: {geo_level} × {cnae_level}")
+    region = GEO_LEVELS[geo_level]
+
+    counts = con.execute(f"""
+        WITH celulas AS (
+            SELECT ano, id_uf, {region}, {cnae_level}, CAST(sum(n) AS BIGINT) AS n FROM base GROUP BY ALL
+        ),
+        regiao AS (SELECT ano, {region}, CAST(sum(n) AS BIGINT) AS n_regiao FROM celulas GROUP BY ALL),
+        ano_atividade AS (SELECT ano, {cnae_level}, CAST(sum(n) AS BIGINT) AS n_ano_atividade FROM celulas GROUP BY ALL),
+        total_ano AS (SELECT ano, CAST(sum(n) AS BIGINT) AS n_ano FROM celulas GROUP BY ALL),
+        uf_atividade AS (SELECT ano, id_uf, {cnae_level}, CAST(sum(n) AS BIGINT) AS n_uf_atividade FROM celulas GROUP BY ALL),
+        total_uf AS (SELECT ano, id_uf, CAST(sum(n) AS BIGINT) AS n_uf FROM celulas GROUP BY ALL)
+        SELECT c.ano, c.{region}, c.{cnae_level}, c.n, n_regiao, n_ano_atividade, n_ano, n_uf_atividade, n_uf
+        FROM celulas c
+        JOIN regiao USING (ano, {region})
+        JOIN ano_atividade USING (ano, {cnae_level})
+        JOIN total_ano USING (ano)
+        JOIN uf_atividade USING (ano, id_uf, {cnae_level})
+        JOIN total_uf USING (ano, id_uf)
+        ORDER BY c.ano, c.{region}, c.{cnae_level}
+    """).df()
+
+    share = counts['n'].to_numpy() / counts['n_regiao'].to_numpy()
+    ql_nac = share / (counts['n_ano_atividade'].to_numpy() / counts['n_ano'].to_numpy())
+    ql_est = share / (counts['n_uf_atividade'].to_numpy() / counts['n_uf'].to_numpy())
+
+    dtypes = dtypes or {}
+    return pd.DataFrame({
+        'ano': counts['ano'],
+        region: counts[region].astype(dtypes.get(region, counts[region].dtype)),
+        cnae_level: counts[cnae_level].astype(dtypes.get(cnae_level, counts[cnae_level].dtype)),
+        f'indice_{geo_level}_nac': np.round(clean(ql_nac), 3),
+        f'indice_{geo_level}_est': np.round(clean(ql_est), 3),
+    })
+
+def cell_counts(con, geo_level, cnae_level, dtypes=None) -> pd.Series:
+    """
+    Establishment counts per (year, region, activity) of the 'base' table.
+    
+    Args:
+        con: DuckDB connection holding 'base' (load_base)
+        geo_level: 'muni', 'micro' or 'meso' (GEO_LEVELS)
+        cnae_level: 'secao', 'divisao', 'grupo' or 'classe'
+        dtypes: Key column dtypes returned by load_base
+    
+    Returns:
+        pd.Series: Counts indexed by ano, region and activity, as
+        count_establishments returns them
+    """
+    region = GEO_LEVELS[geo_level]
+    cells = con.execute(f"""
+        SELECT ano, {region}, {cnae_level}, CAST(sum(n) AS BIGINT) AS n
+        FROM base
+        GROUP BY ALL
+        ORDER BY ALL
+    """).df()
+    dtypes = dtypes or {}
+    cells = cells.astype({column: dtypes[column] for column in (region, cnae_level) if column in dtypes})
+    return cells.set_index(['ano', region, cnae_level])['n']
\ No newline at end of file
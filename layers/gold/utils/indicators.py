@@ -0,0 +1,153 @@
+#%%
+import numpy as np
+import pandas as pd
+from layers.gold.utils.sparse_ql import GEO_LEVELS
+
+# Casas decimais dos indicadores (todos no intervalo [0, 1])
+DECIMALS = 4
+
+def specialization(cells, region, activity) -> pd.DataFrame:
+    """
+    Calculate the concentration and specialization of every region's activity structure.
+    
+    With s_ij = E_ij / E_i the share of activity j in region i and
+    s_nj = E_nj / E_n its national share in the same year:
+    
+        HHI: sum_j s_ij^2
+        CE:  1/2 * sum_j |s_ij - s_nj|
+    
+    Args:
+        cells: Establishment counts indexed by at least 'ano', region and
+            activity (the numerators of calculate_idx_*; extra levels such
+            as id_uf are summed out)
+        region: Region column (e.g., 'id_municipio')
+        activity: Activity column (e.g., 'secao')
+    
+    Returns:
+        pd.DataFrame: One row per (year, region): ano, region, hhi and ce
+        (coefficient of specialization), rounded to DECIMALS
+    
+    Notes:
+        - Only the non-zero cells are needed: an activity absent from region
+          i contributes s_nj to the CE sum, and those terms add up to
+          1 - sum of s_nj over the activities present, so
+          CE = 1/2 * (1 + sum_present (|s_ij - s_nj| - s_nj))
+        - Both sums are taken over integer counts (exact_counts) and divided
+          once at the end: HHI = sum_j E_ij^2 / E_i^2 and the CE sum over
+          E_i * E_n. Summing float shares made the last bit depend on the
+          order of the activities, which differs between integer and text
+          keys, and that flipped values lying on a rounding tie
+        - Vectorized over every region and year at once (groupby transforms)
+    """
+    cells = exact_counts(cells, ['ano', region, activity])
+    counts = cells.to_numpy()
+    region_total = cells.groupby(level=['ano', region]).transform('sum').to_numpy()
+    national = cells.groupby(level=['ano', activity]).transform('sum').to_numpy()
+    year_total = cells.groupby(level='ano').transform('sum').to_numpy()
+
+    terms = pd.DataFrame({
+        'hhi': counts ** 2,
+        'ce': np.abs(counts * year_total - national * region_total) - national * region_total,
+        'total': region_total,
+        'scale': region_total * year_total,
+    }, index=cells.index)
+    by_region = terms.groupby(level=['ano', region]).agg({'hhi': 'sum', 'ce': 'sum', 'total': 'first', 'scale': 'first'})
+    return pd.DataFrame({
+        'hhi': (by_region['hhi'] / by_region['total'] ** 2).round(DECIMALS),
+        'ce': ((by_region['scale'] + by_region['ce']) / (2 * by_region['scale'])).clip(lower=0).round(DECIMALS),
+    }).reset_index()
+
+def locational_gini(cells, region, activity) -> pd.DataFrame:
+    """
+    Calculate the locational Gini of every activity across the regions.
+    
+    For each year and activity the regions are sorted by their QL
+    (y_i / x_i, with x_i = E_i / E_n the region's share of all establishments
+    and y_i = E_ij / E_nj its share of the activity); the Gini is one minus
+    twice the area under the resulting Lorenz curve:
+    
+        G = 1 - sum_i x_i * (Y_(i-1) + Y_i),   Y_i = cumulative y
+    
+    0 means the activity is spread like the establishments as a whole, values
+    close to 1 that it is concentrated in a few regions.
+    
+    Args:
+        cells: Establishment counts indexed by at least 'ano', region and activity
+        region: Region column (e.g., 'id_municipio')
+        activity: Activity column (e.g., 'secao')
+    
+    Returns:
+        pd.DataFrame: One row per (year, activity): ano, activity and gini,
+        rounded to DECIMALS
+    
+    Notes:
+        - Regions without the activity have QL 0, come first on the curve
+          and add nothing to the area, so only the non-zero cells are sorted
+        - Within a year and activity the QL is proportional to E_ij / E_i,
+          which is the sort key. Regions tied on it give the same area in
+          any order
+        - The area is summed over integer counts (exact_counts), as
+          sum_i E_i * (2 * C_i - E_ij) / (E_n * E_nj) with C_i the cumulative
+          E_ij, and divided once, so the result does not depend on the
+          order of the cells
+    """
+    cells = exact_counts(cells, ['ano', region, activity])
+    counts = cells.to_numpy()
+    region_total = cells.groupby(level=['ano', region]).transform('sum').to_numpy()
+    activity_total = cells.groupby(level=['ano', activity]).transform('sum').to_numpy()
+    year_total = cells.groupby(level='ano').transform('sum').to_numpy()
+
+    curve = cells.index.to_frame(index=False)[['ano', activity]]
+    curve['total'] = region_total
+    curve['count'] = counts
+    curve['scale'] = activity_total * year_total
+    curve['ql'] = counts / region_total
+    curve = curve.sort_values(['ano', activity, 'ql'], kind='stable')
+
+    cumulative = curve.groupby(['ano', activity], sort=False)['count'].cumsum()
+    curve['area'] = curve['total'] * (2 * cumulative - curve['count'])
+    curve = curve.groupby(['ano', activity]).agg({'area': 'sum', 'scale': 'first'})
+    gini = (curve['scale'] - curve['area']) / curve['scale']
+    return gini.clip(lower=0).round(DECIMALS).reset_index(name='gini')
+
+def exact_counts(cells, keys) -> pd.Series:
+    """
+    Establishment counts summed by keys, as int64.
+    
+    Counts are whole numbers, but may arrive as floats; the indicators are
+    computed from them with integer arithmetic.
+    
+    Args:
+        cells: Establishment counts indexed by at least keys
+        keys: Index levels to keep
+    
+    Returns:
+        pd.Series: int64 counts indexed by keys
+    """
+    cells = cells.groupby(level=keys).sum()
+    return cells.astype(np.int64)
+
+def indicator_tables(cells_sec, cells_div, geo_level) -> dict:
+    """
+    Calculate the specialization and concentration indicators of one geographic level.
+    
+    Args:
+        cells_sec: Establishment counts by year, region and CNAE section
+        cells_div: Establishment counts by year, region and CNAE division
+        geo_level: 'muni', 'micro' or 'meso' (GEO_LEVELS)
+    
+    Returns:
+        dict: Fact table name -> DataFrame:
+        - fact_espec_{geo}: HHI and coefficient of specialization of each
+          region and year, at section and division level
+        - fact_gini_sec_{geo} / fact_gini_div_{geo}: locational Gini of each
+          section / division and year across the regions of the level
+    """
+    region = GEO_LEVELS[geo_level]
+    espec = pd.merge(specialization(cells_sec, region, 'secao'), specialization(cells_div, region, 'divisao'),
+                     how='outer', on=['ano', region], suffixes=('_sec', '_div'))
+    return {
+        f'fact_espec_{geo_level}': espec,
+        f'fact_gini_sec_{geo_level}': locational_gini(cells_sec, region, 'secao'),
+        f'fact_gini_div_{geo_level}': locational_gini(cells_div, region, 'divisao'),
+    }
\ No newline at end of file
@@ -1,11 +1,32 @@
 #%%
 import os
+import re
+import time
+import tempfile
+import numpy as np
 import pandas as pd
-import fastparquet
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.ipc
+import pyarrow.parquet as pq
 from layers.gold.utils.db_insertion import save_to_db
+from layers.gold.config.config_gold import (COUNT_COLUMN, KEY_WIDTHS, QL_ENGINE, CUBE_COLUMNS, SHARED_HANDOFF,
+                                            SHARED_DIR, FINE_CNAE_LEVELS, FINE_GEO_LEVELS, INDICATORS)
+from layers.gold.utils.dimension_cache import load_dimension, cached
+from layers.gold.utils.sparse_ql import sparse_ql, count_base, fact_table, GEO_LEVELS
+from layers.gold.utils import duckdb_ql
+from layers.gold.utils.indicators import indicator_tables
+from layers.silver.utils.validation import arquivo_validado, MAX_DENSE_CODE
+from layers.silver.utils.process_data import arquivo_ordenado
 from concurrent.futures import ProcessPoolExecutor, as_completed
 
-def process_data(file_name, raw_path, out_path, dim_path) -> None:
+# Dimensões usadas para enriquecer os estabelecimentos (build_lookup)
+LOOKUP_DIMENSIONS = ['dim_municipio', 'dim_microrregiao', 'dim_mesorregiao', 'dim_cnae', 'dim_uf']
+
+# Pool de processos do QL mantido entre os anos (calculate_indexes com shared=True)
+_EXECUTOR = None
+
+def process_data(file_name, raw_path, out_path, dim_path, engine=QL_ENGINE) -> None:
     """
     Process a single establishment file through dimension merging and index calculation.
     
@@ -18,26 +39,175 @@ def process_data(file_name, raw_path, out_path, dim_path) -> None:
         raw_path: Path to Silver layer output directory
         out_path: Path to Gold layer output directory (currently unused)
         dim_path: Path to dimension files directory
+        engine: 'pandas' computes the indices over the enriched establishment
+            file; 'cube' computes them over the class cube (build_class_cube)
+            rolled up to cube_columns() (roll_up);
+            'sparse' computes every fact table, section and division included,
+            from sparse region × activity matrices (sparse_ql); 'duckdb' scans
+            the Silver file, enriches it and counts it in DuckDB (duckdb_ql)
         
     Notes:
         - Reads establishment data from Silver layer
         - Merges with all five dimensions (UF, meso, micro, municipality, CNAE)
         - Spawns parallel processes for index calculation
         - Each process calculates indices for one geographic level
+        - The fine CNAE levels (FINE_CNAE_LEVELS, e.g. grupo and classe) are
+          optional and, when enabled, computed by the same engine as the
+          section and division indices (ql_levels)
     """
     file_path = os.path.join(raw_path, file_name)
-
-    df = merge_dimensions(file_path, dim_path)
+    check_engine(engine)
+
+    if engine == 'duckdb':
+        calculate_duckdb_indexes([file_path], [file_year(file_name)], dim_path, arquivo_validado(file_path))
+        return
+    if engine == 'pandas':
+        df = merge_dimensions(file_path, dim_path)
+    else:
+        df = build_class_cube(file_path, dim_path)
+    calculate_all_indexes(df, engine)
+
+def process_years(file_names, raw_path, dim_path, engine=QL_ENGINE) -> pd.DataFrame:
+    """
+    Process several Silver years as one dataset, in a single pass.
+    
+    Each file is read once and reduced to its year × municipality × CNAE class
+    counts; the counts of every year are concatenated, enriched once and
+    every fact table is computed for all years together (the QL arithmetic
+    already groups by 'ano'). Each fact table is then written in one bulk
+    load, with one process pool for the whole run.
+    
+    Args:
+        file_names: Silver files or partitions to include (e.g., the output of select_years)
+        raw_path: Path to Silver layer output directory
+        dim_path: Path to dimension files directory
+        engine: QL engine, as in process_data; 'pandas' and 'cube' both run
+            calculate_idx_* over the counts, which gives the same indices;
+            'duckdb' scans all the files inside one query, so its
+            leitura_s only covers the metadata check
+        
+    Returns:
+        pd.DataFrame: Per-year timings: 'ano', 'leitura_s' (read and count of
+        the year), 'calculo_s' (enrichment and indices, divided evenly by the
+        years) and 'total_s'
+        
+    Notes:
+        - Memory is bounded by the counts, not by the raw rows: only one
+          year of establishments is in memory at a time
+        - Dropped records are reported once, over all years
+    """
+    check_engine(engine)
+    counts, timings, validated = [], [], True
+    for file_name in file_names:
+        start = time.perf_counter()
+        file_path = os.path.join(raw_path, file_name)
+        if engine != 'duckdb':  # a DuckDB lê os arquivos na própria consulta
+            counts.append(count_classes(file_path))
+        validated = validated and arquivo_validado(file_path)
+        timings.append({'ano': file_year(file_name), 'leitura_s': time.perf_counter() - start})
+
+    if not timings:
+        return pd.DataFrame(columns=['ano', 'leitura_s', 'calculo_s', 'total_s'])
+
+    start = time.perf_counter()
+    if engine == 'duckdb':
+        calculate_duckdb_indexes([os.path.join(raw_path, name) for name in file_names],
+                                 [file_year(name) for name in file_names], dim_path, validated)
+    else:
+        cube = enrich_establishments(pd.concat(counts, ignore_index=True), dim_path, validated)
+        del counts
+        calculate_all_indexes(cube, engine)
+    elapsed = time.perf_counter() - start
+
+    timings = pd.DataFrame(timings)
+    timings['calculo_s'] = elapsed / len(timings)
+    timings['total_s'] = timings['leitura_s'] + timings['calculo_s']
+    return timings
+
+def check_engine(engine) -> None:
+    """Raise ValueError for an unknown QL engine."""
+    if engine not in ('pandas', 'cube', 'sparse', 'duckdb'):
+        raise ValueError(f"Engine de QL desconhecida: {engine}")
+
+def calculate_all_indexes(df, engine=QL_ENGINE) -> None:
+    """
+    Calculate and save every fact table from an enriched frame or class cube.
+    
+    Args:
+        df: Enriched establishment records (merge_dimensions) or class cube
+            (build_class_cube), of one or several years
+        engine: 'pandas', 'cube' or 'sparse' (see process_data; 'duckdb'
+            goes through calculate_duckdb_indexes)
+        
+    Notes:
+        - The fine CNAE levels (ql_levels) go through the same engine: the
+          sparse matrices, or calculate_idx_* over a frame or cube that keeps
+          the fine CNAE columns (cube_columns)
+        - With INDICATORS, the specialization and concentration indicators
+          (save_indicators) come with the section and division indices in
+          every engine
+    """
+    if engine == 'sparse':
+        calculate_sparse_indexes(df)
+        if INDICATORS:
+            calculate_indicators(df)
+        return
+    if engine == 'cube':
+        df = roll_up(df)
     calculate_indexes(df)
 
+def ql_levels(geo_level) -> list:
+    """
+    CNAE levels whose location quotients are computed at a geographic level.
+    
+    Args:
+        geo_level: 'muni', 'micro' or 'meso'
+        
+    Returns:
+        list: 'secao' and 'divisao', followed by FINE_CNAE_LEVELS when
+        geo_level is in FINE_GEO_LEVELS (both empty by default)
+    """
+    if FINE_CNAE_LEVELS and geo_level in FINE_GEO_LEVELS:
+        return ['secao', 'divisao'] + [level for level in FINE_CNAE_LEVELS if level not in ('secao', 'divisao')]
+    return ['secao', 'divisao']
+
+def ql_tables() -> list:
+    """Every (geographic level, CNAE level) pair with a fact table to compute (ql_levels)."""
+    return [(geo_level, cnae_level) for geo_level in GEO_LEVELS for cnae_level in ql_levels(geo_level)]
+
+def cube_columns() -> list:
+    """CUBE_COLUMNS plus the enabled fine CNAE levels, which the cube must keep to be rolled up."""
+    fine = {level for geo_level in GEO_LEVELS for level in ql_levels(geo_level)}
+    return CUBE_COLUMNS + [level for level in ('grupo', 'classe') if level in fine]
+
+def select_years(file_names, start=None, end=None) -> list:
+    """
+    Keep the Silver files whose year lies in [start, end], sorted by year.
+    
+    Args:
+        file_names: Silver file or partition names (e.g., 'ESTB2019.parquet', 'ano=2019')
+        start: First year (None: no lower bound)
+        end: Last year (None: no upper bound)
+        
+    Returns:
+        list: Selected names, in year order
+    """
+    selected = [name for name in file_names
+                if (start is None or file_year(name) >= start) and (end is None or file_year(name) <= end)]
+    return sorted(selected, key=file_year)
+
+def file_year(file_name) -> int:
+    """Year of a Silver file or partition name (e.g., 'ESTB2019.parquet' or 'ano=2019' -> 2019)."""
+    return int(re.search(r'(\d{4})', file_name).group(1))
+
 def merge_dimensions(file_path, dim_path) -> pd.DataFrame:
     """
     Merge establishment data with all dimension tables.
     
-    This function performs inner joins between the fact data and five dimension
+    This function enriches the fact data with the attributes of five dimension
     tables, creating a denormalized dataset ready for analytical calculations.
-    The function uses inner joins to ensure data quality, removing records
-    that don't have matching dimension values.
+    Records that don't have matching dimension values are removed, exactly as
+    the inner joins municipality → microregion → mesoregion → CNAE → UF would.
     
     Args:
         file_path: Full path to the establishment parquet file
@@ -47,34 +217,321 @@ def merge_dimensions(file_path, dim_path) -> pd.DataFrame:
         pd.DataFrame: Enriched dataset with all dimension attributes
         
     Notes:
-        - Performs 5 inner joins: municipality → microregion → mesoregion → CNAE → UF
-        - Inner joins remove records without valid dimension matches
+        - The geographic hierarchy is a fixed function of id_municipio and the
+          CNAE hierarchy of classe, so both are precomputed once into lookup
+          tables (build_lookup) and applied by positional take (apply_lookup)
+          instead of five chained pd.merge calls, each copying the full frame
+        - Output columns, column order, dtypes and row order match the merges
         - Prints warning if records are lost during merge (data quality issue)
         - Loss percentage helps identify dimension data problems
+        - With pre-aggregated input, losses are measured in establishments
+        - Accepts integer-coded keys (SILVER_INTEGER_KEYS); align_key casts a
+          dimension key when its type differs from the establishment data
+        - Files validated in silver (SILVER_VALIDATE) already had their unmatched
+          keys moved to the reject files, so the loss accounting is skipped
+    """
+    return enrich_establishments(read_establishments(file_path), dim_path, arquivo_validado(file_path))
+
+def build_class_cube(file_path, dim_path) -> pd.DataFrame:
+    """
+    Count establishments per year × municipality × CNAE class and enrich the counts.
+    
+    Args:
+        file_path: Full path to the establishment parquet file
+        dim_path: Path to the directory containing dimension parquet files
+        
+    Returns:
+        pd.DataFrame: ano, id_municipio, classe and COUNT_COLUMN followed by
+        every dimension attribute (see apply_lookup); the finest grain of the
+        QL, from which every CNAE and geographic level can be rolled up
+    """
+    return enrich_establishments(count_classes(file_path), dim_path, arquivo_validado(file_path))
+
+def count_classes(file_path) -> pd.DataFrame:
+    """
+    Count the establishments of one Silver file per year × municipality × CNAE class.
+    
+    Files written sorted by silver (arquivo_ordenado) hold each (municipality,
+    class) pair of the year in adjacent rows, so they are read as an Arrow
+    table and collapsed into one row per run (count_runs). A single sorted
+    file has one run per key, already in key order, and needs no groupby;
+    the runs of a partition with several files are still summed by it.
+    """
+    keys = ['ano', 'id_municipio', 'classe']
+    if not arquivo_ordenado(file_path):
+        df = read_establishments(file_path)
+        return count_establishments(df, keys).reset_index(name=COUNT_COLUMN)
+
+    runs = count_runs(read_establishments(file_path, as_table=True), keys)
+    if not os.path.isdir(file_path) or len(os.listdir(file_path)) == 1:
+        return runs
+    return count_establishments(runs, keys).reset_index(name=COUNT_COLUMN)
+
+def count_runs(table, keys) -> pd.DataFrame:
+    """
+    Collapse runs of adjacent rows with equal keys into one row with their count.
+    
+    Args:
+        table: Establishment records or counts (COUNT_COLUMN) as an Arrow
+            table, sorted so that equal keys are adjacent
+        keys: Key columns
+        
+    Returns:
+        pd.DataFrame: keys and COUNT_COLUMN, one row per run, with the dtypes
+        read_establishments would give
+        
+    Notes:
+        - The run boundaries are compared in Arrow, without converting the
+          text keys of every row to Python strings
+        - Rows with a missing key are dropped, as groupby does
+        - A key repeated in separate runs (e.g., across the files of a
+          partition) gives several rows, summed by the groupby that follows
+    """
+    if any(table[col].null_count for col in keys):
+        valid = np.ones(table.num_rows, dtype=bool)
+        for col in keys:
+            valid &= pc.is_valid(table[col]).to_numpy(zero_copy_only=False)
+        table = table.filter(valid)
+    starts = np.zeros(table.num_rows, dtype=bool)
+    starts[:1] = True
+    for col in keys:
+        values = table[col]
+        if table.num_rows > 1:
+            starts[1:] |= pc.not_equal(values.slice(1), values.slice(0, table.num_rows - 1)).to_numpy(zero_copy_only=False)
+    starts = np.flatnonzero(starts)
+    if COUNT_COLUMN in table.column_names:
+        weights = table[COUNT_COLUMN].to_numpy()
+        counts = np.add.reduceat(weights, starts) if len(starts) else weights[:0]
+    else:
+        counts = np.diff(np.append(starts, table.num_rows))
+    runs = table.select(keys).take(starts).to_pandas()
+    runs[COUNT_COLUMN] = counts
+    return runs
+
+def roll_up(cube, columns=None) -> pd.DataFrame:
+    """Sum the establishment counts of a cube up to the given columns (default: cube_columns())."""
+    return count_establishments(cube, columns or cube_columns()).reset_index(name=COUNT_COLUMN)
+
+def enrich_establishments(df, dim_path, validated=False) -> pd.DataFrame:
     """
-    df = pd.read_parquet(file_path)
-    original_size = len(df)
+    Attach the dimension attributes to establishment rows or counts.
+    
+    Args:
+        df: Establishment records or counts with id_municipio and classe
+        dim_path: Path to the directory containing dimension parquet files
+        validated: True if the keys were already validated in silver, in which
+            case the loss accounting is skipped
+        
+    Returns:
+        pd.DataFrame: Enriched rows (see apply_lookup)
+    """
+    original_size = None if validated else count_establishments(df)
 
-    dim_muni = pd.read_parquet(os.path.join(dim_path, 'dim_municipio.parquet'))
-    dim_micro = pd.read_parquet(os.path.join(dim_path, 'dim_microrregiao.parquet'))
-    dim_meso = pd.read_parquet(os.path.join(dim_path, 'dim_mesorregiao.parquet'))
-    dim_cnae = pd.read_parquet(os.path.join(dim_path, 'dim_cnae.parquet'))
-    dim_uf = pd.read_parquet(os.path.join(dim_path, 'dim_uf.parquet'))
+    df = apply_lookup(df, load_lookup(dim_path))
 
-    df = pd.merge(df, dim_muni, how='inner', on='id_municipio')
-    df = pd.merge(df, dim_micro, how='inner', on='id_microrregiao')
-    df = pd.merge(df, dim_meso, how='inner', on='id_mesorregiao')
-    df = pd.merge(df, dim_cnae, how='inner', on='classe')
-    df = pd.merge(df, dim_uf, how='inner', on='id_uf')
+    if validated:
+        return df
 
-    final_size = len(df)
+    final_size = count_establishments(df)
     if final_size < original_size:
         lost = original_size - final_size
         print(f"⚠️ ATENÇÃO: {lost} registros removidos por falta de correspondência nas dimensões ({lost/original_size*100:.2f}%)")
 
     return df
 
-def calculate_indexes(df) -> None:
+def build_lookup(dim_path) -> dict:
+    """
+    Precompute the dimension attributes reachable from each establishment key.
+    
+    Args:
+        dim_path: Path to the directory containing dimension parquet files
+        
+    Returns:
+        dict: 'geo' - one row per municipality whose whole chain resolves
+        (municipality → microregion → mesoregion → UF) with the columns of
+        dim_municipio, dim_microrregiao, dim_mesorregiao and dim_uf;
+        'cnae' - dim_cnae; 'geo_columns' / 'uf_columns' - the attribute
+        columns in the order the chained merges add them
+        
+    Notes:
+        - Joins only the dimension tables (a few thousand rows), read through
+          the run-scoped dimension cache
+        - Dimension keys are unique, so each establishment key maps to at most
+          one lookup row, as with the original merges
+    """
+    dim_muni = load_dimension(dim_path, 'dim_municipio')
+    dim_micro = load_dimension(dim_path, 'dim_microrregiao')
+    dim_meso = load_dimension(dim_path, 'dim_mesorregiao')
+    dim_cnae = load_dimension(dim_path, 'dim_cnae')
+    dim_uf = load_dimension(dim_path, 'dim_uf')
+
+    geo = pd.merge(dim_muni, dim_micro, how='inner', on='id_microrregiao')
+    geo = pd.merge(geo, dim_meso, how='inner', on='id_mesorregiao')
+    geo = pd.merge(geo, dim_uf, how='inner', on='id_uf')
+
+    geo_columns = [col for dim, key in ((dim_muni, 'id_municipio'), (dim_micro, 'id_microrregiao'),
+                                        (dim_meso, 'id_mesorregiao')) for col in dim.columns if col != key]
+    return {
+        'geo': geo,
+        'cnae': dim_cnae,
+        'geo_columns': geo_columns,
+        'uf_columns': [col for col in dim_uf.columns if col != 'id_uf'],
+    }
+
+def load_lookup(dim_path) -> dict:
+    """
+    Return build_lookup(dim_path) from the run-scoped dimension cache.
+    
+    The lookup is built once per gold run and shared by every year; it is
+    rebuilt only if one of the five dimension files changed (mtime or size).
+    
+    Args:
+        dim_path: Path to the directory containing dimension parquet files
+        
+    Returns:
+        dict: Lookup tables (see build_lookup), shared and read-only
+    """
+    paths = [os.path.join(dim_path, name + '.parquet') for name in LOOKUP_DIMENSIONS]
+    return cached(('lookup', str(dim_path)), paths, lambda: build_lookup(dim_path))
+
+def apply_lookup(df, lookup) -> pd.DataFrame:
+    """
+    Enrich establishment data from precomputed lookup tables in one step.
+    
+    Args:
+        df: Establishment data with id_municipio and classe
+        lookup: Output of build_lookup
+        
+    Returns:
+        pd.DataFrame: Rows whose keys resolve in both lookups, in their original
+        order, followed by the geographic, CNAE and UF attribute columns
+        
+    Notes:
+        - Each attribute column is gathered with one positional take; no
+          intermediate copy of the full frame is made per dimension
+    """
+    geo = align_key(df, lookup['geo'], 'id_municipio')
+    cnae = align_key(df, lookup['cnae'], 'classe')
+
+    geo_pos = key_positions(geo['id_municipio'], df['id_municipio'])
+    cnae_pos = key_positions(cnae['classe'], df['classe'])
+    keep = (geo_pos >= 0) & (cnae_pos >= 0)
+    if not keep.all():
+        df, geo_pos, cnae_pos = df[keep], geo_pos[keep], cnae_pos[keep]
+
+    out = df.reset_index(drop=True)
+    for table, positions, columns in ((geo, geo_pos, lookup['geo_columns']),
+                                      (cnae, cnae_pos, [col for col in cnae.columns if col != 'classe']),
+                                      (geo, geo_pos, lookup['uf_columns'])):
+        for col in columns:
+            # Series.take preserva o dtype sem reinferir colunas object (mais rápido que montar a partir de arrays)
+            out[col] = table[col].take(positions).set_axis(out.index, copy=False)
+    return out
+
+def key_positions(dim_keys, keys) -> np.ndarray:
+    """
+    Position of each key in a dimension key column (-1 when absent).
+    
+    Args:
+        dim_keys: Unique key column of a dimension or lookup table
+        keys: Establishment key column
+        
+    Returns:
+        np.ndarray: Row positions into dim_keys, suitable for DataFrame.take
+        
+    Notes:
+        - Small non-negative integer codes (IBGE, CNAE) use a dense position
+          table indexed by the code itself; other keys use a hash index
+    """
+    values = keys.to_numpy()
+    codes = dim_keys.to_numpy()
+    if (np.issubdtype(values.dtype, np.integer) and np.issubdtype(codes.dtype, np.integer)
+            and len(codes) and codes.min() >= 0 and codes.max() <= MAX_DENSE_CODE):
+        table = np.full(int(codes.max()) + 1, -1, dtype=np.int64)
+        table[codes] = np.arange(len(codes))
+        inside = (values >= 0) & (values <= codes.max())
+        positions = np.full(len(values), -1, dtype=np.int64)
+        positions[inside] = table[values[inside]]
+        return positions
+    return pd.Index(dim_keys).get_indexer(keys)
+
+def align_key(df, dim, key) -> pd.DataFrame:
+    """
+    Make a dimension join key match the representation used in df.
+    
+    Silver writes establishment files and dimensions in the same key mode,
+    so this is normally a no-op. If one side is integer-coded and the other
+    textual, the dimension key is converted: to integers, or to strings
+    zero-padded to KEY_WIDTHS.
+    
+    Args:
+        df: Establishment data being enriched
+        dim: Dimension table to be merged
+        key: Join column
+        
+    Returns:
+        pd.DataFrame: Dimension table with a compatible key column
+    """
+    left_int = pd.api.types.is_integer_dtype(df[key])
+    right_int = pd.api.types.is_integer_dtype(dim[key])
+    if left_int and not right_int:
+        return dim.assign(**{key: dim[key].astype(str).astype('int64').astype(df[key].dtype)})
+    if right_int and not left_int:
+        return dim.assign(**{key: dim[key].astype(str).str.zfill(KEY_WIDTHS.get(key, 0))})
+    return dim
+
+def read_establishments(file_path, as_table=False):
+    """
+    Read one year of Silver establishment data, in either Silver layout.
+    
+    Args:
+        file_path: Path to a Silver parquet file (e.g., '.../ESTB2020.parquet') or
+            to a hive partition directory of the partitioned layout (e.g., '.../ano=2020')
+        as_table: Return the Arrow table instead of converting it to pandas
+        
+    Returns:
+        pd.DataFrame | pa.Table: Establishment data with an integer 'ano' column
+        
+    Notes:
+        - Partitions are read through the dataset root with a partition filter,
+          so only the selected year's files are opened
+    """
+    partition = os.path.basename(os.path.normpath(file_path))
+    if not partition.startswith('ano='):
+        return pq.read_table(file_path) if as_table else pd.read_parquet(file_path)
+
+    year = int(partition.split('=')[1])
+    root = os.path.dirname(os.path.normpath(file_path))
+    if as_table:
+        table = pq.read_table(root, filters=[('ano', '==', year)])
+        return table.set_column(table.schema.get_field_index('ano'), 'ano', table['ano'].cast(pa.int64()))
+    df = pd.read_parquet(root, filters=[('ano', '==', year)])
+    df['ano'] = df['ano'].astype(int)
+    return df
+
+def count_establishments(df, by=None):
+    """
+    Count establishments, optionally per group.
+    
+    Equivalent to df.groupby(by).size() (or len(df)) for one-row-per-establishment
+    input. When the input is pre-aggregated (COUNT_COLUMN present) the counts are
+    summed instead, yielding the same integer series and therefore identical
+    location quotients.
+    
+    Args:
+        df: Establishment records or pre-aggregated counts
+        by: Grouping columns; None returns the overall total
+        
+    Returns:
+        pd.Series | int: Establishment counts indexed by the group keys, or the total
+    """
+    if by is None:
+        return int(df[COUNT_COLUMN].sum()) if COUNT_COLUMN in df.columns else len(df)
+    if COUNT_COLUMN in df.columns:
+        return df.groupby(by)[COUNT_COLUMN].sum()
+    return df.groupby(by).size()
+
+def calculate_indexes(df, shared=SHARED_HANDOFF) -> None:
     """
     Calculate location quotient indices in parallel using separate processes.
     
@@ -90,12 +547,16 @@ def calculate_indexes(df) -> None:
     
     Args:
         df: Enriched DataFrame with establishment records and all dimensions
+        shared: If True, df is published once in shared memory (publish_frame)
+            and the workers of a pool kept alive across years attach to it;
+            otherwise df is pickled to a fresh pool once per worker
         
     Notes:
         - Uses ProcessPoolExecutor for true parallelism (CPU-bound work)
         - max_workers=None uses number of CPU cores
         - Each process is completely independent (no shared state)
-        - Error handling per process prevents one failure from stopping others
+        - Error handling per process prevents one failure from stopping others;
+          the failures are raised together once all levels finished (wait_indexes)
         - Results are saved directly to database by each process
     """
     
@@ -104,6 +565,19 @@ def calculate_indexes(df) -> None:
         ('Microrregião', calculate_idx_micro),
         ('Mesorregião', calculate_idx_meso)
     ]
+
+    if shared:
+        path = publish_frame(df)
+        try:
+            executor = get_executor()
+            futures = {
+                executor.submit(calculate_from_shared, func, path): name
+                for name, func in functions
+            }
+            wait_indexes(futures)
+        finally:
+            os.remove(path)
+        return
     
     # ProcessPoolExecutor creates separate processes for true parallelism
     with ProcessPoolExecutor(max_workers=None) as executor:
@@ -111,13 +585,188 @@ def calculate_indexes(df) -> None:
             executor.submit(func, df): name 
             for name, func in functions
         }
+        wait_indexes(futures)
+
+def calculate_sparse_indexes(df, levels=None) -> None:
+    """
+    Calculate and save location quotients with the sparse engine.
+    
+    Args:
+        df: Enriched establishment records or class cube (build_class_cube)
+        levels: (geographic level, CNAE level) pairs; default: ql_tables()
+        
+    Notes:
+        - Runs in the calling process: each level is a handful of sparse
+          matrix operations over the non-zero cells, so no worker pool is used
+        - The base count matrix is built once (count_base) and every level
+          is rolled up from it
+        - One fact table per pair of levels (fact_table), e.g. fact_cla_muni
+    """
+    base = count_base(df)
+    for geo_level, cnae_level in levels or ql_tables():
+        save_to_db(sparse_ql(df, geo_level, cnae_level, base), None, [fact_table(cnae_level, geo_level)])
+
+def save_indicators(cells_sec, cells_div, geo_level) -> None:
+    """
+    Calculate and save the specialization and concentration indicators of one geographic level.
+    
+    Args:
+        cells_sec: Establishment counts by year, region and CNAE section (with
+            any extra index levels, e.g. the numerator counts of calculate_idx_*)
+        cells_div: Establishment counts by year, region and CNAE division
+        geo_level: 'muni', 'micro' or 'meso'
         
-        for future in as_completed(futures):
-            name = futures[future]
-            try:
-                future.result()
-            except Exception as exc:
-                print(f"✗ Erro em {name}: {exc}")
+    Notes:
+        - fact_espec_{geo}, fact_gini_sec_{geo} and fact_gini_div_{geo}
+          (indicator_tables)
+    """
+    for table_name, table in indicator_tables(cells_sec, cells_div, geo_level).items():
+        save_to_db(table, None, [table_name])
+
+def calculate_indicators(df) -> None:
+    """
+    Calculate and save the specialization and concentration indicators of every geographic level.
+    
+    Used by the engines that do not run calculate_idx_*, which compute them
+    from their own section and division counts.
+    
+    Args:
+        df: Enriched establishment records or counts
+    """
+    for geo_level, region in GEO_LEVELS.items():
+        save_indicators(count_establishments(df, ['ano', region, 'secao']),
+                        count_establishments(df, ['ano', region, 'divisao']), geo_level)
+
+def calculate_duckdb_indexes(file_paths, years, dim_path, validated=False) -> None:
+    """
+    Calculate and save every fact table with the DuckDB engine.
+    
+    Args:
+        file_paths: Silver files or ano=YYYY partitions
+        years: Years of file_paths
+        dim_path: Path to dimension files directory
+        validated: True if the keys were already validated in silver
+        
+    Notes:
+        - DuckDB reads only the key columns of the selected years, enriches
+          the year × municipality × class counts once (load_base) and every
+          table is a GROUP BY with window totals over them (duckdb_ql); the
+          query runs multi-threaded in the calling process, without a pool
+        - Computes the levels of ql_tables(), fine CNAE levels included
+        - The quotients themselves are computed in numpy, so the tables are
+          identical to the other engines
+    """
+    con = duckdb_ql.connect()
+    try:
+        dtypes = duckdb_ql.load_base(con, file_paths, years, dim_path, validated)
+        for geo_level, cnae_level in ql_tables():
+            save_to_db(duckdb_ql.duckdb_ql(con, geo_level, cnae_level, dtypes), None, [fact_table(cnae_level, geo_level)])
+        if INDICATORS:
+            for geo_level in GEO_LEVELS:
+                save_indicators(duckdb_ql.cell_counts(con, geo_level, 'secao', dtypes),
+                                duckdb_ql.cell_counts(con, geo_level, 'divisao', dtypes), geo_level)
+    finally:
+        con.close()
+
+def wait_indexes(futures) -> None:
+    """
+    Wait for the index futures, reporting failures per geographic level.
+    
+    Raises:
+        RuntimeError: After every future finished, if any level failed, so
+            the caller does not record the year as loaded
+    """
+    failed = []
+    for future in as_completed(futures):
+        name = futures[future]
+        try:
+            future.result()
+        except Exception as exc:
+            print(f"✗ Erro em {name}: {exc}")
+            failed.append(name)
+    if failed:
+        raise RuntimeError(f"Falha no cálculo do QL: {', '.join(failed)}")
+
+def publish_frame(df) -> str:
+    """
+    Publish the columns used by the QL calculations as a memory-mappable Arrow IPC file.
+    
+    Args:
+        df: Enriched establishment data or count cube
+        
+    Returns:
+        str: Path of the IPC file in SHARED_DIR (shared memory when /dev/shm exists)
+        
+    Notes:
+        - Written once per year, instead of one pickle per worker
+        - Only cube_columns() (and COUNT_COLUMN when present) are published;
+          the descriptive dimension columns are not used by the indices
+        - The pandas schema metadata travels with the file, so attach_frame
+          restores the original dtypes
+    """
+    columns = [col for col in cube_columns() + [COUNT_COLUMN] if col in df.columns]
+    table = pa.Table.from_pandas(df[columns], preserve_index=False)
+    fd, path = tempfile.mkstemp(suffix='.arrow', prefix='rais_gold_', dir=SHARED_DIR)
+    os.close(fd)
+    with pa.OSFile(path, 'wb') as sink, pa.ipc.new_file(sink, table.schema) as writer:
+        writer.write_table(table)
+    return path
+
+def attach_frame(path) -> pd.DataFrame:
+    """
+    Attach to a frame published by publish_frame.
+    
+    Args:
+        path: IPC file path returned by publish_frame
+        
+    Returns:
+        pd.DataFrame: Frame with the published columns and their original dtypes
+        
+    Notes:
+        - The file is memory-mapped, so the Arrow buffers are shared with the
+          page cache instead of being copied; numeric columns are converted
+          without copying (split_blocks)
+    """
+    with pa.memory_map(path, 'r') as source:
+        table = pa.ipc.open_file(source).read_all()
+    return table.to_pandas(split_blocks=True)
+
+def calculate_from_shared(func, path) -> None:
+    """Worker entry point: attach to the published frame and run one QL level."""
+    func(attach_frame(path))
+
+def get_executor() -> ProcessPoolExecutor:
+    """
+    Return the QL process pool, creating it on first use.
+    
+    The pool is kept alive across years so worker start-up is paid once per
+    gold run; shutdown_executor releases it at the end of the run.
+    
+    Returns:
+        ProcessPoolExecutor: Shared pool sized like the per-year pool
+        (max_workers=None, one worker per CPU core)
+    """
+    global _EXECUTOR
+    if _EXECUTOR is None:
+        _EXECUTOR = ProcessPoolExecutor(max_workers=None)
+    return _EXECUTOR
+
+def start_executor() -> None:
+    """
+    Create the QL process pool and start its workers right away.
+    
+    Called at the start of a gold run, before any year is loaded, so the
+    workers are forked from a small parent instead of inheriting the pages of
+    the enriched frame of the first year.
+    """
+    get_executor().submit(os.getpid).result()
+
+def shutdown_executor() -> None:
+    """Shut down the QL process pool created by get_executor, if any."""
+    global _EXECUTOR
+    if _EXECUTOR is not None:
+        _EXECUTOR.shutdown()
+        _EXECUTOR = None
 
 def calculate_idx_muni(df):
     """
@@ -140,52 +789,16 @@ def calculate_idx_muni(df):
           * Same metrics but at more granular CNAE division level
         
     Notes:
-        - Groups by: year, UF, municipality, and industry (section/division)
+        - Groups by: year, UF, municipality, and industry (section/division),
+          once (calculate_idx_level)
         - Handles division by zero (infinity replaced with 0)
         - Handles missing values (NaN filled with 0)
         - Rounds results to 3 decimal places
-        - Uses pandas division operator (/) instead of .div() for MultiIndex
+        - With INDICATORS, the section and division counts also feed the
+          specialization and concentration indicators (save_indicators)
         - Drops 'id_uf' column before saving (not needed in fact table)
     """
-    id_cols = ['id_uf', 'id_municipio']
-    secao = ['secao']
-    divisao = ['divisao']
-
-    numerador_sec_nac = df.groupby(['ano'] + id_cols + secao).size() / df.groupby(['ano'] + id_cols).size()
-    denominador_sec_nac = df.groupby(['ano'] + secao).size() / df.groupby(['ano']).size()
-    
-    numerador_sec_est = df.groupby(['ano'] + id_cols + secao).size() / df.groupby(['ano'] + id_cols).size()
-    denominador_sec_est = df.groupby(['ano'] + secao + ['id_uf']).size() / df.groupby(['ano', 'id_uf']).size()
-
-    ql_sec_muni_nac = (numerador_sec_nac / denominador_sec_nac).reset_index(name='indice_muni_nac')
-    ql_sec_muni_est = (numerador_sec_est / denominador_sec_est).reset_index(name='indice_muni_est')
-    ql_sec_muni_nac['indice_muni_nac'] = round(ql_sec_muni_nac['indice_muni_nac'].replace([float('inf'), -float('inf')], 0).fillna(0), 3)
-    ql_sec_muni_est['indice_muni_est'] = round(ql_sec_muni_est['indice_muni_est'].replace([float('inf'), -float('inf')], 0).fillna(0), 3)
-
-    ql_sec_muni = pd.merge(ql_sec_muni_nac, ql_sec_muni_est, how='outer', on=['ano'] + id_cols + secao).drop(axis=1, columns=['id_uf'])
-
-    #------------------
-
-    numerador_div_nac = df.groupby(['ano'] + id_cols + divisao).size() / df.groupby(['ano'] + id_cols).size()
-    denominador_div_nac = df.groupby(['ano'] + divisao).size() / df.groupby(['ano']).size()
-    
-    numerador_div_est = df.groupby(['ano'] + id_cols + divisao).size() / df.groupby(['ano'] + id_cols).size()
-    denominador_div_est = df.groupby(['ano'] + divisao + ['id_uf']).size() / df.groupby(['ano', 'id_uf']).size()
-
-    ql_div_muni_nac = (numerador_div_nac / denominador_div_nac).reset_index(name='indice_muni_nac')
-    ql_div_muni_est = (numerador_div_est / denominador_div_est).reset_index(name='indice_muni_est')
-    ql_div_muni_nac['indice_muni_nac'] = round(ql_div_muni_nac['indice_muni_nac'].replace([float('inf'), -float('inf')], 0).fillna(0), 3)
-    ql_div_muni_est['indice_muni_est'] = round(ql_div_muni_est['indice_muni_est'].replace([float('inf'), -float('inf')], 0).fillna(0), 3)
-
-    ql_div_muni = pd.merge(ql_div_muni_nac, ql_div_muni_est, how='outer', on=['ano'] + id_cols + divisao).drop(axis=1, columns=['id_uf'])
-
-    #------------------
-
-    # print(ql_sec_muni.info())
-
-    # call db save here (another function file)
-    tables = ['fact_sec_muni', 'fact_div_muni']
-    save_to_db(ql_sec_muni, ql_div_muni, tables)
+    calculate_idx_level(df, 'muni')
 
 def calculate_idx_micro(df):
     """
@@ -208,50 +821,17 @@ def calculate_idx_micro(df):
           * Same metrics but at more granular CNAE division level
         
     Notes:
-        - Groups by: year, UF, microregion, and industry (section/division)
+        - Groups by: year, UF, microregion, and industry (section/division),
+          once (calculate_idx_level)
         - Aggregation level: multiple municipalities per microregion
         - Follows same calculation pattern as municipality level
         - Handles infinity and NaN values (replaced with 0)
         - Rounds results to 3 decimal places
+        - With INDICATORS, the section and division counts also feed the
+          specialization and concentration indicators (save_indicators)
         - Geographic context: ~558 microregions in Brazil (2010 definition)
     """
-    id_cols = ['id_uf', 'id_microrregiao']
-    secao = ['secao']
-    divisao = ['divisao']
-
-    # Cálculo para seção - Nacional
-    numerador_sec_nac = df.groupby(['ano'] + id_cols + secao).size() / df.groupby(['ano'] + id_cols).size()
-    denominador_sec_nac = df.groupby(['ano'] + secao).size() / df.groupby(['ano']).size()
-    
-    # Cálculo para seção - Estadual
-    numerador_sec_est = df.groupby(['ano'] + id_cols + secao).size() / df.groupby(['ano'] + id_cols).size()
-    denominador_sec_est = df.groupby(['ano'] + secao + ['id_uf']).size() / df.groupby(['ano', 'id_uf']).size()
-
-    ql_sec_micro_nac = (numerador_sec_nac / denominador_sec_nac).reset_index(name='indice_micro_nac')
-    ql_sec_micro_est = (numerador_sec_est / denominador_sec_est).reset_index(name='indice_micro_est')
-    ql_sec_micro_nac['indice_micro_nac'] = round(ql_sec_micro_nac['indice_micro_nac'].replace([float('inf'), -float('inf')], 0).fillna(0), 3)
-    ql_sec_micro_est['indice_micro_est'] = round(ql_sec_micro_est['indice_micro_est'].replace([float('inf'), -float('inf')], 0).fillna(0), 3)
-
-    ql_sec_micro = pd.merge(ql_sec_micro_nac, ql_sec_micro_est, how='outer', on=['ano'] + id_cols + secao).drop(axis=1, columns=['id_uf'])
-
-    # Cálculo para divisão - Nacional
-    numerador_div_nac = df.groupby(['ano'] + id_cols + divisao).size() / df.groupby(['ano'] + id_cols).size()
-    denominador_div_nac = df.groupby(['ano'] + divisao).size() / df.groupby(['ano']).size()
-    
-    # Cálculo para divisão - Estadual
-    numerador_div_est = df.groupby(['ano'] + id_cols + divisao).size() / df.groupby(['ano'] + id_cols).size()
-    denominador_div_est = df.groupby(['ano'] + divisao + ['id_uf']).size() / df.groupby(['ano', 'id_uf']).size()
-
-    ql_div_micro_nac = (numerador_div_nac / denominador_div_nac).reset_index(name='indice_micro_nac')
-    ql_div_micro_est = (numerador_div_est / denominador_div_est).reset_index(name='indice_micro_est')
-    ql_div_micro_nac['indice_micro_nac'] = round(ql_div_micro_nac['indice_micro_nac'].replace([float('inf'), -float('inf')], 0).fillna(0), 3)
-    ql_div_micro_est['indice_micro_est'] = round(ql_div_micro_est['indice_micro_est'].replace([float('inf'), -float('inf')], 0).fillna(0), 3)
-
-    ql_div_micro = pd.merge(ql_div_micro_nac, ql_div_micro_est, how='outer', on=['ano'] + id_cols + divisao).drop(axis=1, columns=['id_uf'])
-
-    # Salva no banco
-    tables = ['fact_sec_micro', 'fact_div_micro']
-    save_to_db(ql_sec_micro, ql_div_micro, tables)
+    calculate_idx_level(df, 'micro')
 
 def calculate_idx_meso(df):
     """
@@ -273,47 +853,90 @@ def calculate_idx_meso(df):
           * Same metrics but at more granular CNAE division level
         
     Notes:
-        - Groups by: year, UF, mesoregion, and industry (section/division)
+        - Groups by: year, UF, mesoregion, and industry (section/division),
+          once (calculate_idx_level)
         - Aggregation level: multiple microregions per mesoregion
         - Broadest sub-state level (coarsest granularity)
         - Handles infinity and NaN values (replaced with 0)
         - Rounds results to 3 decimal places
+        - With INDICATORS, the section and division counts also feed the
+          specialization and concentration indicators (save_indicators)
         - Geographic context: ~137 mesoregions in Brazil (2010 definition)
     """
-    id_cols = ['id_uf', 'id_mesorregiao']
-    secao = ['secao']
-    divisao = ['divisao']
+    calculate_idx_level(df, 'meso')
 
-    # Cálculo para seção - Nacional
-    numerador_sec_nac = df.groupby(['ano'] + id_cols + secao).size() / df.groupby(['ano'] + id_cols).size()
-    denominador_sec_nac = df.groupby(['ano'] + secao).size() / df.groupby(['ano']).size()
+def calculate_idx_level(df, geo_level, cnae_levels=None) -> None:
+    """
+    Calculate and save the location quotients of one geographic level.
     
-    # Cálculo para seção - Estadual
-    numerador_sec_est = df.groupby(['ano'] + id_cols + secao).size() / df.groupby(['ano'] + id_cols).size()
-    denominador_sec_est = df.groupby(['ano'] + secao + ['id_uf']).size() / df.groupby(['ano', 'id_uf']).size()
-
-    ql_sec_meso_nac = (numerador_sec_nac / denominador_sec_nac).reset_index(name='indice_meso_nac')
-    ql_sec_meso_est = (numerador_sec_est / denominador_sec_est).reset_index(name='indice_meso_est')
-    ql_sec_meso_nac['indice_meso_nac'] = round(ql_sec_meso_nac['indice_meso_nac'].replace([float('inf'), -float('inf')], 0).fillna(0), 3)
-    ql_sec_meso_est['indice_meso_est'] = round(ql_sec_meso_est['indice_meso_est'].replace([float('inf'), -float('inf')], 0).fillna(0), 3)
-
-    ql_sec_meso = pd.merge(ql_sec_meso_nac, ql_sec_meso_est, how='outer', on=['ano'] + id_cols + secao).drop(axis=1, columns=['id_uf'])
-
-    # Cálculo para divisão - Nacional
-    numerador_div_nac = df.groupby(['ano'] + id_cols + divisao).size() / df.groupby(['ano'] + id_cols).size()
-    denominador_div_nac = df.groupby(['ano'] + divisao).size() / df.groupby(['ano']).size()
+    The establishments are grouped once, at year × UF × region × every CNAE
+    level; all the other counts are sums of these cells: the counts of each
+    CNAE level, the region, state and national totals and the state and
+    national counts of each activity.
     
-    # Cálculo para divisão - Estadual
-    numerador_div_est = df.groupby(['ano'] + id_cols + divisao).size() / df.groupby(['ano'] + id_cols).size()
-    denominador_div_est = df.groupby(['ano'] + divisao + ['id_uf']).size() / df.groupby(['ano', 'id_uf']).size()
-
-    ql_div_meso_nac = (numerador_div_nac / denominador_div_nac).reset_index(name='indice_meso_nac')
-    ql_div_meso_est = (numerador_div_est / denominador_div_est).reset_index(name='indice_meso_est')
-    ql_div_meso_nac['indice_meso_nac'] = round(ql_div_meso_nac['indice_meso_nac'].replace([float('inf'), -float('inf')], 0).fillna(0), 3)
-    ql_div_meso_est['indice_meso_est'] = round(ql_div_meso_est['indice_meso_est'].replace([float('inf'), -float('inf')], 0).fillna(0), 3)
-
-    ql_div_meso = pd.merge(ql_div_meso_nac, ql_div_meso_est, how='outer', on=['ano'] + id_cols + divisao).drop(axis=1, columns=['id_uf'])
-
-    # Salva no banco
-    tables = ['fact_sec_meso', 'fact_div_meso']
-    save_to_db(ql_sec_meso, ql_div_meso, tables)
+    Args:
+        df: Enriched establishment records or count cube
+        geo_level: 'muni', 'micro' or 'meso' (GEO_LEVELS)
+        cnae_levels: CNAE levels, coarsest first; default: ql_levels(geo_level)
+        
+    Notes:
+        - The section and division tables are saved together, as
+          save_to_db(ql_sec, ql_div, tables); with INDICATORS their counts
+          also feed the specialization and concentration indicators
+          (save_indicators); the fine levels are saved one table at a time
+        - The hierarchy is functional (a division belongs to one section, a
+          municipality to one UF), so the sums match the per-level groupbys
+    """
+    region = GEO_LEVELS[geo_level]
+    cnae_levels = cnae_levels or ql_levels(geo_level)
+    cells = count_establishments(df, ['ano', 'id_uf', region] + cnae_levels)
+    region_total = cells.groupby(level=['ano', 'id_uf', region]).sum()
+    state_total = region_total.groupby(level=['ano', 'id_uf']).sum()
+    year_total = state_total.groupby(level='ano').sum()
+
+    counts = {level: cells.groupby(level=['ano', 'id_uf', region, level]).sum() for level in cnae_levels}
+    tables = {fact_table(level, geo_level): location_quotients(counts[level], region_total, state_total,
+                                                               year_total, geo_level)
+              for level in cnae_levels}
+
+    save_to_db(tables.pop(fact_table('secao', geo_level)), tables.pop(fact_table('divisao', geo_level)),
+               [fact_table('secao', geo_level), fact_table('divisao', geo_level)])
+    for table_name, table in tables.items():
+        save_to_db(table, None, [table_name])
+    if INDICATORS:
+        save_indicators(counts['secao'], counts['divisao'], geo_level)
+
+def location_quotients(counts, region_total, state_total, year_total, geo_level) -> pd.DataFrame:
+    """
+    National and state location quotients of the cells of one CNAE level.
+    
+    Args:
+        counts: Establishment counts indexed by (ano, id_uf, region, activity)
+        region_total: Counts by (ano, id_uf, region)
+        state_total: Counts by (ano, id_uf)
+        year_total: Counts by ano
+        geo_level: 'muni', 'micro' or 'meso', used in the column names
+        
+    Returns:
+        pd.DataFrame: ano, region, activity, indice_{geo}_nac and indice_{geo}_est
+        
+    Notes:
+        - The regional share (numerator) is computed once and divided by the
+          national and by the state share of the activity
+        - Handles division by zero (infinity replaced with 0) and missing
+          values (NaN filled with 0); rounds to 3 decimal places
+        - Uses pandas division operator (/) instead of .div() for MultiIndex
+    """
+    keys = list(counts.index.names)
+    activity = keys[-1]
+    numerador = counts / region_total
+    state_activity = counts.groupby(level=['ano', activity, 'id_uf']).sum()
+    national_activity = state_activity.groupby(level=['ano', activity]).sum()
+
+    ql_nac = (numerador / (national_activity / year_total)).reset_index(name=f'indice_{geo_level}_nac')
+    ql_est = (numerador / (state_activity / state_total)).reset_index(name=f'indice_{geo_level}_est')
+    for ql in (ql_nac, ql_est):
+        column = ql.columns[-1]
+        ql[column] = round(ql[column].replace([float('inf'), -float('inf')], 0).fillna(0), 3)
+
+    return pd.merge(ql_nac, ql_est, how='outer', on=keys).drop(axis=1, columns=['id_uf'])
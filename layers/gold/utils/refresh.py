@@ -0,0 +1,186 @@
+#%%
+import os
+import hashlib
+from sqlalchemy import text
+from layers.common.manifest import carrega_manifesto, content_hash
+from layers.gold.utils.db_config import create_engine_connection
+from layers.gold.utils.db_model import FACT_TABLES
+from layers.gold.utils.db_insertion import delete_years
+from layers.gold.utils.process_data import file_year
+from layers.gold.config.config_gold import DIM_PATH, FINE_CNAE_LEVELS, FINE_GEO_LEVELS, INDICATORS
+
+# Incrementar quando o cálculo mudar de forma a invalidar as tabelas fato já
+# carregadas (mudanças de esquema são migradas por migrate_database)
+GOLD_VERSION = '2'
+VERSION_ITEM = 'versao'
+
+def gold_version() -> str:
+    """
+    Version of the gold computation the loaded facts were produced with.
+    
+    Returns:
+        str: GOLD_VERSION plus the fine CNAE and geographic levels and the
+        indicators flag, since changing them changes which fact tables are filled
+    """
+    version = f"{GOLD_VERSION}:{','.join(FINE_CNAE_LEVELS)}:{','.join(FINE_GEO_LEVELS)}"
+    return version + ':indicadores' if INDICATORS else version
+
+def year_item(year) -> str:
+    """Load state key of one year (e.g., 2019 -> 'ano=2019')."""
+    return f"ano={year}"
+
+def year_fingerprint(file_path) -> str:
+    """
+    Content fingerprint of a Silver year.
+    
+    Args:
+        file_path: Silver Parquet file or ano=YYYY partition directory
+    
+    Returns:
+        str: content_hash of the file, or a digest of the name and content hash
+        of every file in the partition
+    """
+    if not os.path.isdir(file_path):
+        return content_hash(file_path)
+    digest = hashlib.blake2b(digest_size=32)
+    for name in sorted(os.listdir(file_path)):
+        digest.update(f"{name}={content_hash(os.path.join(file_path, name))};".encode())
+    return digest.hexdigest()
+
+def load_state() -> dict:
+    """
+    Read what the gold layer has loaded into the database.
+    
+    Returns:
+        dict | None: Hash per item (see create_load_state), or None if the
+        database has no load state table (never loaded, or loaded before it
+        existed)
+    """
+    engine = create_engine_connection()
+    with engine.connect() as conn:
+        if conn.execute(text("SELECT to_regclass('dimensional.carga_gold')")).scalar() is None:
+            state = None
+        else:
+            state = dict(conn.execute(text("SELECT item, hash FROM dimensional.carga_gold")).all())
+    return state
+
+def save_state(items) -> None:
+    """
+    Record loaded items (upsert on the item key).
+    
+    Args:
+        items: Hash per item, e.g. {'ano=2019': fingerprint, 'dim_cnae': hash}
+    """
+    if not items:
+        return
+    engine = create_engine_connection()
+    with engine.begin() as conn:
+        conn.execute(text("""
+            INSERT INTO dimensional.carga_gold (item, hash, carregado_em)
+            VALUES (:item, :hash, now())
+            ON CONFLICT (item) DO UPDATE SET hash = EXCLUDED.hash, carregado_em = EXCLUDED.carregado_em
+        """), [{'item': item, 'hash': digest} for item, digest in items.items()])
+
+def dimension_hashes() -> dict:
+    """
+    Output hash of every Silver dimension.
+    
+    Read from the dimension manifest the silver layer writes next to DIM_PATH
+    (manifest_dimensions.json), whose entries record the content hash of
+    each dimension Parquet ('hash').
+    
+    Returns:
+        dict: Hash per dimension name (e.g., {'dim_cnae': ...})
+    """
+    return {name: entry.get('hash') for name, entry in carrega_manifesto(DIM_PATH).items()}
+
+def changed_dimensions(state) -> list:
+    """
+    Dimensions whose Silver output differs from the loaded one.
+    
+    Args:
+        state: Output of load_state
+    
+    Returns:
+        list: Names of the dimensions that changed, were added or were
+        removed since the last full load
+    """
+    current = dimension_hashes()
+    loaded = {item for item in state if item != VERSION_ITEM and not item.startswith('ano=')}
+    return sorted(name for name in loaded | current.keys() if state.get(name) != current.get(name))
+
+def base_state() -> dict:
+    """Items recorded by a full load besides the years: the gold version and the dimension hashes."""
+    return {VERSION_ITEM: gold_version(), **dimension_hashes()}
+
+def full_load_reason(state) -> str:
+    """
+    Decide whether the loaded database can be refreshed year by year.
+    
+    Args:
+        state: Output of load_state
+    
+    Returns:
+        str | None: Why a full load is needed (no previous load, another gold
+        version, changed dimensions), or None if only years can be refreshed
+    """
+    if not state:
+        return "nenhuma carga anterior registrada"
+    if state.get(VERSION_ITEM) != gold_version():
+        return f"versão da Gold alterada ({state.get(VERSION_ITEM)} -> {gold_version()})"
+    changed = changed_dimensions(state)
+    if changed:
+        return f"dimensões alteradas: {', '.join(changed)}"
+    return None
+
+def changed_years(file_names, raw_path, state) -> tuple:
+    """
+    Compare the Silver years with the load state.
+    
+    Args:
+        file_names: Silver files or partitions (output of select_years)
+        raw_path: Silver establishments directory
+        state: Output of load_state ({} for a database being rebuilt)
+    
+    Returns:
+        tuple: (files whose content differs from the loaded one or that were
+        never loaded, fingerprint per file)
+    """
+    fingerprints = {name: year_fingerprint(os.path.join(raw_path, name)) for name in file_names}
+    pending = [name for name in file_names if state.get(year_item(file_year(name))) != fingerprints[name]]
+    return pending, fingerprints
+
+def removed_years(file_names, state, start=None, end=None) -> list:
+    """
+    Loaded years inside [start, end] that no longer have a Silver file.
+    
+    Args:
+        file_names: Silver files or partitions (output of select_years)
+        state: Output of load_state
+        start: First year of the run (None: no lower bound)
+        end: Last year of the run (None: no upper bound)
+    
+    Returns:
+        list: Years to delete from the fact tables
+    """
+    present = {file_year(name) for name in file_names}
+    loaded = [int(item.split('=')[1]) for item in state if item.startswith('ano=')]
+    return sorted(year for year in loaded
+                  if year not in present and (start is None or year >= start) and (end is None or year <= end))
+
+def remove_years(years) -> None:
+    """
+    Delete years from every fact table and from the load state, in one transaction.
+    
+    Args:
+        years: Years to remove
+    """
+    if not years:
+        return
+    engine = create_engine_connection()
+    with engine.begin() as conn:
+        for table_name in FACT_TABLES:
+            delete_years(conn, table_name, years)
+        conn.execute(text("DELETE FROM dimensional.carga_gold WHERE item = ANY(:items)"),
+                     {'items': [year_item(year) for year in years]})
+    print(f"✓ Removidos das tabelas fato: {', '.join(map(str, years))}")
\ No newline at end of file
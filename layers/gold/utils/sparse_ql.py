@@ -0,0 +1,195 @@
+#%%
+import numpy as np
+import pandas as pd
+from scipy import sparse
+from layers.gold.config.config_gold import COUNT_COLUMN
+
+# Níveis geográficos -> coluna da região; níveis CNAE -> abreviação no nome da tabela fato
+GEO_LEVELS = {'muni': 'id_municipio', 'micro': 'id_microrregiao', 'meso': 'id_mesorregiao'}
+CNAE_LEVELS = {'secao': 'sec', 'divisao': 'div', 'grupo': 'gru', 'classe': 'cla'}
+
+def fact_table(cnae_level, geo_level) -> str:
+    """
+    Name of the fact table holding the QL of one CNAE level at one geographic level.
+    
+    Args:
+        cnae_level: 'secao', 'divisao', 'grupo' or 'classe'
+        geo_level: 'muni', 'micro' or 'meso'
+    
+    Returns:
+        str: Table name following fact_{classification}_{geography} (e.g., 'fact_cla_muni')
+    """
+    return f"fact_{CNAE_LEVELS[cnae_level]}_{geo_level}"
+
+def sparse_ql(df, geo_level, cnae_level, base=None) -> pd.DataFrame:
+    """
+    Calculate national and state location quotients from a sparse region × activity matrix.
+    
+    The establishment counts are held in a scipy.sparse matrix B whose rows
+    are the (year, municipality) pairs and whose columns are the CNAE classes
+    (count_base), storing only the non-zero cells. The matrix of the requested
+    levels is the roll-up E = R @ B @ C, where R sums municipalities into
+    (year, region) rows and C sums classes into activities. Region totals are
+    the row sums of E; national and state totals are the rows of Y @ E and
+    P @ E, where Y maps each row to its year and P to its (year, state). The
+    QL of each stored cell is then
+    
+        national: (E[i, j] / rows[i]) / (year[y(i), j] / year_total[y(i)])
+        state:    (E[i, j] / rows[i]) / (state[u(i), j] / state_total[u(i)])
+    
+    so every year is computed in the same vectorized pass.
+    
+    Args:
+        df: Enriched establishment records or counts (COUNT_COLUMN) with 'ano',
+            id_municipio, classe and the geographic and CNAE hierarchy columns,
+            of one or several years
+        geo_level: 'muni', 'micro' or 'meso' (GEO_LEVELS)
+        cnae_level: Any CNAE level of dim_cnae: 'secao', 'divisao', 'grupo' or 'classe'
+        base: count_base(df), when several levels are computed from the same df
+    
+    Returns:
+        pd.DataFrame: One row per (year, region, activity) with at least one
+        establishment, sorted by them, with the columns of the fact tables:
+        ano, region, activity, indice_{geo}_nac and indice_{geo}_est
+    
+    Notes:
+        - Memory is proportional to the non-zero cells (at most one per input
+          row), not to years × regions × activities
+        - The divisions are evaluated in the same order as calculate_idx_*,
+          so secao/divisao results are identical to the pandas engine,
+          including the 3-decimal rounding
+        
+    Raises:
+        ValueError: If geo_level or cnae_level is unknown
+    """
+    if geo_level not in GEO_LEVELS or cnae_level not in CNAE_LEVELS:
+        raise ValueError(f"Nível de QL desconhecido: {geo_level} × {cnae_level}")
+    region = GEO_LEVELS[geo_level]
+    if base is None:
+        base = count_base(df)
+
+    # R: (ano, município) -> (ano, região)
+    region_codes, regions = base['geo'][region]
+    row_region = region_codes[base['row_municipio']]
+    row_codes, row_keys = pd.factorize(base['row_ano'] * len(regions) + row_region, sort=True)
+    year_codes, region_of_row = np.divmod(row_keys, len(regions))
+    matrix = indicator(row_codes) @ base['matrix']
+
+    # C: classe -> atividade
+    activity_codes, activities = base['cnae'][cnae_level]
+    if cnae_level != 'classe':
+        matrix = matrix @ indicator(activity_codes).T
+    matrix = matrix.tocsr()
+    matrix.sum_duplicates()
+    matrix.eliminate_zeros()
+
+    # estado de cada linha, por ano (a hierarquia geográfica é funcional)
+    uf_codes, ufs = base['geo']['id_uf']
+    row_uf = np.empty(len(row_keys), dtype=np.int64)
+    row_uf[row_codes] = uf_codes[base['row_municipio']]
+    state_codes, _ = pd.factorize(year_codes * len(ufs) + row_uf)
+
+    rows = np.asarray(matrix.sum(axis=1)).ravel()
+    year = (indicator(year_codes) @ matrix).toarray()
+    year_total = year.sum(axis=1)
+    state = (indicator(state_codes) @ matrix).toarray()
+    state_total = state.sum(axis=1)
+
+    # Coordenadas das células não nulas (CSR canônico: linhas e atividades ordenadas)
+    i = np.repeat(np.arange(matrix.shape[0]), np.diff(matrix.indptr))
+    j = matrix.indices
+    y = year_codes[i]
+    u = state_codes[i]
+
+    share = matrix.data / rows[i]
+    ql_nac = share / (year[y, j] / year_total[y])
+    ql_est = share / (state[u, j] / state_total[u])
+
+    return pd.DataFrame({
+        'ano': base['anos'].take(y),
+        region: regions.take(region_of_row[i]),
+        cnae_level: activities.take(j),
+        f'indice_{geo_level}_nac': np.round(clean(ql_nac), 3),
+        f'indice_{geo_level}_est': np.round(clean(ql_est), 3),
+    })
+
+def count_base(df) -> dict:
+    """
+    Build the sparse (year, municipality) × class count matrix every level is rolled up from.
+    
+    Args:
+        df: Enriched establishment records or counts
+    
+    Returns:
+        dict: 'matrix' - csr_matrix of int64 counts; 'anos' - sorted years;
+        'row_ano' / 'row_municipio' - year and municipality code of each row;
+        'geo' / 'cnae' - per hierarchy column, (code of each municipality /
+        class, sorted labels)
+    
+    Notes:
+        - The keys are factorized once; the hierarchy columns are read only
+          at one row per municipality and per class, since they are fixed
+          functions of id_municipio and classe
+        - Duplicated cells are summed, so one row per establishment and
+          pre-aggregated counts give the same matrix
+        - Rows with a missing key are ignored, as in groupby
+    """
+    year_codes, years = pd.factorize(df['ano'], sort=True)
+    muni_codes, munis = pd.factorize(df['id_municipio'], sort=True)
+    class_codes, classes = pd.factorize(df['classe'], sort=True)
+    if COUNT_COLUMN in df.columns:
+        counts = df[COUNT_COLUMN].to_numpy(dtype=np.int64)
+    else:
+        counts = np.ones(len(df), dtype=np.int64)
+
+    valid = (year_codes >= 0) & (muni_codes >= 0) & (class_codes >= 0)
+    positions = np.flatnonzero(valid)
+    year_codes, muni_codes, class_codes, counts = (
+        year_codes[valid], muni_codes[valid], class_codes[valid], counts[valid])
+
+    # linha = par (ano, município) observado, em ordem de ano e município
+    row_codes, row_keys = pd.factorize(year_codes.astype(np.int64) * len(munis) + muni_codes, sort=True)
+    row_ano, row_municipio = np.divmod(row_keys, len(munis))
+    matrix = sparse.csr_matrix((counts, (row_codes, class_codes)), shape=(len(row_keys), len(classes)))
+
+    return {
+        'matrix': matrix,
+        'anos': years,
+        'row_ano': row_ano,
+        'row_municipio': row_municipio,
+        'geo': hierarchy(df, positions, muni_codes, len(munis), GEO_LEVELS.values(), 'id_uf'),
+        'cnae': hierarchy(df, positions, class_codes, len(classes), CNAE_LEVELS),
+    }
+
+def hierarchy(df, positions, key_codes, size, *columns) -> dict:
+    """
+    Code every key (municipality or class) at each level of its hierarchy.
+    
+    Args:
+        df: Enriched rows
+        positions: Row positions in df of the valid keys
+        key_codes: Key code of each valid row
+        size: Number of distinct keys
+        columns: Hierarchy columns (iterables or single names); absent ones are skipped
+    
+    Returns:
+        dict: Column -> (code of each key, sorted labels)
+    """
+    # uma linha de df por chave basta: a hierarquia é função da chave
+    sample = np.empty(size, dtype=np.int64)
+    sample[key_codes] = positions
+    names = [name for group in columns for name in ([group] if isinstance(group, str) else group)]
+    levels = {}
+    for name in dict.fromkeys(names):
+        if name in df.columns:
+            levels[name] = pd.factorize(df[name].take(sample), sort=True)
+    return levels
+
+def indicator(codes) -> sparse.csr_matrix:
+    """Sparse 0/1 matrix (groups × rows) that sums the rows of a matrix by group code."""
+    return sparse.csr_matrix((np.ones(len(codes), dtype=np.int64), (codes, np.arange(len(codes)))),
+                             shape=(int(codes.max()) + 1 if len(codes) else 0, len(codes)))
+
+def clean(values) -> np.ndarray:
+    """Replace inf and NaN with 0, as the pandas engine does before rounding."""
+    return np.nan_to_num(values, nan=0.0, posinf=0.0, neginf=0.0)
\ No newline at end of file
@@ -1,7 +1,43 @@
+import os
 from pathlib import Path
+from dotenv import load_dotenv
+
+load_dotenv()
 
 BASE_DIR = Path(__file__).resolve().parents[2]  # sobe 2 níveis
 PATH_ESTB_BRONZE = BASE_DIR / 'bronze' / 'data' / 'conformed' / 'estabelecimentos'
 OUT_PATH_ESTB_SILVER = BASE_DIR / 'silver' / 'data' / 'estabelecimentos'
 DIM_RAW_PATH = BASE_DIR.parent / 'dicionarios'
-DIM_OUT_PATH = BASE_DIR / 'silver' / 'data' / 'dimensions'
\ No newline at end of file
+DIM_OUT_PATH = BASE_DIR / 'silver' / 'data' / 'dimensions'
+
+# Coluna com a contagem de estabelecimentos quando a Bronze é pré-agregada
+COUNT_COLUMN = 'qtd_estabelecimentos'
+
+# Layout de saída: 'files' (um Parquet por ano) ou 'partitioned'
+# (dataset hive particionado por ano=YYYY/, zstd, row groups dimensionados)
+LAYOUT = os.getenv("SILVER_LAYOUT", "files")
+COMPRESSION = os.getenv("PARQUET_COMPRESSION", "zstd")
+ROW_GROUP_SIZE = int(os.getenv("PARQUET_ROW_GROUP_SIZE", "1000000"))
+
+# Engine de normalização: 'pandas' ou 'arrow' (kernels de pyarrow.compute)
+ENGINE = os.getenv("SILVER_ENGINE", "pandas")
+
+# Chaves inteiras (int32/int16) em vez de strings com zeros à esquerda
+INTEGER_KEYS = os.getenv("SILVER_INTEGER_KEYS", "0") == "1"
+
+# Largura das chaves textuais (zero-padding)
+KEY_WIDTHS = {'id_municipio': 6, 'classe': 5}
+
+# Processos usados para transformar os anos em paralelo (1 = sequencial)
+WORKERS = int(os.getenv("SILVER_WORKERS", "1"))
+
+# Arquivos ordenados por (id_municipio, classe) com page index, estatísticas e
+# bloom filters, para consultas pontuais por município/classe
+SORTED = os.getenv("SILVER_SORTED", "0") == "1"
+SORTED_ROW_GROUP_SIZE = int(os.getenv("SILVER_SORTED_ROW_GROUP_SIZE", "131072"))
+BLOOM_FILTER_FPP = float(os.getenv("SILVER_BLOOM_FILTER_FPP", "0.01"))
+
+# Validação das chaves contra as dimensões: linhas sem correspondência vão para
+# REJECT_PATH (um Parquet por ano, com o motivo) em vez de seguir para a Gold
+VALIDATE = os.getenv("SILVER_VALIDATE", "0") == "1"
+REJECT_PATH = BASE_DIR / 'silver' / 'data' / 'rejeitados'
\ No newline at end of file
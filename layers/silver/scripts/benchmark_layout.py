@@ -0,0 +1,72 @@
+#%%
+import os
+import sys
+import time
+import tempfile
+import pandas as pd
+from layers.silver.utils.process_data import grava_silver
+from layers.silver.config.config_silver import OUT_PATH_ESTB_SILVER
+
+def tamanho_em_disco(path) -> int:
+    """Return the total size in bytes of every file under path."""
+    return sum(os.path.getsize(os.path.join(root, f)) for root, _, files in os.walk(path) for f in files)
+
+def cronometra(func, repeat=3) -> float:
+    """Return the best wall-clock time, in seconds, of repeat calls to func."""
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+def compara_layouts(files_path=OUT_PATH_ESTB_SILVER, year=None) -> pd.DataFrame:
+    """
+    Compare the one-file-per-year Silver layout against the partitioned dataset.
+    
+    Reads every Silver file in files_path (current 'files' layout), rewrites
+    them as a hive-partitioned dataset in a temporary directory using
+    grava_silver(..., layout='partitioned') and measures, for both layouts:
+    - on-disk size
+    - time to read all years
+    - time to read a single year (partition filter on the dataset)
+    
+    Args:
+        files_path: Directory with ESTB{ANO}.parquet files in the 'files' layout
+        year: Year used for the single-year read (default: the most recent one)
+        
+    Returns:
+        pd.DataFrame: One row per layout with size (MB) and read times (s)
+    """
+    file_list = sorted(f for f in os.listdir(files_path) if f.endswith('.parquet'))
+    years = {int(f.split('.')[0][-4:]): f for f in file_list}
+    year = year or max(years)
+
+    with tempfile.TemporaryDirectory() as dataset_path:
+        for file_name in file_list:
+            grava_silver(pd.read_parquet(os.path.join(files_path, file_name)), file_name, dataset_path, 'partitioned')
+
+        results = pd.DataFrame([
+            {
+                'layout': 'files (fastparquet)',
+                'tamanho_mb': tamanho_em_disco(files_path) / 1e6,
+                'leitura_total_s': cronometra(lambda: [pd.read_parquet(os.path.join(files_path, f)) for f in file_list]),
+                'leitura_ano_s': cronometra(lambda: pd.read_parquet(os.path.join(files_path, years[year]))),
+            },
+            {
+                'layout': 'partitioned (zstd)',
+                'tamanho_mb': tamanho_em_disco(dataset_path) / 1e6,
+                'leitura_total_s': cronometra(lambda: pd.read_parquet(dataset_path)),
+                'leitura_ano_s': cronometra(lambda: pd.read_parquet(dataset_path, filters=[('ano', '==', year)])),
+            },
+        ])
+
+    print(f"Comparação de layouts ({len(file_list)} anos, leitura individual de {year}):")
+    print(results.to_string(index=False, float_format=lambda v: f"{v:.3f}"))
+    return results
+
+if __name__ == "__main__":
+    # Uso: python -m layers.silver.scripts.benchmark_layout [diretório_silver] [ano]
+    path = sys.argv[1] if len(sys.argv) > 1 else OUT_PATH_ESTB_SILVER
+    year = int(sys.argv[2]) if len(sys.argv) > 2 else None
+    compara_layouts(path, year)
\ No newline at end of file
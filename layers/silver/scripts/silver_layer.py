@@ -1,27 +1,94 @@
 #%%
 import os
+import argparse
 import pandas as pd
 import time
-from layers.silver.utils.process_data import processa_dados
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from layers.silver.utils.process_data import processa_dados, lista_arquivos
 from layers.silver.utils.process_dimensions import cria_dimensoes
-from layers.silver.config.config_silver import PATH_ESTB_BRONZE, OUT_PATH_ESTB_SILVER
+from layers.silver.config.config_silver import PATH_ESTB_BRONZE, OUT_PATH_ESTB_SILVER, WORKERS
 
-def run_silver_layer() -> None:
+def run_silver_layer(workers: int = WORKERS, force: bool = False) -> list:
     """
     Process all files in PATH_ESTB_BRONZE and write results to OUT_PATH_ESTB_SILVER.
-    Lists files in PATH_ESTB_BRONZE, initializes dimensions via cria_dimensoes(),
+    Lists files in PATH_ESTB_BRONZE (plain files or ano=YYYY/ partitions), initializes dimensions via cria_dimensoes(),
     and processes each file with processa_dados(...), printing progress as it runs.
-    Returns None. May raise OSError if PATH_ESTB_BRONZE is not accessible.
+    Dimensions are created once, before any year is transformed, and only the ones whose source dictionaries,
+    build version or key mode changed are rebuilt (see cria_dimensoes). With workers > 1 the years, which are
+    independent of each other, are dispatched to a process pool capped at workers (and at the number of files),
+    largest files first; each year writes its own output file, so the result does not depend on completion order.
+    A failure in one year does not stop the others; the failed files are reported and a RuntimeError is raised
+    at the end. Prints a per-file summary (rows, seconds, output size) and returns the summaries sorted by file.
+    May raise OSError if PATH_ESTB_BRONZE is not accessible.
     """
-    file_list = os.listdir(PATH_ESTB_BRONZE)
-    cria_dimensoes()
-    for file_name in file_list:
-        print(f"Processando: {file_name}")
-        processa_dados(file_name, PATH_ESTB_BRONZE, OUT_PATH_ESTB_SILVER)
+    file_list = lista_arquivos(PATH_ESTB_BRONZE)
+    cria_dimensoes(force=force)
+
+    if workers is None or workers <= 1 or len(file_list) <= 1:
+        results = []
+        for file_name in file_list:
+            print(f"Processando: {file_name}")
+            results.append(processa_dados(file_name, PATH_ESTB_BRONZE, OUT_PATH_ESTB_SILVER))
+        print_summary(results)
+        return results
+
+    # Maiores arquivos primeiro para que a cauda longa não domine o tempo total
+    file_list.sort(key=lambda f: os.path.getsize(os.path.join(PATH_ESTB_BRONZE, f)), reverse=True)
+
+    results, errors = [], {}
+    with ProcessPoolExecutor(max_workers=min(workers, len(file_list))) as executor:
+        futures = {
+            executor.submit(processa_dados, file_name, PATH_ESTB_BRONZE, OUT_PATH_ESTB_SILVER): file_name
+            for file_name in file_list
+        }
+        for future in as_completed(futures):
+            file_name = futures[future]
+            try:
+                results.append(future.result())
+                print(f"✓ Concluído: {file_name}")
+            except Exception as exc:
+                errors[file_name] = exc
+                print(f"✗ Erro em {file_name}: {exc}")
+
+    results.sort(key=lambda r: r['file'])
+    print_summary(results)
+    if errors:
+        raise RuntimeError(f"Falha ao processar {len(errors)} arquivo(s): {', '.join(sorted(errors))}")
+    return results
+
+def print_summary(results) -> None:
+    """Print one line per processed file (rows read, rows written, seconds,
+    output size) followed by the totals."""
+    print(f"\n{'Arquivo':<30}{'Lidas':>14}{'Gravadas':>14}{'Segundos':>10}{'MB':>10}")
+    for r in sorted(results, key=lambda r: r['file']):
+        print(f"{r['file']:<30}{r['rows_in']:>14}{r['rows_out']:>14}{r['seconds']:>10.2f}{r['output_bytes'] / 1e6:>10.1f}")
+    print(f"{'Total':<30}{sum(r['rows_in'] for r in results):>14}{sum(r['rows_out'] for r in results):>14}"
+          f"{sum(r['seconds'] for r in results):>10.2f}{sum(r['output_bytes'] for r in results) / 1e6:>10.1f}")
+    print_quality(results)
+
+def print_quality(results) -> None:
+    """Print the per-year key validation summary (establishments rejected,
+    share of the year, rejected rows per reason) for files processed with
+    SILVER_VALIDATE=1. Prints nothing otherwise."""
+    validated = [r for r in sorted(results, key=lambda r: r['file']) if 'rows_rejected' in r]
+    if not validated:
+        return
+    print(f"\n{'Qualidade':<30}{'Estab.':>14}{'Rejeitados':>14}{'%':>8}  Motivos")
+    for r in validated:
+        share = r['establishments_rejected'] / r['establishments'] * 100 if r['establishments'] else 0
+        reasons = ', '.join(f"{k}: {v}" for k, v in sorted(r['rejected_by'].items())) or '-'
+        print(f"{r['file']:<30}{r['establishments']:>14}{r['establishments_rejected']:>14}{share:>8.2f}  {reasons}")
 
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Silver Layer - transformação dos estabelecimentos")
+    parser.add_argument('workers', nargs='?', type=int, default=WORKERS,
+                        help="número de processos (padrão: SILVER_WORKERS)")
+    parser.add_argument('--force', action='store_true',
+                        help="reconstrói todas as dimensões, ignorando o manifesto")
+    args = parser.parse_args()
+
     start_time = time.time()
-    run_silver_layer()
+    run_silver_layer(workers=args.workers, force=args.force)
     end_time = time.time()
     elapsed = end_time - start_time
-    print(f"Tempo total de execução: {elapsed:.2f} segundos")
+    print(f"Tempo total de execução: {elapsed:.2f} segundos")
\ No newline at end of file
@@ -0,0 +1,169 @@
+#%%
+import os
+import duckdb
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.parquet as pq
+from layers.silver.utils.process_data import lista_arquivos
+from layers.silver.config.config_silver import KEY_WIDTHS
+
+# Conexão DuckDB usada para consultar os bloom filters, aberta no primeiro uso
+_DUCKDB = None
+
+def busca_estabelecimentos(path, id_municipio=None, classe=None, columns=None) -> pd.DataFrame:
+    """
+    Reads the establishments of a municipality and/or CNAE class across all years.
+    
+    Instead of scanning every silver file end to end, each file's row group
+    statistics (min/max per column) are checked first and only the row groups
+    whose range can contain the requested keys are read. On files written with
+    SILVER_SORTED=1 a municipality falls into one or two row groups per year,
+    and the bloom filters of id_municipio and classe discard the row groups
+    whose range contains the key but whose rows do not (e.g., a class, which
+    is spread over every row group of a sorted file).
+    
+    Args:
+        path (str): Silver output directory, in either layout
+        id_municipio (int | str): Municipality code (None matches any)
+        classe (int | str): CNAE class code (None matches any)
+        columns (list): Columns to return (default: all)
+    
+    Returns:
+        pd.DataFrame: Matching rows of every year, with the 'ano' column
+    
+    Notes:
+        - Keys can be given as integers or strings; they are converted to the
+          stored representation (zero-padded text or integer codes)
+        - Unsorted files still work, but their statistics rarely prune anything
+          and they carry no bloom filters
+    """
+    keys = {col: value for col, value in (('id_municipio', id_municipio), ('classe', classe)) if value is not None}
+    frames = []
+    for file_name in lista_arquivos(path):
+        table = le_grupos(os.path.join(path, file_name), keys, columns)
+        if table is None:
+            continue
+        partition = os.path.dirname(file_name)
+        if partition.startswith('ano=') and (columns is None or 'ano' in columns):
+            table = table.append_column('ano', pa.array([int(partition.split('=')[1])] * table.num_rows, pa.int64()))
+        frames.append(table.to_pandas())
+
+    if not frames:
+        return pd.DataFrame(columns=columns)
+    return pd.concat(frames, ignore_index=True)
+
+def le_grupos(file_path, keys, columns=None) -> pa.Table:
+    """
+    Reads the rows of one Parquet file that match keys, pruning row groups by statistics and bloom filters.
+    
+    Args:
+        file_path (str): Full path to a silver Parquet file
+        keys (dict): Column -> value equality predicates
+        columns (list): Columns to read (default: all)
+    
+    Returns:
+        pa.Table: Matching rows, or None if no row group can contain them
+    
+    Notes:
+        - The bloom filters are only probed for the row groups left by the
+          min/max statistics, and only on columns that have them (bloom_exclui)
+    """
+    parquet_file = pq.ParquetFile(file_path)
+    schema = parquet_file.schema_arrow
+    keys = {col: valor_chave(value, schema.field(col).type, KEY_WIDTHS.get(col, 0)) for col, value in keys.items()}
+    positions = {col: schema.get_field_index(col) for col in keys}
+
+    row_groups = [i for i in range(parquet_file.num_row_groups)
+                  if all(pode_conter(parquet_file.metadata.row_group(i).column(positions[col]), value)
+                         for col, value in keys.items())]
+    for col, value in keys.items():
+        if row_groups and tem_bloom(parquet_file.metadata, positions[col]):
+            excluded = bloom_exclui(file_path, col, value)
+            row_groups = [i for i in row_groups if i not in excluded]
+    if not row_groups:
+        return None
+
+    read_columns = None
+    if columns is not None:
+        read_columns = [col for col in dict.fromkeys(list(columns) + list(keys)) if col in schema.names]
+    table = parquet_file.read_row_groups(row_groups, columns=read_columns)
+    for col, value in keys.items():
+        table = table.filter(pc.equal(table[col], value))
+    if columns is not None:
+        table = table.select([col for col in columns if col in table.column_names])
+    return table
+
+def pode_conter(column_meta, value) -> bool:
+    """
+    Checks whether a row group's column statistics admit value.
+    
+    Args:
+        column_meta (pq.ColumnChunkMetaData): Column chunk metadata of a row group
+        value: Value in the stored representation
+    
+    Returns:
+        bool: False only when min/max statistics exclude the value
+    """
+    stats = column_meta.statistics
+    if stats is None or not stats.has_min_max:
+        return True
+    return stats.min <= value <= stats.max
+
+def tem_bloom(metadata, position) -> bool:
+    """
+    Checks whether a column has bloom filters in every row group of a file.
+    
+    Args:
+        metadata (pq.FileMetaData): File metadata
+        position (int): Column index
+    
+    Returns:
+        bool: True if every row group of the column has a bloom filter
+    """
+    return metadata.num_row_groups > 0 and all(
+        metadata.row_group(i).column(position).bloom_filter_offset is not None
+        for i in range(metadata.num_row_groups))
+
+def bloom_exclui(file_path, col, value) -> set:
+    """
+    Returns the row groups whose bloom filter on col rules value out.
+    
+    Args:
+        file_path (str): Full path to a Parquet file with bloom filters on col
+        col (str): Column name
+        value: Value in the stored representation
+    
+    Returns:
+        set: Row group indices that cannot contain value
+    
+    Notes:
+        - The filters are read by DuckDB (parquet_bloom_probe); pyarrow
+          writes them but has no reader API. A bloom filter has false
+          positives (SILVER_BLOOM_FILTER_FPP) but no false negatives, so an
+          excluded row group never holds the value
+    """
+    global _DUCKDB
+    if _DUCKDB is None:
+        _DUCKDB = duckdb.connect()
+    rows = _DUCKDB.execute("SELECT row_group_id FROM parquet_bloom_probe(?, ?, ?) WHERE bloom_filter_excludes",
+                           [file_path, col, value]).fetchall()
+    return {row[0] for row in rows}
+
+def valor_chave(value, arrow_type, width):
+    """
+    Converts a lookup key to the representation stored in the file.
+    
+    Args:
+        value (int | str): Key given by the caller
+        arrow_type (pa.DataType): Type of the column in the file
+        width (int): Zero-padding width for text keys
+    
+    Returns:
+        int | str: Integer code for integer columns, zero-padded text otherwise
+    """
+    if pa.types.is_dictionary(arrow_type):
+        arrow_type = arrow_type.value_type
+    if pa.types.is_integer(arrow_type):
+        return int(value)
+    return str(value).zfill(width)
\ No newline at end of file
@@ -1,42 +1,435 @@
 #%%
 import os
 import sys
+import time
 import pandas as pd
-import fastparquet
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.parquet as pq
+from layers.silver.config.config_silver import (COUNT_COLUMN, LAYOUT, COMPRESSION, ROW_GROUP_SIZE, ENGINE,
+                                                INTEGER_KEYS, SORTED, SORTED_ROW_GROUP_SIZE, BLOOM_FILTER_FPP, VALIDATE)
+from layers.silver.utils.validation import (chaves_validas, valida_chaves, grava_rejeitados, resumo_qualidade,
+                                            VALIDATED_METADATA)
 
-def processa_dados(file_name, raw_path, out_path) -> pd.DataFrame:
+# Colunas-chave gravadas com dictionary encoding no layout particionado
+KEY_COLUMNS = ['id_municipio', 'classe']
+
+# Ordem dos arquivos ordenados e número de valores distintos esperados por
+# row group, usado para dimensionar os bloom filters (~5.570 municípios, ~670 classes)
+SORT_COLUMNS = ['id_municipio', 'classe']
+BLOOM_FILTER_NDV = {'id_municipio': 8192, 'classe': 1024}
+
+# Renomeação por formato de origem (engine arrow)
+RENAMES = {
+    'txt': {'CNAE 2.0 Classe': 'classe', 'Município': 'id_municipio'},
+    'csv': {'cnae_2': 'classe'},
+}
+
+# Tipos das chaves no modo de chaves inteiras; códigos não numéricos viram
+# INVALID_CODE, que não casa com nenhuma dimensão (descartado na Gold)
+INTEGER_KEY_TYPES = {'id_municipio': 'int32', 'classe': 'int32', 'ano': 'int16'}
+INVALID_CODE = -1
+
+# Correções específicas por arquivo (engine arrow), aplicadas antes do padding:
+# prefixo do nome do arquivo -> [(coluna, função de pyarrow.compute, argumentos)]
+REGRAS_ARQUIVO = {
+    # ESTB2021 traz a classe CNAE formatada como float ('1234.0')
+    'ESTB2021': [('classe', 'replace_substring', {'pattern': '.0', 'replacement': ''})],
+}
+
+def lista_arquivos(path) -> list:
+    """
+    Lists the Parquet files of a layer output, in either layout.
+    
+    Args:
+        path (str): Layer output directory
+        
+    Returns:
+        list: File names relative to path, sorted. Files inside hive partitions
+        are returned with their partition directory (e.g., 'ano=2019/ESTB2019.parquet')
+    """
+    files = []
+    for entry in sorted(os.listdir(path)):
+        if entry.startswith('ano=') and os.path.isdir(os.path.join(path, entry)):
+            files.extend(os.path.join(entry, f) for f in sorted(os.listdir(os.path.join(path, entry))))
+        else:
+            files.append(entry)
+    return files
+
+def processa_dados(file_name, raw_path, out_path, layout=LAYOUT, engine=ENGINE,
+                   integer_keys=INTEGER_KEYS, sorted_keys=SORTED, validate=VALIDATE) -> dict:
     """
     Processes Parquet files and applies appropriate transformation based on file structure.
     
     This function acts as a dispatcher that:
-    - Identifies the file format by counting columns in the Parquet file
-    - Applies the correct transformation (TXT or CSV format)
+    - Identifies the file format from the column names in the Parquet schema
+    - Applies the correct transformation (TXT or CSV format) with the
+      selected engine: pandas (transforma_txt/transforma_csv) or Arrow
+      compute kernels (transforma_arrow)
+    - Re-aggregates pre-aggregated bronze counts after key normalization
     - Saves the processed data to the output path
     
     Args:
         file_name (str): Name of the Parquet file to process
         raw_path (str): Directory path containing the input Parquet file
         out_path (str): Directory path where the processed file will be saved
+        layout (str): 'files' writes out_path/<file_name>; 'partitioned' writes
+            a hive partition out_path/ano=YYYY/ with zstd compression,
+            dictionary-encoded keys, sized row groups and column statistics
+        engine (str): 'pandas' or 'arrow'
+        integer_keys (bool): If True, id_municipio and classe are stored as
+            int32 and ano as int16 (see chaves_inteiras)
+        sorted_keys (bool): If True, rows are sorted by (id_municipio, classe)
+            and written with page indexes and bloom filters (see grava_ordenado)
+        validate (bool): If True, keys are checked against the dimensions
+            (see valida_chaves); rejected rows go to a reject Parquet under
+            REJECT_PATH and the output is flagged as validated for the gold layer
         
     Returns:
-        pd.DataFrame: Processed DataFrame (also saved to output path)
+        dict: Summary with keys 'file', 'rows_in', 'rows_out', 'seconds' and
+        'output_bytes', used by run_silver_layer to report each year. With
+        validate=True the quality keys of resumo_qualidade are included
         
     File format detection:
-        - 2 columns: TXT format (applies transforma_txt)
-        - 3 columns: CSV format (applies transforma_csv)
+        - 'CNAE 2.0 Classe' column: TXT format (applies transforma_txt)
+        - 'cnae_2' column: CSV format (applies transforma_csv)
+        
+    Notes:
+        - Column names are used instead of the column count because
+          pre-aggregated bronze files carry an extra COUNT_COLUMN
+        - The file is opened once: the format is sniffed from the Parquet
+          footer and the data is read from the same ParquetFile
+        - Normalization can merge raw keys (e.g., ESTB2021 '1234.0' and '1234'),
+          so counts are summed again per (ano, id_municipio, classe)
     """
+    start = time.perf_counter()
     file_path = os.path.join(raw_path, file_name)
-    parquet_file = fastparquet.ParquetFile(file_path)
-    num_cols = len(parquet_file.columns)
+    parquet_file = pq.ParquetFile(file_path)
+    fmt = detecta_formato(parquet_file.schema_arrow.names)
+
+    if engine == 'arrow':
+        data = transforma_arrow(parquet_file.read(), fmt, os.path.basename(file_name))
+        if integer_keys:
+            data = chaves_inteiras_arrow(data)
+    else:
+        data = parquet_file.read().to_pandas()
+        if fmt == 'txt':
+            data = transforma_txt(file_path, data)
+        elif fmt == 'csv':
+            data = transforma_csv(file_path, data)
+
+        if COUNT_COLUMN in data.columns:
+            data = data.groupby(['ano', 'id_municipio', 'classe'], dropna=False)[COUNT_COLUMN].sum().reset_index()
+        if integer_keys:
+            data = chaves_inteiras(data)
+
+    quality, metadata = {}, None
+    if validate:
+        accepted, rejected = valida_chaves(data, chaves_validas())
+        grava_rejeitados(rejected, os.path.basename(file_name))
+        quality, metadata = resumo_qualidade(data, rejected), VALIDATED_METADATA
+        data = accepted
+    
+    out_file = grava_silver(data, os.path.basename(file_name), out_path, layout, sorted_keys, metadata)
+    return {**resumo(file_name, parquet_file.metadata.num_rows, len(data), start, out_file), **quality}
+
+def resumo(file_name, rows_in, rows_out, start, out_file) -> dict:
+    """
+    Builds the per-file summary returned by processa_dados.
+    
+    Args:
+        file_name (str): Processed file, relative to the bronze directory
+        rows_in (int): Rows read from bronze
+        rows_out (int): Rows written to silver
+        start (float): time.perf_counter() value taken when processing started
+        out_file (str): Path written by grava_silver
+        
+    Returns:
+        dict: 'file', 'rows_in', 'rows_out', 'seconds' and 'output_bytes'
+    """
+    return {
+        'file': file_name,
+        'rows_in': rows_in,
+        'rows_out': rows_out,
+        'seconds': time.perf_counter() - start,
+        'output_bytes': os.path.getsize(out_file),
+    }
+
+def chaves_inteiras(df) -> pd.DataFrame:
+    """
+    Converts the normalized textual keys to compact integers.
+    
+    id_municipio and classe become int32 and ano int16 (INTEGER_KEY_TYPES).
+    Zero padding is dropped ('01234' -> 1234); the textual form is rebuilt
+    only at presentation time (gold database load). Non-numeric codes
+    (e.g., '-0001' or missing values) become INVALID_CODE so the columns
+    stay non-nullable.
+    
+    Args:
+        df (pd.DataFrame): Output of transforma_txt/transforma_csv
+        
+    Returns:
+        pd.DataFrame: Same data with integer keys
+    """
+    for col, dtype in INTEGER_KEY_TYPES.items():
+        values = df[col].astype(str)
+        df[col] = values.where(values.str.isdigit(), str(INVALID_CODE)).astype('int64').astype(dtype)
+    return df
+
+def chaves_inteiras_arrow(table) -> pa.Table:
+    """
+    Arrow counterpart of chaves_inteiras.
+    
+    Args:
+        table (pa.Table): Output of transforma_arrow
+        
+    Returns:
+        pa.Table: Same data with int32/int16 keys
+    """
+    for col, dtype in INTEGER_KEY_TYPES.items():
+        values = pc.cast(table[col], pa.string())
+        values = pc.fill_null(pc.if_else(pc.utf8_is_digit(values), values, str(INVALID_CODE)), str(INVALID_CODE))
+        table = table.set_column(table.column_names.index(col), col, pc.cast(values, getattr(pa, dtype)()))
+    return table
+
+def detecta_formato(columns) -> str:
+    """
+    Identifies the bronze source format from its column names.
+    
+    Args:
+        columns (list): Column names from the Parquet schema
+        
+    Returns:
+        str: 'txt' (MTE layout) or 'csv' (Base dos Dados layout)
+        
+    Raises:
+        ValueError: If the columns match neither format
+    """
+    if 'CNAE 2.0 Classe' in columns:
+        return 'txt'
+    if 'cnae_2' in columns:
+        return 'csv'
+    raise ValueError(f"Formato não reconhecido: {columns}")
+
+def grava_silver(data, file_name, out_path, layout=LAYOUT, sorted_keys=SORTED, metadata=None) -> str:
+    """
+    Writes a processed year according to the output layout.
+    
+    Args:
+        data (pd.DataFrame | pa.Table): Normalized establishment data with an 'ano' column
+        file_name (str): Output file name (e.g., 'ESTB2019.parquet')
+        out_path (str): Silver output directory
+        layout (str): 'files' or 'partitioned'
+        sorted_keys (bool): Write a lookup-friendly file with grava_ordenado
+        metadata (dict): Extra key-value metadata stored in the Parquet footer
+        
+    Returns:
+        str: Path of the written file
+        
+    Notes:
+        - In the partitioned layout the 'ano' column is not stored in the file;
+          it comes back from the ano=YYYY/ directory when the dataset is read.
+          The directory takes the year of the file name (ano_arquivo), so a
+          year with no rows left (e.g., every key rejected) is still written
+        - Arrow tables are written with pyarrow; DataFrames keep fastparquet
+          in the 'files' layout
+    """
+    if sorted_keys:
+        return grava_ordenado(data, file_name, out_path, layout, metadata)
+
+    if layout != 'partitioned':
+        out_file = os.path.join(out_path, file_name)
+        if isinstance(data, pa.Table):
+            pq.write_table(com_metadados(data, metadata), out_file)
+        else:
+            data.to_parquet(out_file, index=False, engine='fastparquet', custom_metadata=metadata)
+        return out_file
+
+    if isinstance(data, pd.DataFrame):
+        data = pa.Table.from_pandas(data, preserve_index=False)
+    data = com_metadados(data, metadata)
+    partition = os.path.join(out_path, f"ano={ano_arquivo(file_name)}")
+    os.makedirs(partition, exist_ok=True)
+    table = data.drop_columns(['ano'])
+    out_file = os.path.join(partition, file_name)
+    pq.write_table(
+        table,
+        out_file,
+        compression=COMPRESSION,
+        use_dictionary=[col for col in KEY_COLUMNS if col in table.column_names],
+        row_group_size=ROW_GROUP_SIZE,
+        write_statistics=True,
+    )
+    return out_file
 
-    if num_cols == 2: # para txt
-        df = transforma_txt(file_path)
-    elif num_cols == 3: # para csv
-        df = transforma_csv(file_path)
+def grava_ordenado(data, file_name, out_path, layout=LAYOUT, metadata=None) -> str:
+    """
+    Writes a processed year sorted by (id_municipio, classe) for point lookups.
+    
+    Args:
+        data (pd.DataFrame | pa.Table): Normalized establishment data with an 'ano' column
+        file_name (str): Output file name (e.g., 'ESTB2019.parquet')
+        out_path (str): Silver output directory
+        layout (str): 'files' or 'partitioned'
+        metadata (dict): Extra key-value metadata stored in the Parquet footer
+        
+    Returns:
+        str: Path of the written file
+        
+    Notes:
+        - Row groups of SORTED_ROW_GROUP_SIZE rows keep the min/max statistics of
+          id_municipio selective, so a municipality maps to one or two row groups
+        - The Parquet page index (column and offset indexes) lets readers
+          that support it (e.g., DuckDB, Spark, Arrow C++ scans) skip pages
+          inside a row group
+        - Bloom filters on id_municipio and classe answer equality predicates
+          for values inside a row group's min/max range (read by
+          busca_estabelecimentos and DuckDB)
+        - The sort order is recorded as sorting_columns in the row group
+          metadata (arquivo_ordenado), which the gold layer relies on to
+          count the classes of a year as runs of adjacent rows
+        - Always written with pyarrow, in both layouts; the partitioned layout
+          drops 'ano' as in grava_silver
+    """
+    if isinstance(data, pd.DataFrame):
+        data = pa.Table.from_pandas(data, preserve_index=False)
+    data = com_metadados(data, metadata).sort_by([(col, 'ascending') for col in SORT_COLUMNS])
+
+    if layout == 'partitioned':
+        partition = os.path.join(out_path, f"ano={ano_arquivo(file_name)}")
+        os.makedirs(partition, exist_ok=True)
+        data = data.drop_columns(['ano'])
+        out_file = os.path.join(partition, file_name)
+    else:
+        out_file = os.path.join(out_path, file_name)
+
+    pq.write_table(
+        data,
+        out_file,
+        compression=COMPRESSION,
+        row_group_size=SORTED_ROW_GROUP_SIZE,
+        write_statistics=True,
+        write_page_index=True,
+        sorting_columns=[pq.SortingColumn(data.column_names.index(col)) for col in SORT_COLUMNS],
+        bloom_filter_options={col: {'ndv': ndv, 'fpp': BLOOM_FILTER_FPP} for col, ndv in BLOOM_FILTER_NDV.items()},
+    )
+    return out_file
+
+def ano_arquivo(file_name) -> int:
+    """Year of a layer file name, from the last four digits of its stem (e.g., 'ESTB2019.parquet' -> 2019)."""
+    return int(os.path.basename(file_name).split('.')[0][-4:])
+
+def arquivo_ordenado(file_path) -> bool:
+    """
+    Checks whether a silver file (or ano=YYYY partition directory) was written by grava_ordenado.
+    
+    Args:
+        file_path (str): Path to a silver Parquet file or partition directory
+    
+    Returns:
+        bool: True if every row group of every file records SORT_COLUMNS,
+        ascending, as its sorting_columns
+    """
+    files = [file_path]
+    if os.path.isdir(file_path):
+        files = [os.path.join(file_path, f) for f in sorted(os.listdir(file_path))]
+    for f in files:
+        metadata = pq.read_metadata(f)
+        names = metadata.schema.to_arrow_schema().names
+        if not all(col in names for col in SORT_COLUMNS):
+            return False
+        expected = [pq.SortingColumn(names.index(col)) for col in SORT_COLUMNS]
+        if not all(list(metadata.row_group(i).sorting_columns)[:len(expected)] == expected
+                   for i in range(metadata.num_row_groups)):
+            return False
+    return bool(files)
+
+def com_metadados(table, metadata) -> pa.Table:
+    """
+    Adds key-value metadata to an Arrow table's schema, keeping the existing entries.
     
-    df.to_parquet(os.path.join(out_path, file_name), index=False, engine='fastparquet')
+    Args:
+        table (pa.Table): Table to be written
+        metadata (dict): Entries to add (None leaves the table unchanged)
+        
+    Returns:
+        pa.Table: Table whose schema metadata includes metadata
+    """
+    if not metadata:
+        return table
+    return table.replace_schema_metadata({**(table.schema.metadata or {}), **metadata})
+
+def zfill(values, width):
+    """
+    pyarrow.compute equivalent of str.zfill.
+    
+    Pads with zeros on the left up to width, keeping a leading '+'/'-' sign
+    in front of the padding exactly like Python's str.zfill.
+    
+    Args:
+        values (pa.Array | pa.ChunkedArray): String values
+        width (int): Final width
+        
+    Returns:
+        pa.Array | pa.ChunkedArray: Padded strings
+    """
+    signed = pc.or_(pc.starts_with(values, '-'), pc.starts_with(values, '+'))
+    sign = pc.utf8_slice_codeunits(values, 0, 1)
+    unsigned = pc.utf8_lpad(pc.utf8_slice_codeunits(values, 1), width=width - 1, padding='0')
+    return pc.if_else(signed, pc.binary_join_element_wise(sign, unsigned, ''), pc.utf8_lpad(values, width=width, padding='0'))
+
+def transforma_arrow(table, fmt, file_name) -> pa.Table:
+    """
+    Normalizes a bronze table column-at-a-time with pyarrow.compute kernels.
+    
+    Arrow counterpart of transforma_txt/transforma_csv, producing the same
+    columns and values without per-element pandas string operations:
+    - Renames the source columns (RENAMES)
+    - Stamps 'ano' from the file name when the source has no such column
+    - Casts id_municipio to string (CSV: first 6 characters)
+    - Applies the per-file rules in REGRAS_ARQUIVO (e.g., ESTB2021's float CNAE)
+    - Zero-pads the CNAE class to 5 digits
+    - Re-aggregates pre-aggregated counts per (ano, id_municipio, classe)
+    
+    Args:
+        table (pa.Table): Bronze data
+        fmt (str): Source format, 'txt' or 'csv' (see detecta_formato)
+        file_name (str): Bronze file name, used for the year and per-file rules
+        
+    Returns:
+        pa.Table: Normalized table
+    """
+    table = table.rename_columns([RENAMES[fmt].get(col, col) for col in table.column_names])
+    stem = file_name.split('.')[0]
+
+    if 'ano' not in table.column_names:
+        table = table.append_column('ano', pa.array([ano_arquivo(file_name)] * table.num_rows, pa.int64()))
+
+    id_municipio = pc.cast(table['id_municipio'], pa.string())
+    if fmt == 'csv':
+        id_municipio = pc.utf8_slice_codeunits(id_municipio, 0, 6)
+
+    classe = table['classe']
+    if pa.types.is_dictionary(classe.type):
+        classe = classe.cast(classe.type.value_type)
+    classe = pc.cast(classe, pa.string())
+    columns = {'id_municipio': id_municipio, 'classe': classe}
+
+    for prefix, rules in REGRAS_ARQUIVO.items():
+        if stem.upper().startswith(prefix):
+            for col, func, kwargs in rules:
+                columns[col] = getattr(pc, func)(columns[col], **kwargs)
+
+    columns['classe'] = zfill(columns['classe'], 5)
+    for col, values in columns.items():
+        table = table.set_column(table.column_names.index(col), col, values)
+
+    if COUNT_COLUMN in table.column_names:
+        table = table.group_by(['ano', 'id_municipio', 'classe']).aggregate([(COUNT_COLUMN, 'sum')])
+        table = table.rename_columns([COUNT_COLUMN if col == f'{COUNT_COLUMN}_sum' else col for col in table.column_names])
+    return table
 
-def transforma_txt(path) -> pd.DataFrame:
+def transforma_txt(path, df=None) -> pd.DataFrame:
     """
     Processes TXT-format Parquet files and normalizes fields.
     
@@ -49,6 +442,7 @@ def transforma_txt(path) -> pd.DataFrame:
     
     Args:
         path (str): Full path to the Parquet file
+        df (pd.DataFrame): Data already read from path (read here if omitted)
         
     Returns:
         pd.DataFrame: Normalized DataFrame with columns [ano, classe, id_municipio]
@@ -57,7 +451,8 @@ def transforma_txt(path) -> pd.DataFrame:
         Input: ESTB2019.parquet with columns ['Município', 'CNAE 2.0 Classe']
         Output: DataFrame with ['ano', 'classe', 'id_municipio']
     """
-    df = pd.read_parquet(path)
+    if df is None:
+        df = pd.read_parquet(path)
     df.rename(columns={
         'CNAE 2.0 Classe': 'classe',
         'Município': 'id_municipio'
@@ -70,7 +465,7 @@ def transforma_txt(path) -> pd.DataFrame:
     
     return df
 
-def transforma_csv(path) -> pd.DataFrame:
+def transforma_csv(path, df=None) -> pd.DataFrame:
     """
     Processes CSV-format Parquet files and normalizes fields.
     
@@ -82,6 +477,7 @@ def transforma_csv(path) -> pd.DataFrame:
     
     Args:
         path (str): Full path to the Parquet file
+        df (pd.DataFrame): Data already read from path (read here if omitted)
         
     Returns:
         pd.DataFrame: Normalized DataFrame with columns [classe, id_municipio, ...]
@@ -94,13 +490,16 @@ def transforma_csv(path) -> pd.DataFrame:
         Input: ESTB2020.parquet with 'cnae_2' = '1234.0'
         Output: 'classe' = '01234'
     """
-    df = pd.read_parquet(path)
+    if df is None:
+        df = pd.read_parquet(path)
     df.rename(columns={
         'cnae_2': 'classe',
     }, inplace=True)
 
     df['classe'] = df['classe'].astype(str).str.zfill(5)
     df['id_municipio'] = df['id_municipio'].astype('str').str[:6]
+    if 'ano' not in df.columns: # bronze particionada guarda o ano no diretório
+        df['ano'] = int(os.path.basename(path).split('.')[0][-4:])
 
     # se for arquivo ESTB2021, intercepta a leitura para remover '.0' no campo cnae_2
     if 'ESTB2021' in os.path.basename(path).upper():
@@ -2,8 +2,33 @@
 import os
 import pandas as pd
 from layers.silver.config import config_silver
+from layers.common.manifest import carrega_manifesto, salva_manifesto, content_hash
 
-def cria_dimensoes() -> None:
+# Incrementar quando a construção de uma dimensão mudar de forma a invalidar os Parquet já gerados
+DIMENSION_VERSION = '2'
+
+# Dicionários de origem de cada dimensão, relativos a DIM_RAW_PATH. As dimensões
+# geográficas são reescritas no próprio lugar por altera_tipos_regiao, então sua
+# origem é o próprio Parquet (coberto pelo hash de saída)
+DIMENSION_SOURCES = {
+    'dim_cnae': ['dicionario_cnae_2.csv'],
+    'dim_ano': [],
+    'dim_uf': [],
+    'dim_mesorregiao': [],
+    'dim_microrregiao': [],
+    'dim_municipio': [],
+}
+
+# Tipos das chaves das dimensões no modo de chaves inteiras
+INTEGER_CONVERSIONS = {
+    'dim_municipio': {'id_municipio': 'int32', 'id_microrregiao': 'int32'},
+    'dim_microrregiao': {'id_microrregiao': 'int32', 'id_mesorregiao': 'int16'},
+    'dim_mesorregiao': {'id_mesorregiao': 'int16', 'id_uf': 'int16'},
+    'dim_uf': {'id_uf': 'int16'},
+    'dim_cnae': {'classe': 'int32', 'grupo': 'int16', 'divisao': 'int16', 'secao': 'int16'},
+}
+
+def cria_dimensoes(force=False, integer_keys=config_silver.INTEGER_KEYS) -> list:
     """
     Executes all dimension creation functions.
     
@@ -13,12 +38,95 @@ def cria_dimensoes() -> None:
     2. Creates Year dimension
     3. Converts ID column types in geographic dimensions
     
+    Each dimension is only rebuilt when its fingerprint differs from the one
+    stored in the dimension manifest (see dimensao_atualizada): source
+    dictionaries, DIMENSION_VERSION, the key mode and the output file itself.
+    
+    Args:
+        force (bool): Rebuild every dimension regardless of the manifest
+        integer_keys (bool): Key mode passed to altera_tipos_regiao
+    
+    Returns:
+        list: Names of the dimensions rebuilt in this run (empty if all were
+        up to date). Saves the dimension files as Parquet in the output directory
+    """
+    manifest = carrega_manifesto(config_silver.DIM_OUT_PATH)
+    version = versao_dimensao(integer_keys)
+    changed = [name for name in DIMENSION_SOURCES
+               if force or not dimensao_atualizada(manifest.get(name), name, version)]
+    if not changed:
+        print("Dimensões inalteradas, ignorando")
+        return changed
+
+    if 'dim_cnae' in changed:
+        cria_dim_cnae()
+    if 'dim_ano' in changed:
+        cria_dim_ano()
+    altera_tipos_regiao(integer_keys, names=[name for name in changed if name != 'dim_ano'])
+
+    for name in changed:
+        manifest[name] = fingerprint_dimensao(name, version)
+        print(f"✓ Dimensão atualizada: {name}")
+    salva_manifesto(config_silver.DIM_OUT_PATH, manifest)
+    return changed
+
+def versao_dimensao(integer_keys=config_silver.INTEGER_KEYS) -> str:
+    """
+    Returns the build version recorded for each dimension.
+    
+    The key mode is part of the version because string and integer keys
+    produce dimension files with different column types.
+    
+    Args:
+        integer_keys (bool): Whether dimension keys are stored as integers
+        
     Returns:
-        None: Saves all dimension files as Parquet in the output directory
+        str: Build version identifier
     """
-    cria_dim_cnae()
-    cria_dim_ano()
-    altera_tipos_regiao()
+    return f'{DIMENSION_VERSION}-' + ('int' if integer_keys else 'str')
+
+def fingerprint_dimensao(name, version) -> dict:
+    """
+    Builds the manifest entry for a dimension after it was written.
+    
+    Args:
+        name (str): Dimension name (e.g., 'dim_cnae')
+        version (str): Build version (see versao_dimensao)
+        
+    Returns:
+        dict: Entry with the build version, the content hash of each source
+        dictionary and the content hash of the output Parquet
+    """
+    return {
+        'version': version,
+        'sources': {source: content_hash(os.path.join(config_silver.DIM_RAW_PATH, source))
+                    for source in DIMENSION_SOURCES[name]},
+        'hash': content_hash(os.path.join(config_silver.DIM_OUT_PATH, name + '.parquet')),
+    }
+
+def dimensao_atualizada(entry, name, version) -> bool:
+    """
+    Checks whether a dimension's previous build is still valid.
+    
+    The build version must match, every source dictionary must hash to the
+    recorded value, and the output must still exist with the recorded hash
+    (so a dimension file replaced by hand is processed again).
+    
+    Args:
+        entry (dict): Manifest entry for the dimension (or None)
+        name (str): Dimension name
+        version (str): Current build version
+        
+    Returns:
+        bool: True if the dimension can be skipped
+    """
+    if not entry or entry.get('version') != version:
+        return False
+    out_file = os.path.join(config_silver.DIM_OUT_PATH, name + '.parquet')
+    if not os.path.exists(out_file) or content_hash(out_file) != entry.get('hash'):
+        return False
+    return entry.get('sources') == {source: content_hash(os.path.join(config_silver.DIM_RAW_PATH, source))
+                                    for source in DIMENSION_SOURCES[name]}
 
 def cria_dim_cnae() -> None:
     """
@@ -29,10 +137,13 @@ def cria_dim_cnae() -> None:
     - Removes duplicate classes
     - Creates numeric section codes from section descriptions
     - Zero-pads class codes to 5 digits
-    - Converts division codes to string
+    - Converts group and division codes to string
     
     Output columns:
         - classe: 5-digit CNAE class code (e.g., '01234')
+        - descricao_classe: Class description
+        - grupo: Group code (string)
+        - descricao_grupo: Group description
         - divisao: Division code (string)
         - descricao_divisao: Division description
         - descricao_secao: Section description
@@ -42,11 +153,13 @@ def cria_dim_cnae() -> None:
         None: Saves dim_cnae.parquet to the dimensions output directory
     """
     dim = pd.read_csv(os.path.join(config_silver.DIM_RAW_PATH, 'dicionario_cnae_2.csv'),
-                     usecols=['classe', 'divisao', 'descricao_divisao', 'descricao_secao'])
+                     usecols=['classe', 'descricao_classe', 'grupo', 'descricao_grupo',
+                              'divisao', 'descricao_divisao', 'descricao_secao'])
     
     dim = dim.drop_duplicates(subset='classe')
     dim['secao'] = dim['descricao_secao'].astype('category').cat.codes + 1
     dim['classe'] = dim['classe'].astype(str).str.zfill(5)
+    dim['grupo'] = dim['grupo'].astype('str')
     dim['divisao'] = dim['divisao'].astype('str')
 
     dim.to_parquet(os.path.join(config_silver.DIM_OUT_PATH, 'dim_cnae.parquet'), index=False)
@@ -70,10 +183,20 @@ def cria_dim_ano() -> None:
     dim_ano['id_ano'] = dim_ano.index + 1
     dim_ano.to_parquet(os.path.join(config_silver.DIM_OUT_PATH, 'dim_ano.parquet'), index=False)
 
-def altera_tipos_regiao() -> None:
+def altera_tipos_regiao(integer_keys=config_silver.INTEGER_KEYS, names=None) -> None:
     """
     Converts ID column types in geographic dimensions to string type.
     
+    With integer_keys=True the keys are stored as compact integers instead
+    (INTEGER_CONVERSIONS: int32 for municipality, microregion and CNAE class,
+    int16 for mesoregion, state, group, division and section), matching the silver
+    establishment files written in the same mode.
+    
+    Args:
+        integer_keys (bool): Store keys as compact integers
+        names (list): Dimensions to convert (default: all of them); used by
+            cria_dimensoes to rewrite only the dimensions that changed
+    
     This function:
     - Reads all dimension Parquet files (municipality, microregion, mesoregion, state, CNAE)
     - Converts all ID columns to pandas 'string' dtype for consistency
@@ -90,6 +213,8 @@ def altera_tipos_regiao() -> None:
         - Uses pandas 'string' dtype (not 'object') for proper string storage
         - Only converts columns that exist in each DataFrame
         - Overwrites original files with updated types
+        - Integer mode drops zero padding (e.g., classe '01234' -> 1234); the
+          gold layer restores it when loading the database
         
     Returns:
         None: Updates and saves all dimension files in place
@@ -101,6 +226,8 @@ def altera_tipos_regiao() -> None:
         'dim_uf': os.path.join(config_silver.DIM_OUT_PATH, 'dim_uf.parquet'),
         'dim_cnae': os.path.join(config_silver.DIM_OUT_PATH, 'dim_cnae.parquet'),
     }
+    if names is not None:
+        paths = {name: path for name, path in paths.items() if name in names}
 
     # Read files (if they exist)
     dfs = {name: pd.read_parquet(path) for name, path in paths.items()}
@@ -114,8 +241,15 @@ def altera_tipos_regiao() -> None:
         'dim_cnae': {'secao': 'string'},
     }
 
+    if integer_keys:
+        conversions = INTEGER_CONVERSIONS
+
     for name, df in dfs.items():
         conv = {col: dtype for col, dtype in conversions.get(name, {}).items() if col in df.columns}
         if conv:
-            df = df.astype(conv)
+            if integer_keys:
+                # passa por object para obter inteiros numpy (não-nullable)
+                df = df.astype({col: str for col in conv}).astype(conv)
+            else:
+                df = df.astype(conv)
         df.to_parquet(paths[name], index=False)
@@ -0,0 +1,207 @@
+#%%
+import os
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.parquet as pq
+from layers.silver.config.config_silver import DIM_OUT_PATH, REJECT_PATH, COUNT_COLUMN, COMPRESSION, KEY_WIDTHS
+
+# Metadado gravado nos Parquet da Silver cujas chaves já foram validadas contra as dimensões
+VALIDATED_KEY = 'rais_chaves_validadas'
+VALIDATED_METADATA = {VALIDATED_KEY: '1'}
+
+# Maior código inteiro validado por tabela booleana (acima disso, busca binária)
+MAX_DENSE_CODE = 10_000_000
+
+def chaves_validas(dim_path=DIM_OUT_PATH) -> dict:
+    """
+    Builds the sorted arrays of valid establishment keys from the dimension tables.
+    
+    A municipality is valid only if its whole geographic chain resolves
+    (municipality -> microregion -> mesoregion -> state), which is exactly the
+    set of municipalities that survive the inner joins of the gold layer.
+    
+    Args:
+        dim_path (str): Directory containing the dimension Parquet files
+    
+    Returns:
+        dict: 'id_municipio' and 'classe' mapped to sorted numpy arrays of valid codes
+    
+    Notes:
+        - The chain is resolved on the dimension tables (a few thousand rows),
+          not on the establishment data
+    """
+    dim_muni = pd.read_parquet(os.path.join(dim_path, 'dim_municipio.parquet'), columns=['id_municipio', 'id_microrregiao'])
+    dim_micro = pd.read_parquet(os.path.join(dim_path, 'dim_microrregiao.parquet'), columns=['id_microrregiao', 'id_mesorregiao'])
+    dim_meso = pd.read_parquet(os.path.join(dim_path, 'dim_mesorregiao.parquet'), columns=['id_mesorregiao', 'id_uf'])
+    dim_uf = pd.read_parquet(os.path.join(dim_path, 'dim_uf.parquet'), columns=['id_uf'])
+    dim_cnae = pd.read_parquet(os.path.join(dim_path, 'dim_cnae.parquet'), columns=['classe'])
+
+    muni = dim_muni[dim_muni['id_microrregiao'].isin(
+        dim_micro.loc[dim_micro['id_mesorregiao'].isin(
+            dim_meso.loc[dim_meso['id_uf'].isin(dim_uf['id_uf']), 'id_mesorregiao']), 'id_microrregiao'])]
+
+    return {
+        'id_municipio': np.sort(np.asarray(muni['id_municipio'].unique())),
+        'classe': np.sort(np.asarray(dim_cnae['classe'].unique())),
+    }
+
+def pertence(values, valid, key) -> np.ndarray:
+    """
+    Vectorized membership test of values in a sorted array of valid codes.
+    
+    Args:
+        values (np.ndarray | pa.ChunkedArray): Key column of the establishment data
+        valid (np.ndarray): Sorted valid codes (see chaves_validas)
+        key (str): Column name, used for the zero-padding width
+        
+    Returns:
+        np.ndarray: Boolean mask, True where the value is a valid code
+        
+    Notes:
+        - Integer codes are checked against a boolean table indexed by the
+          code itself when the codes are small (up to MAX_DENSE_CODE, true for
+          IBGE and CNAE codes), or with np.searchsorted on the sorted array
+        - Text codes fall back to a hash-based isin (pyarrow.compute.is_in for
+          Arrow columns, avoiding the conversion to Python strings)
+        - If the data and the dimensions use different key modes, the valid
+          codes are converted to the data's representation first
+    """
+    if isinstance(values, pa.ChunkedArray):
+        if not pa.types.is_integer(values.type):
+            return pc.is_in(values, value_set=pa.array(texto(valid, key), pa.string())).to_numpy(zero_copy_only=False)
+        values = values.to_numpy()
+
+    if np.issubdtype(values.dtype, np.integer):
+        if not np.issubdtype(valid.dtype, np.integer):
+            valid = np.sort(pd.to_numeric(pd.Series(valid), errors='coerce').dropna().to_numpy(dtype='int64'))
+        if len(valid) == 0:
+            return np.zeros(len(values), dtype=bool)
+        if valid[0] >= 0 and valid[-1] <= MAX_DENSE_CODE:
+            # códigos IBGE/CNAE são pequenos: tabela booleana indexada pelo próprio código
+            table = np.zeros(int(valid[-1]) + 1, dtype=bool)
+            table[valid] = True
+            inside = (values >= 0) & (values <= valid[-1])
+            mask = np.zeros(len(values), dtype=bool)
+            mask[inside] = table[values[inside]]
+            return mask
+        pos = np.searchsorted(valid, values).clip(max=len(valid) - 1)
+        return valid[pos] == values
+
+    return pd.Series(values).isin(texto(valid, key)).to_numpy()
+
+def texto(valid, key) -> np.ndarray:
+    """
+    Returns valid codes as zero-padded text, converting integer codes if needed.
+    
+    Args:
+        valid (np.ndarray): Valid codes (see chaves_validas)
+        key (str): Column name, used for the zero-padding width
+        
+    Returns:
+        np.ndarray: Codes as Python strings
+    """
+    if np.issubdtype(valid.dtype, np.integer):
+        return np.array([str(v).zfill(KEY_WIDTHS.get(key, 0)) for v in valid], dtype=object)
+    return valid.astype(str).astype(object)
+
+def valida_chaves(data, valid):
+    """
+    Splits establishment data into rows with valid keys and rejected rows.
+    
+    Args:
+        data (pd.DataFrame | pa.Table): Normalized establishment data
+        valid (dict): Valid codes per key (see chaves_validas)
+    
+    Returns:
+        tuple: (accepted rows, rejected rows) in the same type as data. The
+        rejected rows carry a 'motivo' column naming the invalid key(s):
+        'id_municipio', 'classe' or 'id_municipio,classe'
+    
+    Notes:
+        - Single pass over each key column; both masks are combined with numpy
+    """
+    is_table = isinstance(data, pa.Table)
+    masks = {key: pertence(data[key] if is_table else data[key].to_numpy(), codes, key) for key, codes in valid.items()}
+    ok = masks['id_municipio'] & masks['classe']
+    if ok.all() and is_table:
+        return data, data.slice(0, 0).append_column('motivo', pa.array([], pa.string()).dictionary_encode())
+    if ok.all():
+        return data, data.iloc[:0].assign(motivo=pd.Categorical([]))
+
+    bad_muni, bad_classe = ~masks['id_municipio'][~ok], ~masks['classe'][~ok]
+    motivo = np.where(bad_muni & bad_classe, 'id_municipio,classe', np.where(bad_muni, 'id_municipio', 'classe'))
+    if is_table:
+        accepted = data.filter(pa.array(ok))
+        rejected = data.filter(pa.array(~ok)).append_column(
+            'motivo', pa.array(motivo).dictionary_encode())
+        return accepted, rejected
+
+    accepted = data[ok].reset_index(drop=True)
+    rejected = data[~ok].reset_index(drop=True).assign(motivo=pd.Categorical(motivo))
+    return accepted, rejected
+
+def grava_rejeitados(rejected, file_name, reject_path=REJECT_PATH) -> None:
+    """
+    Writes the rejected rows of one year to a compact Parquet file.
+    
+    Args:
+        rejected (pd.DataFrame | pa.Table): Output of valida_chaves
+        file_name (str): Output file name (e.g., 'ESTB2019.parquet')
+        reject_path (str): Directory for the reject files
+    
+    Notes:
+        - A year without rejections removes any stale reject file for it
+    """
+    out_file = os.path.join(reject_path, file_name)
+    if len(rejected) == 0:
+        if os.path.exists(out_file):
+            os.remove(out_file)
+        return
+    os.makedirs(reject_path, exist_ok=True)
+    if isinstance(rejected, pd.DataFrame):
+        rejected = pa.Table.from_pandas(rejected, preserve_index=False)
+    pq.write_table(rejected, out_file, compression=COMPRESSION)
+
+def resumo_qualidade(data, rejected) -> dict:
+    """
+    Summarizes the key validation of one year.
+    
+    Args:
+        data (pd.DataFrame | pa.Table): Rows before validation
+        rejected (pd.DataFrame | pa.Table): Rejected rows (see valida_chaves)
+    
+    Returns:
+        dict: 'rows_rejected', 'establishments' and 'establishments_rejected'
+        (equal to the row counts unless the data is pre-aggregated) and
+        'rejected_by', the rejected row count per reason
+    """
+    def estabelecimentos(frame):
+        names = frame.column_names if isinstance(frame, pa.Table) else frame.columns
+        if COUNT_COLUMN not in names:
+            return len(frame)
+        return int(np.asarray(frame[COUNT_COLUMN]).sum())
+
+    motivos = rejected['motivo'].to_pandas() if isinstance(rejected, pa.Table) else rejected['motivo']
+    return {
+        'rows_rejected': len(rejected),
+        'establishments': estabelecimentos(data),
+        'establishments_rejected': estabelecimentos(rejected),
+        'rejected_by': {str(k): int(v) for k, v in motivos.value_counts().items() if v},
+    }
+
+def arquivo_validado(file_path) -> bool:
+    """
+    Checks whether a silver file (or ano=YYYY partition directory) was key-validated.
+    
+    Args:
+        file_path (str): Path to a silver Parquet file or partition directory
+    
+    Returns:
+        bool: True if every file carries the VALIDATED_METADATA flag
+    """
+    files = [file_path]
+    if os.path.isdir(file_path):
+        files = [os.path.join(file_path, f) for f in sorted(os.listdir(file_path))]
+    return bool(files) and all((pq.read_schema(f).metadata or {}).get(VALIDATED_KEY.encode()) == b'1' for f in files)
\ No newline at end of file
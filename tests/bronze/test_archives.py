@@ -0,0 +1,48 @@
+import os
+import stat
+import shutil
+import pandas as pd
+import pytest
+from layers.bronze.utils import file_normalizer
+from layers.bronze.utils.file_normalizer import normaliza_tipos
+
+# 7-Zip de teste: o "arquivo .7z" guarda o TXT em claro; 'e -so' o escreve no
+# stdout e, com FALHA=1, para no meio e sai com erro como num arquivo corrompido
+SETE_ZIP = """#!/bin/sh
+case "$1" in
+  l) echo "Path = ESTB2019.txt" ;;
+  e) if [ "$FALHA" = "1" ]; then
+       head -c 2000 "$3"
+       echo "ERROR: Data Error : ESTB2019.txt" >&2
+       exit 2
+     fi
+     cat "$3" ;;
+esac
+"""
+
+@pytest.fixture
+def arquivo_7z(raw_path, tmp_path, monkeypatch) -> str:
+    """Directory holding ESTB2019.7z, read through a fake 7-Zip on PATH."""
+    binary = tmp_path / '7z'
+    binary.write_text(SETE_ZIP)
+    binary.chmod(binary.stat().st_mode | stat.S_IEXEC)
+    monkeypatch.setattr(file_normalizer, 'binario_7z', lambda: str(binary))
+    path = tmp_path / 'raw'
+    path.mkdir()
+    shutil.copy(os.path.join(raw_path, 'ESTB2019.txt'), path / 'ESTB2019.7z')
+    return str(path)
+
+@pytest.mark.parametrize('streaming', [False, True])
+def test_7z_matches_the_uncompressed_file(arquivo_7z, bronze_path, tmp_path, streaming):
+    normaliza_tipos('ESTB2019.7z', arquivo_7z, str(tmp_path / 'bronze'), streaming=streaming, batch_size=700,
+                    engine='pandas', aggregate=False, layout='files')
+    pd.testing.assert_frame_equal(pd.read_parquet(tmp_path / 'bronze' / 'ESTB2019.parquet'),
+                                  pd.read_parquet(os.path.join(bronze_path, 'ESTB2019.parquet')))
+
+@pytest.mark.parametrize('engine, streaming', [('pandas', False), ('pandas', True), ('arrow', False)])
+def test_corrupt_7z_fails_without_output(arquivo_7z, tmp_path, monkeypatch, engine, streaming):
+    monkeypatch.setenv('FALHA', '1')
+    with pytest.raises(ValueError, match='Data Error'):
+        normaliza_tipos('ESTB2019.7z', arquivo_7z, str(tmp_path / 'bronze'), streaming=streaming, batch_size=700,
+                        engine=engine, aggregate=False, layout='files')
+    assert not os.path.exists(tmp_path / 'bronze' / 'ESTB2019.parquet')
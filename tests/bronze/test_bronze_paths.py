@@ -0,0 +1,114 @@
+import os
+import pandas as pd
+import pytest
+from layers.bronze.utils.file_normalizer import normaliza_tipos
+from layers.bronze.config.config_bronze import COUNT_COLUMN
+from layers.silver.utils.process_data import processa_dados, lista_arquivos
+
+ARQUIVOS = ['ESTB2019.txt', 'ESTB2020.txt', 'ESTB2021.csv']
+
+def converte(raw_path, out_path, **kwargs) -> list:
+    return [normaliza_tipos(file_name, raw_path, str(out_path), **{'engine': 'pandas', 'aggregate': False,
+                                                                    'layout': 'files', **kwargs})
+            for file_name in ARQUIVOS]
+
+def le(path, file_name) -> pd.DataFrame:
+    return pd.read_parquet(os.path.join(path, file_name))
+
+def silver(bronze_path, out_path) -> dict:
+    """Baseline silver (pandas, text keys) of every file of a bronze output, by year file name."""
+    os.makedirs(out_path, exist_ok=True)
+    for file_name in lista_arquivos(bronze_path):
+        processa_dados(file_name, bronze_path, str(out_path), layout='files', engine='pandas',
+                       integer_keys=False, sorted_keys=False, validate=False)
+    return {name: ordena(le(out_path, name)) for name in sorted(os.listdir(out_path))}
+
+def ordena(df) -> pd.DataFrame:
+    # o leitor Arrow grava o 'ano' do CSV como int16 (ARROW_SCHEMAS), que a Silver mantém
+    df = df[sorted(df.columns)].astype({'ano': 'int64'})
+    return df.sort_values(list(df.columns)).reset_index(drop=True)
+
+def contagens(df) -> pd.DataFrame:
+    """Establishments per key, from rows (one per establishment) or pre-aggregated counts."""
+    if COUNT_COLUMN not in df.columns:
+        df = df.assign(**{COUNT_COLUMN: 1})
+    keys = sorted(col for col in df.columns if col != COUNT_COLUMN)
+    df = df.astype({col: str for col in keys})
+    return df.groupby(keys)[COUNT_COLUMN].sum().astype('int64').reset_index()
+
+def test_baseline_drops_invalid_classes(raw_path, bronze_path):
+    txt = le(bronze_path, 'ESTB2019.parquet')
+    raw = pd.read_csv(os.path.join(raw_path, 'ESTB2019.txt'), sep=';', encoding='latin1', dtype=str)
+    assert len(txt) == (raw['CNAE 2.0 Classe'] != '000-1').sum()
+    assert list(le(bronze_path, 'ESTB2021.parquet').columns) == ['ano', 'id_municipio', 'cnae_2']
+
+def test_baseline_keeps_the_inferred_types(raw_path, bronze_path):
+    # a leitura completa grava os tipos inferidos pelo pd.read_csv, como antes do modo streaming
+    txt = pd.read_csv(os.path.join(raw_path, 'ESTB2019.txt'), sep=';', encoding='latin1',
+                      usecols=['Município', 'CNAE 2.0 Classe'])
+    assert le(bronze_path, 'ESTB2019.parquet').dtypes.to_dict() == txt.dtypes.to_dict()
+    csv = pd.read_csv(os.path.join(raw_path, 'ESTB2021.csv'))
+    assert le(bronze_path, 'ESTB2021.parquet').dtypes.to_dict() == csv.dtypes.to_dict()
+
+def test_streaming_matches_baseline(raw_path, bronze_path, tmp_path):
+    resumo = converte(raw_path, tmp_path / 'bronze', streaming=True, batch_size=700)
+    assert [r['rows_out'] for r in resumo] == [len(le(bronze_path, f)) for f in sorted(os.listdir(bronze_path))]
+    # tipos fixos do modo streaming (PANDAS_DTYPES): a classe do CSV fica como texto, e não float
+    assert le(tmp_path / 'bronze', 'ESTB2019.parquet').dtypes.to_dict() == {'Município': 'int64',
+                                                                          'CNAE 2.0 Classe': 'object'}
+    assert le(tmp_path / 'bronze', 'ESTB2021.parquet').dtypes.to_dict() == {'ano': 'int64', 'id_municipio': 'int64',
+                                                                          'cnae_2': 'object'}
+    assert le(bronze_path, 'ESTB2021.parquet')['cnae_2'].dtype == 'float64'
+    for file_name in os.listdir(bronze_path):
+        pd.testing.assert_frame_equal(le(tmp_path / 'bronze', file_name).astype(str),
+                                      le(bronze_path, file_name).astype(str))
+    esperado = silver(bronze_path, tmp_path / 'base')
+    for file_name, df in silver(tmp_path / 'bronze', tmp_path / 'silver').items():
+        pd.testing.assert_frame_equal(df, esperado[file_name])
+
+def test_streaming_is_rejected_with_arrow(raw_path, tmp_path):
+    with pytest.raises(ValueError):
+        normaliza_tipos('ESTB2019.txt', raw_path, str(tmp_path), streaming=True, engine='arrow')
+
+def test_arrow_matches_baseline_through_silver(raw_path, bronze_path, tmp_path):
+    converte(raw_path, tmp_path / 'bronze', engine='arrow')
+    for file_name in os.listdir(bronze_path):
+        assert len(le(tmp_path / 'bronze', file_name)) == len(le(bronze_path, file_name))
+    esperado = silver(bronze_path, tmp_path / 'base')
+    for file_name, df in silver(tmp_path / 'bronze', tmp_path / 'silver').items():
+        pd.testing.assert_frame_equal(df, esperado[file_name])
+
+@pytest.mark.parametrize('engine, streaming', [('pandas', False), ('pandas', True), ('arrow', False)])
+def test_aggregate_matches_baseline_counts(raw_path, bronze_path, tmp_path, engine, streaming):
+    resumo = converte(raw_path, tmp_path, engine=engine, streaming=streaming, batch_size=700, aggregate=True)
+    for file_name in sorted(os.listdir(bronze_path)):
+        agregado = le(tmp_path, file_name)
+        assert COUNT_COLUMN in agregado.columns
+        pd.testing.assert_frame_equal(contagens(agregado), contagens(le(bronze_path, file_name)))
+    assert all(r['rows_out'] < r['rows_in'] for r in resumo)
+
+@pytest.mark.parametrize('engine', ['pandas', 'arrow'])
+def test_partitioned_matches_baseline(raw_path, bronze_path, tmp_path, engine):
+    converte(raw_path, tmp_path / 'bronze', engine=engine, layout='partitioned')
+    assert lista_arquivos(tmp_path / 'bronze') == ['ano=2019/ESTB2019.parquet', 'ano=2020/ESTB2020.parquet',
+                                                  'ano=2021/ESTB2021.parquet']
+    # a coluna 'ano' do CSV fica só no diretório da partição
+    assert 'ano' not in le(tmp_path / 'bronze', 'ano=2021/ESTB2021.parquet').columns
+    esperado = silver(bronze_path, tmp_path / 'base')
+    for file_name, df in silver(tmp_path / 'bronze', tmp_path / 'silver').items():
+        pd.testing.assert_frame_equal(df, esperado[file_name])
+
+@pytest.mark.parametrize('aggregate', [False, True])
+def test_arrow_keeps_null_classes_like_pandas(tmp_path, aggregate):
+    raw = tmp_path / 'raw'
+    raw.mkdir()
+    (raw / 'ESTB2019.txt').write_text("Município;CNAE 2.0 Classe\n110001;47113\n110001;000-1\n110001;\n120001;\n",
+                                      encoding='latin1')
+    resumos = {}
+    for engine in ('pandas', 'arrow'):
+        resumos[engine] = normaliza_tipos('ESTB2019.txt', str(raw), str(tmp_path / engine), engine=engine,
+                                          aggregate=aggregate, layout='files')
+        df = le(tmp_path / engine, 'ESTB2019.parquet')
+        assert contagens(df)[COUNT_COLUMN].sum() == 3
+        assert df['CNAE 2.0 Classe'].isna().any()
+    assert resumos['pandas']['rows_out'] == resumos['arrow']['rows_out']
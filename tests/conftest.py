@@ -0,0 +1,73 @@
+import os
+import numpy as np
+import pandas as pd
+import pytest
+from layers.bronze.utils.file_normalizer import normaliza_tipos
+from layers.silver.utils.process_data import processa_dados, lista_arquivos
+from layers.silver.config.config_silver import DIM_OUT_PATH
+
+# Amostra sintética no formato dos arquivos brutos da RAIS: dois anos no layout
+# TXT do MTE e um no CSV da Base dos Dados, com municípios e classes das
+# dimensões do repositório, classes '000-1' (descartadas na Bronze) e um
+# município inexistente (rejeitado na validação e descartado na Gold)
+LINHAS_POR_ANO = 3000
+MUNICIPIO_INVALIDO = 999999
+
+def amostra(ano, seed) -> pd.DataFrame:
+    """Random establishments of one year: municipality (6 digits) and CNAE class (integer code)."""
+    rng = np.random.default_rng(seed)
+    municipios = pd.read_parquet(os.path.join(DIM_OUT_PATH, 'dim_municipio.parquet'))['id_municipio']
+    municipios = municipios[municipios.str[:2].isin(['11', '12', '14'])].astype(int).to_numpy()
+    classes = pd.read_parquet(os.path.join(DIM_OUT_PATH, 'dim_cnae.parquet'))['classe'].astype(int).to_numpy()
+    municipios = np.append(rng.choice(municipios, 40, replace=False), MUNICIPIO_INVALIDO)
+    classes = rng.choice(classes, 60, replace=False)
+    # concentração desigual entre municípios e classes, para QLs diferentes de 1
+    df = pd.DataFrame({
+        'municipio': rng.choice(municipios, LINHAS_POR_ANO, p=pesos(rng, len(municipios))),
+        'classe': rng.choice(classes, LINHAS_POR_ANO, p=pesos(rng, len(classes))).astype(str),
+    })
+    df.loc[rng.random(LINHAS_POR_ANO) < 0.02, 'classe'] = '000-1'
+    df['ano'] = ano
+    return df
+
+def pesos(rng, n) -> np.ndarray:
+    weights = rng.pareto(1.5, n) + 0.1
+    return weights / weights.sum()
+
+def escreve_txt(df, file_path) -> None:
+    txt = pd.DataFrame({'Bairros SP': 0, 'Município': df['municipio'], 'CNAE 2.0 Classe': df['classe'],
+                        'Natureza Jurídica': 2062})
+    txt.to_csv(file_path, sep=';', index=False, encoding='latin1')
+
+def escreve_csv(df, file_path) -> None:
+    # Base dos Dados: município com 7 dígitos e, em 2021, classe formatada como float
+    df = df[df['classe'] != '000-1']
+    csv = pd.DataFrame({'ano': df['ano'], 'id_municipio': df['municipio'] * 10 + 1,
+                        'cnae_2': df['classe'] + '.0'})
+    csv.to_csv(file_path, index=False)
+
+@pytest.fixture(scope='session')
+def raw_path(tmp_path_factory) -> str:
+    """Raw RAIS files: ESTB2019.txt, ESTB2020.txt and ESTB2021.csv."""
+    path = tmp_path_factory.mktemp('raw')
+    escreve_txt(amostra(2019, 1), path / 'ESTB2019.txt')
+    escreve_txt(amostra(2020, 2), path / 'ESTB2020.txt')
+    escreve_csv(amostra(2021, 3), path / 'ESTB2021.csv')
+    return str(path)
+
+@pytest.fixture(scope='session')
+def bronze_path(tmp_path_factory, raw_path) -> str:
+    """Bronze output of the baseline path: pandas reader, whole file, one Parquet per file."""
+    path = tmp_path_factory.mktemp('bronze')
+    for file_name in sorted(os.listdir(raw_path)):
+        normaliza_tipos(file_name, raw_path, str(path), engine='pandas', aggregate=False, layout='files')
+    return str(path)
+
+@pytest.fixture(scope='session')
+def silver_path(tmp_path_factory, bronze_path) -> str:
+    """Silver output of the baseline path: pandas, text keys, unsorted, not validated."""
+    path = tmp_path_factory.mktemp('silver')
+    for file_name in lista_arquivos(bronze_path):
+        processa_dados(file_name, bronze_path, str(path), layout='files', engine='pandas',
+                       integer_keys=False, sorted_keys=False, validate=False)
+    return str(path)
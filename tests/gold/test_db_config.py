@@ -0,0 +1,79 @@
+import os
+import pytest
+from sqlalchemy import text
+from sqlalchemy.exc import TimeoutError as PoolTimeoutError
+from layers.gold.utils import db_config
+
+@pytest.fixture
+def sqlite_engine(tmp_path, monkeypatch):
+    """Registry of engines pointed at a SQLite file instead of PostgreSQL."""
+    monkeypatch.setattr(db_config, 'engine_url', lambda: f"sqlite:///{tmp_path / 'gold.db'}")
+    monkeypatch.setattr(db_config, '_ENGINES', {})
+    yield db_config.create_engine_connection()
+    db_config.dispose_engine()
+
+def consulta(engine) -> None:
+    with engine.connect() as conn:
+        conn.execute(text('SELECT 1'))
+
+def test_engine_is_reused_within_a_process(sqlite_engine):
+    assert db_config.create_engine_connection() is sqlite_engine
+    consulta(sqlite_engine)
+    consulta(sqlite_engine)
+    stats = db_config.pool_stats()
+    assert stats['checkouts'] == 2
+    assert stats['checkins'] == 2
+    assert stats['connects'] == 1
+    assert stats['peak_checked_out'] == 1
+    assert stats['checked_out'] == 0
+    assert stats['wait_s'] > 0
+    assert stats['max_wait_s'] <= stats['wait_s']
+
+def test_timeouts_are_counted(tmp_path, monkeypatch):
+    monkeypatch.setattr(db_config, 'engine_url', lambda: f"sqlite:///{tmp_path / 'gold.db'}")
+    monkeypatch.setattr(db_config, '_ENGINES', {})
+    monkeypatch.setattr(db_config, 'DB_POOL_SIZE', 1)
+    monkeypatch.setattr(db_config, 'DB_MAX_OVERFLOW', 0)
+    monkeypatch.setattr(db_config, 'DB_POOL_TIMEOUT', 0.05)
+    engine = db_config.create_engine_connection()
+    try:
+        with engine.connect():
+            with pytest.raises(PoolTimeoutError):
+                engine.connect()
+        assert db_config.pool_stats()['timeouts'] == 1
+        assert db_config.pool_stats()['max_wait_s'] >= 0.05
+    finally:
+        db_config.dispose_engine()
+
+def test_stats_survive_pool_recreation(sqlite_engine):
+    consulta(sqlite_engine)
+    sqlite_engine.dispose()
+    consulta(sqlite_engine)
+    stats = db_config.pool_stats()
+    assert stats['checkouts'] == 2
+    assert stats['connects'] == 2
+
+@pytest.mark.skipif(not hasattr(os, 'fork'), reason="requer os.fork")
+def test_forked_process_gets_its_own_pool(sqlite_engine):
+    consulta(sqlite_engine)
+    pid = os.fork()
+    if pid == 0:
+        # processo filho: nada de asserts (o pytest do pai não os veria); o código de saída informa
+        code = 1
+        try:
+            child = db_config.create_engine_connection()
+            inherited_dropped = list(db_config._ENGINES) == [os.getpid()] and child is not sqlite_engine
+            fresh = db_config.pool_stats()['checkouts'] == 0
+            consulta(child)
+            counted = db_config.pool_stats()['connects'] == 1
+            code = 0 if inherited_dropped and fresh and counted else 2
+        finally:
+            os._exit(code)
+    _, status = os.waitpid(pid, 0)
+    assert os.waitstatus_to_exitcode(status) == 0
+
+    # a conexão do pai não foi fechada pelo filho e continua no pool
+    consulta(sqlite_engine)
+    stats = db_config.pool_stats()
+    assert stats['connects'] == 1
+    assert stats['checkouts'] == 2
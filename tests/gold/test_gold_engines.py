@@ -0,0 +1,178 @@
+import os
+import shutil
+import uuid
+import pandas as pd
+import pytest
+from layers.gold.utils import process_data as gp
+from layers.gold.utils.dimension_cache import clear_cache
+from layers.gold.utils.sparse_ql import GEO_LEVELS
+from layers.silver.config import config_silver
+from layers.silver.utils.process_data import processa_dados, lista_arquivos
+from layers.silver.utils.process_dimensions import altera_tipos_regiao
+
+ENGINES = ['pandas', 'cube', 'sparse', 'duckdb']
+VALORES = ('indice_', 'hhi_', 'ce_', 'gini')
+
+def captura(monkeypatch, path) -> None:
+    """
+    Replace save_to_db with pickles in path, with the indicators on.
+
+    The QL workers are forked from the test process, so they inherit the
+    replacement and write their tables to files.
+    """
+    os.makedirs(path)
+    def save(df1, df2, table_names):
+        for df, table_name in zip((df1, df2), table_names):
+            if df is not None:
+                df.to_pickle(os.path.join(path, f'{table_name}__{uuid.uuid4().hex}.pkl'))
+    monkeypatch.setattr(gp, 'save_to_db', save)
+    monkeypatch.setattr(gp, 'INDICATORS', True)
+    clear_cache()
+
+def tabelas(path) -> dict:
+    """Captured fact tables, one frame per table (see normaliza)."""
+    partes = {}
+    for name in sorted(os.listdir(path)):
+        partes.setdefault(name.split('__')[0], []).append(pd.read_pickle(os.path.join(path, name)))
+    return normaliza(partes)
+
+def normaliza(partes) -> dict:
+    """Concatenate the parts of each table, with text keys and rows in a fixed order."""
+    result = {}
+    for table_name, frames in partes.items():
+        df = pd.concat(frames, ignore_index=True)
+        keys = [col for col in df.columns if not col.startswith(VALORES)]
+        df = df.astype({col: str for col in keys}).astype({'ano': 'int64'})
+        result[table_name] = df.sort_values(keys).reset_index(drop=True)
+    return result
+
+def compara(path, esperado) -> None:
+    obtido = tabelas(path)
+    assert sorted(obtido) == sorted(esperado)
+    for table_name, df in esperado.items():
+        pd.testing.assert_frame_equal(obtido[table_name], df, check_exact=True)
+
+def merge_original(file_path, dim_path) -> pd.DataFrame:
+    """Enriched establishments as the original merge_dimensions built them: five chained inner merges."""
+    df = pd.read_parquet(file_path)
+    for name, key in [('dim_municipio', 'id_municipio'), ('dim_microrregiao', 'id_microrregiao'),
+                      ('dim_mesorregiao', 'id_mesorregiao'), ('dim_cnae', 'classe'), ('dim_uf', 'id_uf')]:
+        df = pd.merge(df, pd.read_parquet(os.path.join(dim_path, f'{name}.parquet')), how='inner', on=key)
+    return df
+
+def ql_original(df, region, activity, geo_level) -> pd.DataFrame:
+    """One fact table as the original calculate_idx_muni/micro/meso computed it: one groupby per share."""
+    id_cols = ['id_uf', region]
+    numerador = df.groupby(['ano'] + id_cols + [activity]).size() / df.groupby(['ano'] + id_cols).size()
+    denominador_nac = df.groupby(['ano', activity]).size() / df.groupby(['ano']).size()
+    denominador_est = df.groupby(['ano', activity, 'id_uf']).size() / df.groupby(['ano', 'id_uf']).size()
+
+    ql_nac = (numerador / denominador_nac).reset_index(name=f'indice_{geo_level}_nac')
+    ql_est = (numerador / denominador_est).reset_index(name=f'indice_{geo_level}_est')
+    for ql in (ql_nac, ql_est):
+        column = ql.columns[-1]
+        ql[column] = round(ql[column].replace([float('inf'), -float('inf')], 0).fillna(0), 3)
+    return pd.merge(ql_nac, ql_est, how='outer', on=['ano'] + id_cols + [activity]).drop(axis=1, columns=['id_uf'])
+
+def por_arquivo(silver, dims, engine) -> None:
+    for file_name in gp.select_years(os.listdir(silver)):
+        gp.process_data(file_name, silver, None, dims, engine=engine)
+
+@pytest.fixture(scope='module')
+def dims() -> str:
+    return str(config_silver.DIM_OUT_PATH)
+
+@pytest.fixture(scope='module')
+def int_dims(tmp_path_factory, dims) -> str:
+    """Dimensions converted to integer keys, as silver writes them with SILVER_INTEGER_KEYS=1."""
+    path = tmp_path_factory.mktemp('dims_int')
+    for name in os.listdir(dims):
+        shutil.copy(os.path.join(dims, name), path)
+    with pytest.MonkeyPatch.context() as mp:
+        mp.setattr(config_silver, 'DIM_OUT_PATH', path)
+        altera_tipos_regiao(integer_keys=True)
+    return str(path)
+
+def silver(tmp_path_factory, bronze_path, **kwargs) -> str:
+    path = tmp_path_factory.mktemp('silver')
+    opcoes = {'layout': 'files', 'engine': 'pandas', 'integer_keys': False, 'sorted_keys': False,
+              'validate': False, **kwargs}
+    with pytest.MonkeyPatch.context() as mp:
+        mp.setattr('layers.silver.utils.process_data.grava_rejeitados', lambda *args: None)
+        for file_name in lista_arquivos(bronze_path):
+            processa_dados(file_name, bronze_path, str(path), **opcoes)
+    return str(path)
+
+@pytest.fixture(scope='module')
+def baseline(tmp_path_factory, silver_path, dims) -> dict:
+    """Fact tables of the baseline path: pandas engine, one year at a time, text keys."""
+    path = tmp_path_factory.mktemp('gold') / 'pandas'
+    with pytest.MonkeyPatch.context() as mp:
+        captura(mp, path)
+        por_arquivo(silver_path, dims, 'pandas')
+    return tabelas(path)
+
+@pytest.fixture(scope='module')
+def original(silver_path, dims) -> dict:
+    """Section and division tables of the original pandas code (merge_original, ql_original), per year."""
+    partes = {}
+    for file_name in gp.select_years(os.listdir(silver_path)):
+        df = merge_original(os.path.join(silver_path, file_name), dims)
+        for geo_level, region in GEO_LEVELS.items():
+            for activity, prefixo in (('secao', 'sec'), ('divisao', 'div')):
+                partes.setdefault(f'fact_{prefixo}_{geo_level}', []).append(ql_original(df, region, activity, geo_level))
+    return normaliza(partes)
+
+def test_pandas_engine_matches_the_original_code(baseline, original):
+    for table_name, df in original.items():
+        pd.testing.assert_frame_equal(baseline[table_name], df, check_exact=True)
+
+def test_baseline_tables(baseline):
+    assert set(baseline) == {f'fact_{cnae}_{geo}' for cnae in ('sec', 'div') for geo in ('muni', 'micro', 'meso')} | {
+        f'fact_{kind}_{geo}' for kind in ('espec', 'gini_sec', 'gini_div') for geo in ('muni', 'micro', 'meso')}
+    assert sorted(baseline['fact_sec_muni']['ano'].unique()) == [2019, 2020, 2021]
+    # o município inexistente nas dimensões não chega às tabelas fato
+    assert '999999' not in set(baseline['fact_sec_muni']['id_municipio'])
+    assert baseline['fact_sec_muni']['indice_muni_nac'].nunique() > 10
+
+@pytest.mark.parametrize('engine', ENGINES[1:])
+def test_engine_matches_baseline(silver_path, dims, baseline, tmp_path, monkeypatch, engine):
+    captura(monkeypatch, tmp_path / engine)
+    por_arquivo(silver_path, dims, engine)
+    compara(tmp_path / engine, baseline)
+
+@pytest.mark.parametrize('engine', ENGINES)
+def test_multi_year_matches_baseline(silver_path, dims, baseline, tmp_path, monkeypatch, engine):
+    captura(monkeypatch, tmp_path / engine)
+    timings = gp.process_years(gp.select_years(os.listdir(silver_path)), silver_path, dims, engine=engine)
+    assert list(timings['ano']) == [2019, 2020, 2021]
+    # uma gravação por tabela para todos os anos
+    assert len(os.listdir(tmp_path / engine)) == len(baseline)
+    compara(tmp_path / engine, baseline)
+
+def test_shared_handoff_matches_baseline(silver_path, dims, baseline, tmp_path, monkeypatch):
+    captura(monkeypatch, tmp_path / 'shared')
+    gp.start_executor()
+    try:
+        for file_name in gp.select_years(os.listdir(silver_path)):
+            gp.calculate_indexes(gp.merge_dimensions(os.path.join(silver_path, file_name), dims), shared=True)
+    finally:
+        gp.shutdown_executor()
+    compara(tmp_path / 'shared', baseline)
+
+@pytest.mark.parametrize('variante', [
+    {'layout': 'partitioned'},
+    {'integer_keys': True},
+    {'sorted_keys': True},
+    {'integer_keys': True, 'sorted_keys': True},
+    {'integer_keys': True, 'sorted_keys': True, 'layout': 'partitioned'},
+    {'validate': True},
+], ids=['partitioned', 'int', 'sorted', 'int-sorted', 'int-sorted-partitioned', 'validated'])
+def test_silver_variants_match_baseline(tmp_path_factory, bronze_path, dims, int_dims, baseline, tmp_path,
+                                        monkeypatch, variante):
+    path = silver(tmp_path_factory, bronze_path, **variante)
+    dim_path = int_dims if variante.get('integer_keys') else dims
+    for engine in ENGINES:
+        captura(monkeypatch, tmp_path / engine)
+        por_arquivo(path, dim_path, engine)
+        compara(tmp_path / engine, baseline)
@@ -0,0 +1,65 @@
+import itertools
+import pandas as pd
+import pytest
+from layers.gold.utils.indicators import specialization, locational_gini, indicator_tables
+
+def cells(counts, region='id_municipio', activity='secao') -> pd.Series:
+    """Counts {(region, activity): n} of 2019 as the numerators of calculate_idx_* (with id_uf)."""
+    index = pd.MultiIndex.from_tuples([(2019, '15', r, a) for r, a in counts],
+                                      names=['ano', 'id_uf', region, activity])
+    return pd.Series(list(counts.values()), index=index)
+
+def test_single_activity_has_hhi_one():
+    result = specialization(cells({('A', '1'): 5, ('B', '1'): 2, ('B', '2'): 2}), 'id_municipio', 'secao')
+    region_a = result.set_index('id_municipio').loc['A']
+    assert region_a['hhi'] == 1
+    # CE = 1 - national share of the only activity: 1 - 7/9
+    assert region_a['ce'] == pytest.approx(round(2 / 9, 4))
+
+def test_worked_example():
+    counts = cells({('A', '1'): 3, ('A', '2'): 1, ('B', '1'): 1, ('B', '2'): 3})
+    espec = specialization(counts, 'id_municipio', 'secao').set_index('id_municipio')
+    assert espec.loc['A', 'hhi'] == 0.625  # 0.75² + 0.25²
+    assert espec.loc['A', 'ce'] == 0.25    # ½ (|0.75 - 0.5| + |0.25 - 0.5|)
+
+    gini = locational_gini(counts, 'id_municipio', 'secao').set_index('secao')['gini']
+    # x = (0.5, 0.5); sorted by QL, y = (0.25, 0.75): G = 1 - (0.5 * 0.25 + 0.5 * 1.25)
+    assert gini.loc['1'] == 0.25
+    assert gini.loc['2'] == 0.25
+
+def test_uniform_distribution_has_gini_zero():
+    # toda região tem a mesma composição de atividades do total: QL = 1 em toda célula
+    counts = cells({('A', '1'): 2, ('A', '2'): 4, ('B', '1'): 1, ('B', '2'): 2, ('C', '1'): 3, ('C', '2'): 6})
+    gini = locational_gini(counts, 'id_municipio', 'secao')
+    assert (gini['gini'] == 0).all()
+    espec = specialization(counts, 'id_municipio', 'secao')
+    assert (espec['ce'] == 0).all()
+
+def test_indicators_do_not_depend_on_input_order():
+    counts = cells({('A', '1'): 3, ('A', '2'): 1, ('B', '1'): 1, ('B', '2'): 3, ('C', '1'): 2})
+    shuffled = counts.sample(frac=1, random_state=0)
+    pd.testing.assert_frame_equal(locational_gini(counts, 'id_municipio', 'secao'),
+                                  locational_gini(shuffled, 'id_municipio', 'secao'))
+    pd.testing.assert_frame_equal(specialization(counts, 'id_municipio', 'secao'),
+                                  specialization(shuffled, 'id_municipio', 'secao'))
+
+def test_rounding_ties_do_not_depend_on_key_order():
+    # HHI = (7² + 128² + 65²) / 200² = 0,51645, exatamente no meio entre duas casas.
+    # Com chaves textuais '10' vem antes de '2', com chaves inteiras depois
+    results = set()
+    for order in itertools.permutations([('10', 7), ('2', 128), ('3', 65)]):
+        for key in (str, int):
+            counts = cells({('A', key(activity)): n for activity, n in order} | {('B', key('2')): 9})
+            espec = specialization(counts, 'id_municipio', 'secao').set_index('id_municipio')
+            gini = locational_gini(counts, 'id_municipio', 'secao')
+            results.add((espec.loc['A', 'hhi'], espec.loc['A', 'ce'], tuple(sorted(gini['gini']))))
+    assert len(results) == 1
+    assert results.pop()[0] == round(20658 / 40000, 4)
+
+def test_indicator_tables():
+    sec = cells({('A', '1'): 3, ('B', '2'): 1})
+    div = cells({('A', '10'): 3, ('B', '20'): 1}, activity='divisao')
+    tables = indicator_tables(sec, div, 'muni')
+    assert set(tables) == {'fact_espec_muni', 'fact_gini_sec_muni', 'fact_gini_div_muni'}
+    assert list(tables['fact_espec_muni'].columns) == ['ano', 'id_municipio', 'hhi_sec', 'ce_sec', 'hhi_div', 'ce_div']
+    assert list(tables['fact_gini_div_muni'].columns) == ['ano', 'divisao', 'gini']
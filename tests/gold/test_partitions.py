@@ -0,0 +1,135 @@
+import os
+import pandas as pd
+import pytest
+from sqlalchemy import text
+from sqlalchemy.exc import IntegrityError
+from layers.gold.utils import db_config
+from layers.gold.utils.db_start import create_database, migrate_database
+from layers.gold.utils.db_insertion import save_to_db, write_frame
+from layers.gold.utils.refresh import save_state, load_state, remove_years
+
+# Integração com um PostgreSQL de teste: o schema `dimensional` do banco é recriado
+DATABASE_URL = os.getenv("GOLD_TEST_DATABASE_URL")
+
+pytestmark = [pytest.mark.postgres,
+              pytest.mark.skipif(not DATABASE_URL, reason="GOLD_TEST_DATABASE_URL não definida")]
+
+MUNICIPIOS = ['1100015', '1100023', '1100031']
+TABELAS = ['fact_sec_muni', 'fact_div_muni']
+
+@pytest.fixture
+def engine(monkeypatch):
+    """Process engine pointed at the test database, with a fresh schema and dimensions."""
+    monkeypatch.setattr(db_config, 'engine_url', lambda: DATABASE_URL)
+    monkeypatch.setattr(db_config, '_ENGINES', {})
+    create_database()
+    engine = db_config.create_engine_connection()
+    with engine.begin() as conn:
+        conn.execute(text("INSERT INTO dimensional.dim_uf VALUES ('11', 'RO')"))
+        conn.execute(text("INSERT INTO dimensional.dim_mesorregiao VALUES ('1101', 'Leste Rondoniense', '11')"))
+        conn.execute(text("INSERT INTO dimensional.dim_microrregiao VALUES ('11001', 'Porto Velho', '1101')"))
+        for municipio in MUNICIPIOS:
+            conn.execute(text("INSERT INTO dimensional.dim_municipio VALUES (:m, :m, '11001')"), {'m': municipio})
+    yield engine
+    db_config.dispose_engine()
+
+def fatos(ano, atividade, atividades=(1, 2)) -> pd.DataFrame:
+    rows = [(ano, municipio, valor) for municipio in MUNICIPIOS for valor in atividades]
+    df = pd.DataFrame(rows, columns=['ano', 'id_municipio', atividade])
+    return df.assign(indice_muni_nac=1.5, indice_muni_est=0.5)
+
+def contagem(engine, table_name) -> dict:
+    with engine.connect() as conn:
+        rows = conn.execute(text(f"SELECT ano, count(*) FROM dimensional.{table_name} GROUP BY ano ORDER BY ano"))
+        return dict(rows.all())
+
+def particoes(engine, table_name) -> list:
+    with engine.connect() as conn:
+        return conn.execute(text(
+            "SELECT c.relname FROM pg_inherits i JOIN pg_class c ON c.oid = i.inhrelid "
+            "WHERE i.inhparent = CAST(:t AS regclass) ORDER BY c.relname"
+        ), {'t': f"dimensional.{table_name}"}).scalars().all()
+
+def test_loading_a_year_twice_replaces_its_rows(engine):
+    save_to_db(fatos(2019, 'secao'), fatos(2019, 'divisao'), TABELAS)
+    save_to_db(fatos(2019, 'secao'), fatos(2019, 'divisao'), TABELAS)
+    assert contagem(engine, 'fact_sec_muni') == {2019: 6}
+    assert contagem(engine, 'fact_div_muni') == {2019: 6}
+
+    save_to_db(fatos(2020, 'secao'), None, TABELAS)
+    save_to_db(fatos(2019, 'secao', atividades=(3,)), None, TABELAS)
+    assert contagem(engine, 'fact_sec_muni') == {2019: 3, 2020: 6}
+    assert contagem(engine, 'fact_div_muni') == {2019: 6}
+    assert particoes(engine, 'fact_sec_muni') == ['fact_sec_muni_2019', 'fact_sec_muni_2020']
+
+def test_unpartitioned_fact_tables_are_migrated(engine):
+    # Tabela como era criada antes do particionamento por ano
+    with engine.begin() as conn:
+        conn.execute(text("DROP TABLE dimensional.fact_sec_muni CASCADE"))
+        conn.execute(text("""
+            CREATE TABLE dimensional.fact_sec_muni (
+                id serial PRIMARY KEY,
+                ano int,
+                id_municipio varchar REFERENCES dimensional.dim_municipio(id_municipio),
+                secao integer,
+                indice_muni_nac float,
+                indice_muni_est float
+            )
+        """))
+        conn.execute(text("CREATE INDEX idx_fact_sec_muni_ano ON dimensional.fact_sec_muni (ano)"))
+        write_frame(conn, pd.concat([fatos(2019, 'secao'), fatos(2020, 'secao')]), 'fact_sec_muni')
+
+    assert migrate_database() == ['fact_sec_muni']
+    assert contagem(engine, 'fact_sec_muni') == {2019: 6, 2020: 6}
+    assert particoes(engine, 'fact_sec_muni') == ['fact_sec_muni_2019', 'fact_sec_muni_2020']
+    with engine.connect() as conn:
+        assert conn.execute(text("SELECT relkind FROM pg_class WHERE oid = 'dimensional.fact_sec_muni'::regclass")
+                            ).scalar() == 'p'
+        assert conn.execute(text("SELECT to_regclass('dimensional.fact_sec_muni_antiga')")).scalar() is None
+
+    # Recarregar um ano depois da migração troca só a sua partição, com ids novos
+    save_to_db(fatos(2019, 'secao'), None, TABELAS)
+    assert contagem(engine, 'fact_sec_muni') == {2019: 6, 2020: 6}
+    with engine.connect() as conn:
+        assert conn.execute(text("SELECT min(id) FROM dimensional.fact_sec_muni WHERE ano = 2019")).scalar() > 12
+    assert migrate_database() == []
+
+def test_removed_years_drop_their_partitions(engine):
+    for ano in (2019, 2020):
+        save_to_db(fatos(ano, 'secao'), fatos(ano, 'divisao'), TABELAS)
+    save_state({'ano=2019': 'a', 'ano=2020': 'b'})
+
+    remove_years([2019])
+    assert contagem(engine, 'fact_sec_muni') == {2020: 6}
+    assert contagem(engine, 'fact_div_muni') == {2020: 6}
+    assert particoes(engine, 'fact_sec_muni') == ['fact_sec_muni_2020']
+    assert load_state() == {'ano=2020': 'b'}
+
+def test_copy_keeps_floats_nulls_and_empty_strings(engine):
+    df = fatos(2019, 'secao').assign(indice_muni_nac=[0.1, 1 / 3, float('nan'), 1e-300, 2.5, 123456.789])
+    save_to_db(df, None, TABELAS)
+    with engine.connect() as conn:
+        lidos = pd.read_sql(text("SELECT id_municipio, secao, indice_muni_nac FROM dimensional.fact_sec_muni "
+                                 "ORDER BY id"), conn)
+    pd.testing.assert_frame_equal(lidos, df[['id_municipio', 'secao', 'indice_muni_nac']], check_dtype=False)
+
+    # texto vazio continua texto vazio; só o valor ausente vira NULL
+    with engine.begin() as conn:
+        write_frame(conn, pd.DataFrame({'id_uf': ['12', '13'], 'uf': ['', None]}), 'dim_uf')
+        assert conn.execute(text("SELECT uf FROM dimensional.dim_uf WHERE id_uf IN ('12', '13') ORDER BY id_uf")
+                            ).scalars().all() == ['', None]
+
+def test_attached_partitions_keep_the_foreign_keys(engine):
+    save_to_db(fatos(2019, 'secao'), None, TABELAS)
+    with engine.connect() as conn:
+        # a chave estrangeira da partição é a da tabela fato, aplicada no ATTACH
+        assert conn.execute(text(
+            "SELECT count(*) FROM pg_constraint WHERE conrelid = 'dimensional.fact_sec_muni_2019'::regclass "
+            "AND contype = 'f' AND conparentid <> 0 AND convalidated"
+        )).scalar() == 1
+
+    df = fatos(2020, 'secao').assign(id_municipio='9999999')
+    with pytest.raises(IntegrityError):
+        save_to_db(df, None, TABELAS)
+    assert contagem(engine, 'fact_sec_muni') == {2019: 6}
+    assert particoes(engine, 'fact_sec_muni') == ['fact_sec_muni_2019']
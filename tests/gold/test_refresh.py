@@ -0,0 +1,69 @@
+import pandas as pd
+import pytest
+from layers.common.manifest import salva_manifesto
+from layers.gold.utils import refresh
+
+DIMENSOES = {'dim_cnae': 'a1', 'dim_municipio': 'b2', 'dim_uf': 'c3'}
+
+@pytest.fixture
+def dim_path(tmp_path, monkeypatch):
+    """Dimension directory whose manifest is the one written by the silver layer."""
+    path = tmp_path / 'dimensions'
+    path.mkdir()
+    salva_manifesto(path, {name: {'hash': digest, 'version': '2'} for name, digest in DIMENSOES.items()})
+    monkeypatch.setattr(refresh, 'DIM_PATH', path)
+    return path
+
+@pytest.fixture
+def silver(tmp_path):
+    """Silver directory with one file per year and one ano=YYYY partition."""
+    path = tmp_path / 'estabelecimentos'
+    path.mkdir()
+    for ano in (2019, 2020):
+        escreve_ano(path / f'ESTB{ano}.parquet', ano)
+    (path / 'ano=2021').mkdir()
+    escreve_ano(path / 'ano=2021' / 'parte-0.parquet', 2021)
+    return path
+
+def escreve_ano(file_path, ano, quantidade=3) -> None:
+    pd.DataFrame({'ano': [ano] * quantidade, 'id_municipio': range(quantidade)}).to_parquet(file_path)
+
+def carga(silver) -> tuple:
+    """Load state after a full load of every year in the directory."""
+    names = sorted(p.name for p in silver.iterdir())
+    pending, fingerprints = refresh.changed_years(names, silver, {})
+    state = {**refresh.base_state(), **{refresh.year_item(refresh.file_year(name)): fingerprints[name]
+                                        for name in pending}}
+    return names, state
+
+def test_unchanged_silver_reloads_nothing(dim_path, silver):
+    names, state = carga(silver)
+    assert refresh.full_load_reason(state) is None
+    assert refresh.changed_years(names, silver, state)[0] == []
+
+def test_changed_dimension_triggers_a_full_load(dim_path, silver):
+    _, state = carga(silver)
+    salva_manifesto(dim_path, {**{name: {'hash': digest} for name, digest in DIMENSOES.items()},
+                               'dim_cnae': {'hash': 'novo'}})
+    assert refresh.full_load_reason(state) == "dimensões alteradas: dim_cnae"
+
+def test_removed_dimension_triggers_a_full_load(dim_path, silver):
+    _, state = carga(silver)
+    salva_manifesto(dim_path, {name: {'hash': digest} for name, digest in DIMENSOES.items() if name != 'dim_uf'})
+    assert refresh.changed_dimensions(state) == ['dim_uf']
+
+def test_changed_year_reloads_only_that_year(dim_path, silver):
+    names, state = carga(silver)
+    escreve_ano(silver / 'ESTB2020.parquet', 2020, quantidade=4)
+    assert refresh.full_load_reason(state) is None
+    assert refresh.changed_years(names, silver, state)[0] == ['ESTB2020.parquet']
+
+def test_changed_partition_reloads_only_that_year(dim_path, silver):
+    names, state = carga(silver)
+    escreve_ano(silver / 'ano=2021' / 'parte-1.parquet', 2021)
+    assert refresh.changed_years(names, silver, state)[0] == ['ano=2021']
+
+def test_new_gold_version_triggers_a_full_load(dim_path, silver, monkeypatch):
+    _, state = carga(silver)
+    monkeypatch.setattr(refresh, 'GOLD_VERSION', 'novo')
+    assert refresh.full_load_reason(state).startswith("versão da Gold alterada")
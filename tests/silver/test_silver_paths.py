@@ -0,0 +1,119 @@
+import os
+from functools import partial
+import pandas as pd
+import pytest
+import pyarrow.parquet as pq
+from layers.silver.utils import process_data
+from layers.silver.utils.process_data import processa_dados, lista_arquivos, arquivo_ordenado, SORT_COLUMNS
+from layers.silver.utils.validation import grava_rejeitados, arquivo_validado, chaves_validas
+from layers.silver.config.config_silver import KEY_WIDTHS
+
+ANOS = {'ESTB2019.parquet': 2019, 'ESTB2020.parquet': 2020, 'ESTB2021.parquet': 2021}
+
+def processa(bronze_path, out_path, **kwargs) -> dict:
+    opcoes = {'layout': 'files', 'engine': 'pandas', 'integer_keys': False, 'sorted_keys': False,
+              'validate': False, **kwargs}
+    os.makedirs(out_path, exist_ok=True)
+    return {os.path.basename(name): processa_dados(name, bronze_path, str(out_path), **opcoes)
+            for name in lista_arquivos(bronze_path)}
+
+def le(path, file_name) -> pd.DataFrame:
+    """Silver year in either layout, with 'ano' back from the partition directory."""
+    ano = ANOS[file_name]
+    partition = os.path.join(path, f'ano={ano}', file_name)
+    if os.path.exists(partition):
+        return pd.read_parquet(partition).assign(ano=ano)
+    return pd.read_parquet(os.path.join(path, file_name))
+
+def texto(df) -> pd.DataFrame:
+    """Keys in the baseline form (zero-padded text), rows in a fixed order."""
+    df = df[['ano', 'id_municipio', 'classe']].astype({'ano': 'int64'})
+    for col in ('id_municipio', 'classe'):
+        df[col] = df[col].astype(str).str.zfill(KEY_WIDTHS[col])
+    return df.sort_values(list(df.columns)).reset_index(drop=True)
+
+def compara(path, silver_path, file_names=ANOS) -> None:
+    for file_name in file_names:
+        pd.testing.assert_frame_equal(texto(le(path, file_name)), texto(le(silver_path, file_name)))
+
+def tem_page_index(path) -> bool:
+    """True if every column chunk of the file (or partition) has column and offset indexes."""
+    files = [os.path.join(path, f) for f in os.listdir(path)] if os.path.isdir(path) else [path]
+    chunks = []
+    for f in files:
+        metadata = pq.read_metadata(f)
+        chunks += [metadata.row_group(i).column(j) for i in range(metadata.num_row_groups)
+                   for j in range(metadata.num_columns)]
+    return bool(chunks) and all(c.has_column_index and c.has_offset_index for c in chunks)
+
+def test_baseline_keys(silver_path):
+    df = le(silver_path, 'ESTB2021.parquet')
+    assert (df['id_municipio'].str.len() == 6).all()
+    assert (df['classe'].str.len() == 5).all() and not df['classe'].str.contains('.', regex=False).any()
+
+@pytest.mark.parametrize('engine', ['pandas', 'arrow'])
+def test_integer_keys_match_baseline(bronze_path, silver_path, tmp_path, engine):
+    processa(bronze_path, tmp_path, engine=engine, integer_keys=True)
+    df = le(tmp_path, 'ESTB2019.parquet')
+    assert str(df['id_municipio'].dtype) == 'int32' and str(df['classe'].dtype) == 'int32'
+    assert str(df['ano'].dtype) == 'int16'
+    compara(tmp_path, silver_path)
+
+def test_arrow_engine_matches_baseline(bronze_path, silver_path, tmp_path):
+    processa(bronze_path, tmp_path, engine='arrow')
+    compara(tmp_path, silver_path)
+
+@pytest.mark.parametrize('layout', ['files', 'partitioned'])
+def test_sorted_matches_baseline(bronze_path, silver_path, tmp_path, layout):
+    processa(bronze_path, tmp_path, layout=layout, sorted_keys=True)
+    for file_name, ano in ANOS.items():
+        path = os.path.join(tmp_path, f'ano={ano}') if layout == 'partitioned' else os.path.join(tmp_path, file_name)
+        assert arquivo_ordenado(path)
+        assert tem_page_index(path)
+        df = le(tmp_path, file_name)
+        pd.testing.assert_frame_equal(df, df.sort_values(SORT_COLUMNS, kind='stable'))
+    assert not arquivo_ordenado(os.path.join(silver_path, 'ESTB2019.parquet'))
+    compara(tmp_path, silver_path)
+
+def test_partitioned_matches_baseline(bronze_path, silver_path, tmp_path):
+    processa(bronze_path, tmp_path, layout='partitioned')
+    assert lista_arquivos(tmp_path) == [f'ano={ano}/{name}' for name, ano in ANOS.items()]
+    compara(tmp_path, silver_path)
+
+@pytest.mark.parametrize('engine, integer_keys', [('pandas', False), ('arrow', False), ('pandas', True)])
+def test_validated_keeps_the_valid_baseline_rows(bronze_path, silver_path, tmp_path, monkeypatch,
+                                                  engine, integer_keys):
+    monkeypatch.setattr(process_data, 'grava_rejeitados', partial(grava_rejeitados, reject_path=tmp_path / 'rej'))
+    resumos = processa(bronze_path, tmp_path / 'silver', engine=engine, integer_keys=integer_keys, validate=True)
+    valid = chaves_validas()
+    for file_name in ANOS:
+        base = texto(le(silver_path, file_name))
+        ok = base['id_municipio'].isin(valid['id_municipio']) & base['classe'].isin(valid['classe'])
+        pd.testing.assert_frame_equal(texto(le(tmp_path / 'silver', file_name)),
+                                      base[ok].reset_index(drop=True))
+        rejeitados = pd.read_parquet(tmp_path / 'rej' / file_name)
+        assert len(rejeitados) == (~ok).sum() > 0
+        assert set(rejeitados['motivo'].astype(str)) == {'id_municipio'}
+        assert resumos[file_name]['rows_rejected'] == (~ok).sum()
+        assert arquivo_validado(os.path.join(tmp_path, 'silver', file_name))
+    assert not arquivo_validado(os.path.join(silver_path, 'ESTB2019.parquet'))
+
+def test_every_option_together_matches_baseline(bronze_path, silver_path, tmp_path):
+    processa(bronze_path, tmp_path, layout='partitioned', engine='arrow', integer_keys=True, sorted_keys=True)
+    compara(tmp_path, silver_path)
+
+@pytest.mark.parametrize('engine', ['pandas', 'arrow'])
+@pytest.mark.parametrize('layout, sorted_keys', [('files', False), ('partitioned', False), ('files', True),
+                                                 ('partitioned', True)])
+@pytest.mark.parametrize('linhas', [[(999999, '4711-3')], []], ids=['all-rejected', 'empty'])
+def test_year_without_valid_rows_is_written_empty(tmp_path, monkeypatch, engine, layout, sorted_keys, linhas):
+    monkeypatch.setattr(process_data, 'grava_rejeitados', partial(grava_rejeitados, reject_path=tmp_path / 'rej'))
+    bronze = tmp_path / 'bronze'
+    bronze.mkdir()
+    pd.DataFrame(linhas, columns=['Município', 'CNAE 2.0 Classe']).astype(
+        {'Município': 'Int64', 'CNAE 2.0 Classe': str}).to_parquet(bronze / 'ESTB2019.parquet')
+    resumos = processa(str(bronze), tmp_path / 'silver', engine=engine, layout=layout, sorted_keys=sorted_keys,
+                       validate=True)
+    assert resumos['ESTB2019.parquet']['rows_out'] == 0
+    assert resumos['ESTB2019.parquet']['rows_rejected'] == len(linhas)
+    assert le(tmp_path / 'silver', 'ESTB2019.parquet').empty